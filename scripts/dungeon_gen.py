@@ -41,10 +41,15 @@ from dungeon_net.viz.pgv_nx import visualize_dungeon
 
 
 def count_node_types(chain_dict: Dict[str, nx.MultiDiGraph]) -> Dict[Node, int]:
-    # Describe the different kinds of chains
+    # Describe the different kinds of chains, nodes shared between chains
+    # (start and end points) are only counted once
     node_count = {"type": {}, "base": {}}
+    seen = set()
     for k, chain in chain_dict.items():
         for node in chain.nodes:
+            if node in seen:
+                continue
+            seen.add(node)
             node_type = type(node)
             if node_type in node_count["type"]:
                 node_count["type"][node_type] += 1
@@ -0,0 +1,149 @@
+# Memory footprint of dungeons by size, measured with tracemalloc: bytes
+# per node of the Node objects (including their names) and of the graph's
+# node entries, bytes per edge (connection, both arcs) of the graph and
+# bytes per node of the DungeonArrays snapshot. Dungeons are built
+# synthetically with the generator's layout (typed nodes from the chain
+# probability matrix, doubled arcs, "chain_num" node data, unique names)
+# since naming makes real generation quadratic at these sizes
+# Usage: python memory_bench.py [--sizes 1000 10000 100000 1000000]
+#            [--save baseline.json] [--check baseline.json --tolerance 0.05]
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from typing import Dict
+
+import networkx as nx
+import numpy as np
+
+from dungeon_net.cli import DEFAULT_CONFIG
+from dungeon_net.generation import Corridor, add_edge_to_chain
+from dungeon_net.generation.graph_arrays import DungeonArrays, NODE_TYPES
+
+# dungeon-gen's default "chain_prob_matrix", ordered like NODE_TYPES
+PROB_MATRIX = np.array(DEFAULT_CONFIG["chain_prob_matrix"])
+assert [t.__name__ for t in NODE_TYPES] == DEFAULT_CONFIG["node_types"]
+# Fraction of extra edges closing loops
+LOOP_FRACTION = 0.1
+METRICS = ["node_bytes", "graph_node_bytes", "graph_edge_bytes",
+           "arrays_node_bytes"]
+
+
+def make_nodes(num_nodes: int, rng: np.random.Generator):
+    # Node types from a Markov chain over PROB_MATRIX, names numbered per
+    # type as "new_node_name" does
+    types = np.zeros(num_nodes, dtype=np.int64)
+    uniform = rng.random(num_nodes)
+    cumulative = np.cumsum(PROB_MATRIX, axis=1)
+    for i in range(1, num_nodes):
+        types[i] = np.searchsorted(cumulative[types[i - 1]], uniform[i])
+    counts = {t: 0 for t in NODE_TYPES}
+    edges = rng.integers(1, 5, num_nodes)
+    nodes = []
+    for t, num_edges in zip(types.tolist(), edges.tolist()):
+        node_type = NODE_TYPES[t]
+        node = Corridor() if node_type is Corridor else node_type(num_edges)
+        counts[node_type] += 1
+        node.name = f"{node.base_name}_{counts[node_type]}"
+        nodes.append(node)
+    return nodes
+
+
+def make_edges(num_nodes: int, rng: np.random.Generator):
+    # A random tree (every node joins an earlier one) plus loop edges
+    parents = (rng.random(num_nodes - 1) * np.arange(1, num_nodes)).astype(np.int64)
+    tree = np.stack([parents, np.arange(1, num_nodes)], axis=1)
+    num_loops = int(LOOP_FRACTION * num_nodes)
+    loops = rng.integers(0, num_nodes, (num_loops, 2))
+    loops = loops[loops[:, 0] != loops[:, 1]]
+    return np.concatenate([tree, loops]).tolist()
+
+
+def traced_bytes() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def measure(num_nodes: int, seed=0) -> Dict[str, float]:
+    rng = np.random.default_rng(seed)
+    edges = make_edges(num_nodes, rng)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    start = traced_bytes()
+    nodes = make_nodes(num_nodes, rng)
+    after_nodes = traced_bytes()
+    dungeon = nx.MultiDiGraph()
+    dungeon.add_nodes_from(nodes, chain_num=1)
+    after_graph_nodes = traced_bytes()
+    for u, v in edges:
+        add_edge_to_chain(dungeon, nodes[u], nodes[v], 1)
+    after_graph_edges = traced_bytes()
+    arrays = DungeonArrays.from_dungeon(dungeon)
+    after_arrays = traced_bytes()
+    tracemalloc.stop()
+    seconds = time.perf_counter() - t0
+    del arrays, dungeon, nodes
+    return {"num_nodes": num_nodes, "num_edges": len(edges),
+            "node_bytes": (after_nodes - start) / num_nodes,
+            "graph_node_bytes": (after_graph_nodes - after_nodes) / num_nodes,
+            "graph_edge_bytes": (after_graph_edges - after_graph_nodes) / len(edges),
+            "arrays_node_bytes": (after_arrays - after_graph_edges) / num_nodes,
+            "total_mb": (after_arrays - start) / 1024**2,
+            "seconds": seconds}
+
+
+def check(results, baseline, tolerance: float) -> int:
+    # Number of metrics more than "tolerance" above the baseline at the
+    # same size
+    by_size = {r["num_nodes"]: r for r in baseline}
+    regressions = 0
+    for r in results:
+        base = by_size.get(r["num_nodes"])
+        if base is None:
+            continue
+        for metric in METRICS:
+            if r[metric] > base[metric] * (1 + tolerance):
+                print(f"Regression at {r['num_nodes']} nodes: {metric} "
+                      f"{r[metric]:.1f} > {base[metric]:.1f} B")
+                regressions += 1
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="FILE",
+                        help="write the results as a JSON baseline")
+    parser.add_argument("--check", metavar="FILE",
+                        help="compare against a JSON baseline, exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="allowed relative growth over the baseline")
+    args = parser.parse_args()
+
+    print(f"{'nodes':>9} {'edges':>9} {'node B':>8} {'graph B/node':>13} "
+          f"{'graph B/edge':>13} {'arrays B/node':>14} {'total MB':>9} {'s':>7}")
+    results = []
+    for size in args.sizes:
+        r = measure(size, args.seed)
+        results.append(r)
+        print(f"{r['num_nodes']:>9} {r['num_edges']:>9} {r['node_bytes']:>8.1f} "
+              f"{r['graph_node_bytes']:>13.1f} {r['graph_edge_bytes']:>13.1f} "
+              f"{r['arrays_node_bytes']:>14.1f} {r['total_mb']:>9.1f} "
+              f"{r['seconds']:>7.2f}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.check:
+        with open(args.check) as f:
+            baseline = json.load(f)
+        if check(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# Startup cost of the package: how long a fresh interpreter takes to import
+# each entry point, which heavy modules that drags in, and how long a
+# process pool worker takes to spawn and import the generator
+# Usage: python startup_bench.py [--repeats N] [--workers N]
+import argparse
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+
+import numpy as np
+
+HEAVY_MODULES = ["matplotlib", "pygraphviz", "PIL", "scipy"]
+IMPORT_TARGETS = ["dungeon_net", "dungeon_net.numerics",
+                  "dungeon_net.generation", "dungeon_net.simulation",
+                  "dungeon_net.viz"]
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import {target}
+dt = time.perf_counter() - t0
+print(json.dumps({{"seconds": dt, "heavy": [m for m in {heavy} if m in sys.modules]}}))
+"""
+
+
+def measure_import(target: str, repeats: int):
+    # Import "target" in fresh interpreters, returns the in-process import
+    # times and the heavy modules it loaded
+    times, heavy = [], []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c",
+                              PROBE.format(target=target, heavy=HEAVY_MODULES)],
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result["seconds"])
+        heavy = result["heavy"]
+    return np.array(times), heavy
+
+
+def worker_task(_):
+    import dungeon_net.generation  # noqa: F401
+    return time.perf_counter()
+
+
+def measure_worker_spawn(num_workers: int, context="spawn") -> float:
+    # Seconds from creating the pool until every worker has imported the
+    # generator and returned a result
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(num_workers,
+                             mp_context=mp.get_context(context)) as pool:
+        list(pool.map(worker_task, range(num_workers)))
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'import':<28} {'median ms':>10} {'max ms':>10}  heavy modules")
+    for target in IMPORT_TARGETS:
+        try:
+            times, heavy = measure_import(target, args.repeats)
+        except subprocess.CalledProcessError as e:
+            print(f"{target:<28} failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        print(f"{target:<28} {1e3 * np.median(times):>10.1f} "
+              f"{1e3 * times.max():>10.1f}  {', '.join(heavy) or '-'}")
+
+    spawn_time = measure_worker_spawn(args.workers)
+    print(f"\nSpawned {args.workers} workers importing dungeon_net.generation "
+          f"in {spawn_time:.3f} s ({1e3 * spawn_time / args.workers:.1f} ms/worker)")
+
+
+if __name__ == "__main__":
+    main()
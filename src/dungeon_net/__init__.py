@@ -1,3 +1,15 @@
-from . import numerics
-from . import generation
-from . import viz
+# Subpackages are imported on first attribute access, so processes that only
+# generate dungeons never load the visualization backends
+import importlib
+
+_SUBPACKAGES = ["numerics", "generation", "simulation", "io", "analysis", "spatial", "viz"]
+
+
+def __getattr__(name: str):
+    if name in _SUBPACKAGES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + _SUBPACKAGES)
@@ -0,0 +1 @@
+from .statistics import *
@@ -0,0 +1,235 @@
+# Seeded fuzzing of the generators: sweeps seeds and parameter combinations
+# through the chain, join, fill and dungeon generators, checks structural
+# invariants and enforces per-case time and memory budgets
+# Usage: python -m dungeon_net.analysis.fuzzing --cases 2000
+import argparse
+import signal
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.node import Node, Room
+from dungeon_net.generation.graph_arrays import NODE_TYPES
+from dungeon_net.generation.chain import generate_node_chain, generate_chain_join, fill_chain
+from dungeon_net.generation.dungeon import generate_chain_dungeon
+from dungeon_net.numerics.array_utils import normalize_matrix
+
+CASE_KINDS = ["dungeon", "join", "fill_chain"]
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+# Invariant checks, each returns a list of human readable violations
+def check_edge_counts(graph: nx.MultiDiGraph) -> List[str]:
+    return [f"{n.name} has {n.filled_edges}/{n.num_edges} filled edges"
+            for n in graph if n.filled_edges > n.num_edges]
+
+
+def check_connected(graph: nx.MultiDiGraph) -> List[str]:
+    if len(graph) and not nx.is_weakly_connected(graph):
+        return [f"{nx.number_weakly_connected_components(graph)} components"]
+    return []
+
+
+def check_unique_names(graph: nx.MultiDiGraph) -> List[str]:
+    counts = Counter(n.name for n in graph)
+    return [f"name {name} used {c} times" for name, c in counts.items() if c > 1]
+
+
+def check_goal_reachable(graph: nx.MultiDiGraph) -> List[str]:
+    names = {n.name: n for n in graph}
+    if "Entrance" not in names or "Goal" not in names:
+        return ["missing Entrance or Goal"]
+    if not nx.has_path(graph, names["Entrance"], names["Goal"]):
+        return ["Goal unreachable from Entrance"]
+    return []
+
+
+def check_no_free_edges(graph: nx.MultiDiGraph, skip_names=[]) -> List[str]:
+    return [f"{n.name} left with {n.filled_edges}/{n.num_edges} filled edges"
+            for n in graph if n.has_free_edges() and n.name not in skip_names]
+
+
+def random_prob_matrix(rng: np.random.Generator) -> np.ndarray:
+    # Random transition matrix in the spirit of the hand-written ones: no
+    # self transitions for Rooms and Junctions, Corridors lead somewhere
+    matrix = rng.random((3, 3)) * (rng.random((3, 3)) < 0.7)
+    matrix[0, 0] = matrix[2, 2] = 0.
+    matrix[[0, 2], 1] += 0.1
+    matrix[1, [0, 2]] += 0.1
+    return normalize_matrix(matrix)
+
+
+def random_params(case_seed: int) -> Dict:
+    # Parameters of one case, fully determined by "case_seed"
+    rng = np.random.default_rng(case_seed)
+    num_iter = int(rng.integers(1, 7))
+    return {
+        "kind": CASE_KINDS[case_seed % len(CASE_KINDS)],
+        "seed": case_seed,
+        "num_iter": num_iter,
+        "chain_lengths": {i: (int(rng.integers(2, 7)), int(rng.integers(1, 5)))
+                          for i in range(num_iter)},
+        "chain_prob_matrix": random_prob_matrix(rng),
+        "join_prob_matrix": random_prob_matrix(rng),
+        "max_fill_chain_length": int(rng.integers(1, 5)),
+        "fill_complexity": float(rng.choice([0.3, 0.5, 0.9])),
+        "fill_self_loop_prob": float(rng.choice([0., 0.1, 0.3])),
+    }
+
+
+def new_entrance() -> Room:
+    entrance = Room(2)
+    entrance.base_name = "Entrance"
+    entrance.name = "Entrance"
+    return entrance
+
+
+def run_case(params: Dict) -> Dict[str, List[str]]:
+    # Run one case and return {invariant: violations}
+    np.random.seed(params["seed"])
+    kind = params["kind"]
+    if kind == "dungeon":
+        result = generate_chain_dungeon(params["num_iter"],
+                                        params["chain_lengths"],
+                                        NODE_TYPES, NODE_TYPES,
+                                        params["chain_prob_matrix"],
+                                        params["join_prob_matrix"],
+                                        params["max_fill_chain_length"],
+                                        fill_complexity=params["fill_complexity"],
+                                        fill_self_loop_prob=params["fill_self_loop_prob"])
+        if result == -1:
+            return {"returns_dungeon": ["generate_chain_dungeon returned -1"]}
+        graph, _ = result
+        return {"edge_counts": check_edge_counts(graph),
+                "connected": check_connected(graph),
+                "unique_names": check_unique_names(graph),
+                "goal_reachable": check_goal_reachable(graph),
+                "no_free_edges": check_no_free_edges(graph, ["Entrance"])}
+
+    chain_length, join_length = params["chain_lengths"][0]
+    entrance = new_entrance()
+    previous_nodes: List[Node] = [entrance]
+    chain_1, previous_nodes = generate_node_chain(chain_length, NODE_TYPES,
+                                                  params["chain_prob_matrix"],
+                                                  entrance, previous_nodes, 1)
+    if kind == "join":
+        chain_2, previous_nodes = generate_node_chain(chain_length, NODE_TYPES,
+                                                      params["chain_prob_matrix"],
+                                                      entrance, previous_nodes, 2)
+        join, previous_nodes = generate_chain_join(chain_1, chain_2,
+                                                   join_length, NODE_TYPES,
+                                                   params["join_prob_matrix"],
+                                                   previous_nodes, 3)
+        graph = nx.compose(nx.compose(chain_1, chain_2), join)
+        return {"edge_counts": check_edge_counts(graph),
+                "connected": check_connected(graph),
+                "unique_names": check_unique_names(graph)}
+
+    graph, previous_nodes = fill_chain(chain_1, params["max_fill_chain_length"],
+                                       NODE_TYPES, params["chain_prob_matrix"],
+                                       previous_nodes, 2,
+                                       complexity=params["fill_complexity"],
+                                       self_loop_prob=params["fill_self_loop_prob"])
+    return {"edge_counts": check_edge_counts(graph),
+            "unique_names": check_unique_names(graph),
+            "no_free_edges": check_no_free_edges(graph, ["Entrance"])}
+
+
+def _on_alarm(signum, frame):
+    raise BudgetExceeded("time budget exceeded")
+
+
+def run_with_budget(params: Dict, time_budget: float,
+                    memory_budget_mb: float) -> Dict[str, List[str]]:
+    # "run_case" with a hard time limit (where SIGALRM is available) and a
+    # peak Python allocation limit measured with tracemalloc. Exceptions are
+    # reported as violations of the "no_exception" invariant
+    use_alarm = hasattr(signal, "setitimer")
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, time_budget)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        violations = run_case(params)
+    except BudgetExceeded as e:
+        violations = {"time_budget": [str(e)]}
+    except RecursionError:
+        violations = {"no_exception": ["RecursionError"]}
+    except Exception as e:
+        violations = {"no_exception": [f"{type(e).__name__}: {e}"]}
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    if elapsed > time_budget and "time_budget" not in violations:
+        violations["time_budget"] = [f"took {elapsed:.3f} s"]
+    if peak / 2**20 > memory_budget_mb:
+        violations["memory_budget"] = [f"peak {peak / 2**20:.1f} MB"]
+    return {k: v for k, v in violations.items() if v}
+
+
+def fuzz(num_cases: int, first_seed=0, time_budget=2., memory_budget_mb=64.,
+         kinds=CASE_KINDS, skip_invariants=[]) -> List[Dict]:
+    # Returns the failing cases as dicts of their parameters plus a
+    # "violations" entry
+    failures = []
+    for case_seed in range(first_seed, first_seed + num_cases):
+        params = random_params(case_seed)
+        if params["kind"] not in kinds:
+            continue
+        violations = run_with_budget(params, time_budget, memory_budget_mb)
+        violations = {k: v for k, v in violations.items()
+                      if k not in skip_invariants}
+        if violations:
+            failures.append(dict(params, violations=violations))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fuzz the dungeon generators")
+    parser.add_argument("--cases", type=int, default=1000)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--time-budget", type=float, default=2.,
+                        help="seconds per case")
+    parser.add_argument("--memory-budget", type=float, default=64.,
+                        help="peak MB of Python allocations per case")
+    parser.add_argument("--kinds", nargs="+", default=CASE_KINDS,
+                        choices=CASE_KINDS)
+    parser.add_argument("--skip", nargs="*", default=[],
+                        help="invariants to ignore")
+    parser.add_argument("--show", type=int, default=5,
+                        help="failing cases to print per invariant")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    failures = fuzz(args.cases, args.first_seed, args.time_budget,
+                    args.memory_budget, args.kinds, args.skip)
+    print(f"Ran {args.cases} cases in {time.perf_counter() - t0:.1f} s, "
+          f"{len(failures)} failed")
+    by_invariant: Dict[str, List[Dict]] = {}
+    for failure in failures:
+        for invariant in failure["violations"]:
+            by_invariant.setdefault(invariant, []).append(failure)
+    for invariant, cases in sorted(by_invariant.items()):
+        print(f"\n{invariant}: {len(cases)} cases")
+        for case in cases[:args.show]:
+            print(f"  seed {case['seed']} ({case['kind']}, "
+                  f"num_iter={case['num_iter']}, "
+                  f"max_fill_chain_length={case['max_fill_chain_length']}): "
+                  f"{case['violations'][invariant][0]}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# Distributions over large batches of dungeons, computed straight from the
+# columnar archive written by "dungeon-gen". A whole shard is treated as one
+# big disjoint graph so every statistic is a handful of array operations
+from typing import Dict
+import numpy as np
+
+from dungeon_net.generation.graph_arrays import NODE_TYPES
+from dungeon_net.generation.edges import ONE_WAY_FORWARD, ONE_WAY_BACK
+from dungeon_net.io.archive import ROLES, iter_shards
+from dungeon_net.numerics.csr import csr_bfs, csr_from_arcs, connected_component_labels
+
+# Degrees above this are counted in the last histogram bin
+MAX_DEGREE = 8
+# Archive columns read by "shard_statistics", names are never loaded
+STATISTICS_COLUMNS = ["node_type", "role", "u", "v", "direction"]
+
+
+def shard_statistics(shard: Dict[str, np.ndarray],
+                     max_degree=MAX_DEGREE) -> Dict[str, np.ndarray]:
+    # One row per dungeon of the shard. Degrees count every stored edge at
+    # both of its ends, distances follow one-way edges, and "cycles" is the
+    # cycle rank E - V + C of the undirected graph
+    node_offsets, edge_offsets = shard["node_offsets"], shard["edge_offsets"]
+    num_dungeons = len(shard["dungeon_id"])
+    nodes_per = np.diff(node_offsets)
+    edges_per = np.diff(edge_offsets)
+    num_nodes = int(node_offsets[-1])
+    node_dungeon = np.repeat(np.arange(num_dungeons), nodes_per)
+    edge_dungeon = np.repeat(np.arange(num_dungeons), edges_per)
+    # Global node ids across the shard
+    u = shard["u"] + node_offsets[edge_dungeon]
+    v = shard["v"] + node_offsets[edge_dungeon]
+
+    stats = {"dungeon_id": shard["dungeon_id"], "num_nodes": nodes_per,
+             "num_edges": edges_per}
+    type_counts = np.bincount(node_dungeon * len(NODE_TYPES) + shard["node_type"],
+                              minlength=num_dungeons * len(NODE_TYPES))
+    type_counts = type_counts.reshape(num_dungeons, len(NODE_TYPES))
+    for i, node_type in enumerate(NODE_TYPES):
+        stats[f"num_{node_type.__name__.lower()}"] = type_counts[:, i]
+
+    degree = (np.bincount(u, minlength=num_nodes)
+              + np.bincount(v, minlength=num_nodes))
+    binned = np.minimum(degree, max_degree)
+    degree_hist = np.bincount(node_dungeon * (max_degree + 1) + binned,
+                              minlength=num_dungeons * (max_degree + 1))
+    degree_hist = degree_hist.reshape(num_dungeons, max_degree + 1)
+    for d in range(max_degree + 1):
+        stats[f"degree_{d}"] = degree_hist[:, d]
+    dead_ends = np.bincount(node_dungeon[degree == 1], minlength=num_dungeons)
+    stats["dead_end_ratio"] = dead_ends / np.maximum(nodes_per, 1)
+
+    # Entrance -> Goal, one multi-source BFS over all dungeons at once
+    direction = shard["direction"]
+    forward = direction != ONE_WAY_BACK
+    back = direction != ONE_WAY_FORWARD
+    indptr, indices = csr_from_arcs(np.concatenate([u[forward], v[back]]),
+                                    np.concatenate([v[forward], u[back]]),
+                                    num_nodes)
+    role = shard["role"]
+    depth = csr_bfs(indptr, indices, np.flatnonzero(role == ROLES["Entrance"]))
+    goal_distance = np.full(num_dungeons, -1, dtype=np.int32)
+    goals = np.flatnonzero(role == ROLES["Goal"])
+    goal_distance[node_dungeon[goals]] = depth[goals]
+    stats["goal_distance"] = goal_distance
+    stats["unreachable"] = np.bincount(node_dungeon[depth < 0],
+                                       minlength=num_dungeons)
+
+    labels = connected_component_labels(u, v, num_nodes)
+    roots = labels == np.arange(num_nodes)
+    components = np.bincount(node_dungeon[roots], minlength=num_dungeons)
+    stats["components"] = components
+    stats["cycles"] = edges_per - nodes_per + components
+    return stats
+
+
+def archive_statistics(path: str, max_degree=MAX_DEGREE) -> Dict[str, np.ndarray]:
+    # Statistics of every dungeon in an archive, one row per dungeon
+    tables = [shard_statistics(shard, max_degree=max_degree)
+              for shard in iter_shards(path, columns=STATISTICS_COLUMNS)]
+    if not tables:
+        return {}
+    return {k: np.concatenate([t[k] for t in tables]) for k in tables[0]}
+
+
+def write_statistics(filename: str, stats: Dict[str, np.ndarray]):
+    # Columnar table: ".npz" with one array per column, or ".csv"
+    if filename.endswith(".csv"):
+        names = list(stats)
+        table = np.column_stack([stats[k] for k in names])
+        np.savetxt(filename, table, delimiter=",", header=",".join(names),
+                   comments="", fmt="%.6g")
+    else:
+        np.savez(filename, **stats)
+
+
+def summarize_statistics(stats: Dict[str, np.ndarray]) -> Dict[str, Dict[str, float]]:
+    # Mean, standard deviation and quartiles of every column
+    summary = {}
+    for name, values in stats.items():
+        if name == "dungeon_id":
+            continue
+        values = values.astype(float)
+        q25, q50, q75 = np.percentile(values, [25, 50, 75])
+        summary[name] = {"mean": values.mean(), "std": values.std(),
+                         "min": values.min(), "q25": q25, "median": q50,
+                         "q75": q75, "max": values.max()}
+    return summary
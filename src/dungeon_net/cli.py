@@ -0,0 +1,275 @@
+# Batch dungeon generation from the command line, installed as "dungeon-gen"
+# and "dungeon-stats"
+# Usage:
+#   dungeon-gen --write-config config.json
+#   dungeon-gen config.json --seeds 0:1000000 --workers 16 --out dungeons/
+#   dungeon-gen config.json --seeds 0:100000 --tensors tensors/ --tensor-format npy
+#   dungeon-stats dungeons/ --out stats.npz
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import ExitStack
+from itertools import islice
+from typing import Dict, Tuple
+import numpy as np
+
+# Same settings as "scripts/dungeon_gen.py"
+DEFAULT_CONFIG = {
+    "num_iter": 5,
+    "node_types": ["Room", "Corridor", "Junction"],
+    "chain_node_types": None,  # defaults to "node_types"
+    "join_node_types": None,  # defaults to "node_types"
+    "chain_prob_matrix": [[0.0, 1.0, 0.0],
+                          [0.9, 0.0, 0.1],
+                          [0.0, 1.0, 0.0]],
+    "join_prob_matrix": [[0.0, 1.0, 0.0],
+                         [0.3, 0.0, 0.7],
+                         [0.0, 1.0, 0.0]],
+    # Either [chain, join] for every iteration or {iteration: [chain, join]}
+    "chain_lengths": {"0": [4, 2], "1": [3, 2], "2": [3, 2], "3": [3, 2],
+                      "4": [3, 2]},
+    "max_fill_chain_length": 2,
+    "fill_complexity": 0.5,
+    "fill_self_loop_prob": 0.1,
+}
+
+
+def load_config(filename: str) -> Dict:
+    config = dict(DEFAULT_CONFIG)
+    with open(filename) as f:
+        config.update(json.load(f))
+    return config
+
+
+def parse_seeds(seeds: str) -> range:
+    # "start:stop" (stop exclusive) or a single seed
+    if ":" in seeds:
+        start, stop = seeds.split(":")
+        return range(int(start), int(stop))
+    return range(int(seeds), int(seeds) + 1)
+
+
+def generation_args(config: Dict) -> Tuple:
+    # Positional arguments for "generate_chain_dungeon" from a config
+    from dungeon_net.generation import Room, Corridor, Junction
+    from dungeon_net.numerics import normalize_matrix
+    types = {"Room": Room, "Corridor": Corridor, "Junction": Junction}
+    node_types = [types[t] for t in config["node_types"]]
+    chain_node_types = [types[t] for t in
+                        config["chain_node_types"] or config["node_types"]]
+    join_node_types = [types[t] for t in
+                       config["join_node_types"] or config["node_types"]]
+    chain_lengths = config["chain_lengths"]
+    if isinstance(chain_lengths, dict):
+        chain_lengths = {int(k): tuple(v) for k, v in chain_lengths.items()}
+    else:
+        chain_lengths = tuple(chain_lengths)
+    chain_prob_matrix = normalize_matrix(
+        np.array(config["chain_prob_matrix"], dtype=float))
+    join_prob_matrix = normalize_matrix(
+        np.array(config["join_prob_matrix"], dtype=float))
+    assert len(node_types) == len(chain_prob_matrix)
+    return (config["num_iter"], chain_lengths, chain_node_types,
+            join_node_types, chain_prob_matrix, join_prob_matrix,
+            config["max_fill_chain_length"])
+
+
+# Chunks of seeds in flight per worker, bounds how far the workers can run
+# ahead of the writer
+CHUNKS_PER_WORKER = 4
+# Per-process state so each worker parses the config only once
+_worker_state = {}
+
+
+def _init_worker(config: Dict, render_dir: str):
+    _worker_state["args"] = generation_args(config)
+    _worker_state["config"] = config
+    _worker_state["render_dir"] = render_dir
+
+
+def _generate(seed: int):
+    # Runs in a worker: returns (seed, columns, seconds) or (seed, None,
+    # traceback) if the generator failed for this seed
+    from dungeon_net.generation import generate_chain_dungeon
+    from dungeon_net.io.archive import dungeon_columns
+    config = _worker_state["config"]
+    t0 = time.perf_counter()
+    np.random.seed(seed)
+    try:
+        result = generate_chain_dungeon(*_worker_state["args"],
+                                        fill_complexity=config["fill_complexity"],
+                                        fill_self_loop_prob=config["fill_self_loop_prob"])
+    except Exception:
+        return seed, None, traceback.format_exc()
+    if result == -1:
+        return seed, None, "invalid chain_lengths"
+    dungeon, _ = result
+    columns = dungeon_columns(dungeon)
+    if _worker_state["render_dir"]:
+        from dungeon_net.viz.raster import render_dungeon
+        render_dungeon(dungeon, os.path.join(_worker_state["render_dir"],
+                                             f"dungeon_{seed}.png"))
+    return seed, columns, time.perf_counter() - t0
+
+
+def _generate_chunk(seeds: range):
+    return [_generate(seed) for seed in seeds]
+
+
+def generate_results(pool: ProcessPoolExecutor, seeds: range, chunksize: int,
+                     window: int):
+    # "_generate" results of every seed, a chunk at a time in completion
+    # order. At most "window" chunks are submitted and not yet consumed, so
+    # memory does not grow with the number of seeds (unlike "pool.map",
+    # which submits everything up front and keeps results in order)
+    chunks = (seeds[i:i + chunksize] for i in range(0, len(seeds), chunksize))
+    pending = {pool.submit(_generate_chunk, chunk)
+               for chunk in islice(chunks, window)}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            for chunk in islice(chunks, 1):
+                pending.add(pool.submit(_generate_chunk, chunk))
+            yield from future.result()
+
+
+def peak_memory_mb() -> Tuple[float, float]:
+    # Peak resident memory of this process and of the largest of its
+    # (finished) children, the OS does not report a sum over the children
+    try:
+        import resource
+    except ImportError:
+        return float("nan"), float("nan")
+    scale = 1 / 1024 if sys.platform != "darwin" else 1 / 1024**2
+    return (scale * resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            scale * resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="dungeon-gen",
+                                     description="Generate batches of dungeons")
+    parser.add_argument("config", nargs="?",
+                        help="JSON generation config, see --write-config")
+    parser.add_argument("--seeds", default="0:100",
+                        help="seed or seed range start:stop (default 0:100)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (default: all CPUs)")
+    parser.add_argument("--out", default="dungeons",
+                        help="output archive directory")
+    parser.add_argument("--shard-size", type=int, default=10000,
+                        help="dungeons per archive shard")
+    parser.add_argument("--compress", action="store_true",
+                        help="compress archive shards")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="replace an existing archive in --out")
+    parser.add_argument("--render", metavar="DIR",
+                        help="also render every dungeon as a PNG into DIR")
+    parser.add_argument("--tensors", metavar="DIR",
+                        help="also write padded tensor shards into DIR")
+    parser.add_argument("--tensor-format", choices=["npz", "npy"], default="npz",
+                        help="tensor shard format, npy shards can be memory-mapped")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="dungeons per tensor shard")
+    parser.add_argument("--dense", action="store_true",
+                        help="include dense adjacency matrices in tensor shards, "
+                        "at most 256 MB of them per shard (fewer dungeons per "
+                        "shard in large buckets), dungeons of more than 16384 "
+                        "nodes are refused")
+    parser.add_argument("--chunksize", type=int, default=64,
+                        help="seeds handed to a worker at a time")
+    parser.add_argument("--write-config", metavar="FILE",
+                        help="write the default config to FILE and exit")
+    args = parser.parse_args(argv)
+
+    if args.write_config:
+        with open(args.write_config, "w") as f:
+            json.dump(DEFAULT_CONFIG, f, indent=2)
+        return 0
+    config = load_config(args.config) if args.config else dict(DEFAULT_CONFIG)
+    seeds = parse_seeds(args.seeds)
+    if args.render:
+        os.makedirs(args.render, exist_ok=True)
+
+    from dungeon_net.io.archive import DungeonArchiveWriter
+    from dungeon_net.io.tensors import TensorShardWriter
+    timings = np.zeros(len(seeds))
+    num_done, failures = 0, []
+    t0 = time.perf_counter()
+    with ExitStack() as stack:
+        writer = stack.enter_context(DungeonArchiveWriter(
+            args.out, shard_size=args.shard_size, compress=args.compress,
+            overwrite=args.overwrite))
+        tensor_writer = None
+        if args.tensors:
+            tensor_writer = stack.enter_context(TensorShardWriter(
+                args.tensors, batch_size=args.batch_size, dense=args.dense,
+                fmt=args.tensor_format, compress=args.compress))
+        pool = stack.enter_context(ProcessPoolExecutor(
+            args.workers, initializer=_init_worker,
+            initargs=(config, args.render)))
+        for seed, columns, info in generate_results(
+                pool, seeds, args.chunksize, args.workers * CHUNKS_PER_WORKER):
+            if columns is None:
+                failures.append((seed, info))
+                continue
+            writer.add(seed, columns)
+            if tensor_writer is not None:
+                tensor_writer.add(seed, columns)
+            timings[num_done] = info
+            num_done += 1
+    elapsed = time.perf_counter() - t0
+
+    timings = timings[:num_done]
+    print(f"Generated {num_done} dungeons in {elapsed:.2f} s "
+          f"({num_done / elapsed:.1f} dungeons/s) into {args.out} "
+          f"({writer.num_shards} shards)")
+    if num_done:
+        p50, p90, p99 = np.percentile(timings, [50, 90, 99]) * 1e3
+        print(f"Per dungeon: p50 {p50:.2f} ms, p90 {p90:.2f} ms, "
+              f"p99 {p99:.2f} ms, max {timings.max() * 1e3:.2f} ms")
+    if tensor_writer is not None:
+        print(f"Tensors: {sum(tensor_writer.num_shards.values())} shards in "
+              f"{len(tensor_writer.num_shards)} buckets into {args.tensors}, "
+              f"{tensor_writer.packer.padding_ratio():.2f} node slots per node")
+    parent_mb, worker_mb = peak_memory_mb()
+    print(f"Peak memory: parent {parent_mb:.1f} MB, "
+          f"largest worker {worker_mb:.1f} MB")
+    if failures:
+        seed, info = min(failures)
+        print(f"{len(failures)} seeds failed, first: seed {seed}:\n{info}")
+        return 1
+    return 0
+
+
+def stats_main(argv=None):
+    parser = argparse.ArgumentParser(prog="dungeon-stats",
+                                     description="Statistics of a dungeon archive")
+    parser.add_argument("archive", help="archive directory from dungeon-gen")
+    parser.add_argument("--out", default="stats.npz",
+                        help="output table, .npz or .csv")
+    args = parser.parse_args(argv)
+
+    from dungeon_net.analysis.statistics import (archive_statistics,
+                                                 summarize_statistics,
+                                                 write_statistics)
+    t0 = time.perf_counter()
+    stats = archive_statistics(args.archive)
+    if not stats:
+        print(f"No shards found in {args.archive}")
+        return 1
+    write_statistics(args.out, stats)
+    print(f"Statistics of {len(stats['dungeon_id'])} dungeons in "
+          f"{time.perf_counter() - t0:.2f} s written to {args.out}")
+    print(f"{'column':<16} {'mean':>9} {'std':>9} {'min':>9} {'median':>9} {'max':>9}")
+    for name, s in summarize_statistics(stats).items():
+        print(f"{name:<16} {s['mean']:>9.3f} {s['std']:>9.3f} {s['min']:>9.3f} "
+              f"{s['median']:>9.3f} {s['max']:>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,12 @@
 from .node import *
 from .node_utils import *
 from .chain import *
-from .dungeon import *
\ No newline at end of file
+from .chain_registry import *
+from .dungeon import *
+from .goal import *
+from .edges import *
+from .graph_arrays import *
+from .distance_oracle import *
+from .population import *
+from .regeneration import *
+from .dungeon_graph import *
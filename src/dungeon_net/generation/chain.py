@@ -5,15 +5,20 @@ from typing import List, Tuple
 
 from dungeon_net.generation.node import Node, Corridor, Room, Junction
 from dungeon_net.generation.node_utils import new_node_name
+from dungeon_net.generation.edges import TWO_WAY, ONE_WAY_FORWARD, ONE_WAY_BACK
 
 
 def add_edge_to_chain(chain: nx.MultiDiGraph, previous_node: Node,
-                      new_node: Node, chain_num: int) -> nx.MultiDiGraph:
+                      new_node: Node, chain_num: int,
+                      direction=TWO_WAY) -> nx.MultiDiGraph:
     # Adds the node and then the edge to the chain, increasing the number
-    # of filled edges of both
+    # of filled edges of both. "direction" is one of the flags from
+    # "edges", one-way edges only add the arc that can be traversed
     chain.add_node(new_node, chain_num=chain_num)
-    chain.add_edge(previous_node, new_node)
-    chain.add_edge(new_node, previous_node)
+    if direction != ONE_WAY_BACK:
+        chain.add_edge(previous_node, new_node)
+    if direction != ONE_WAY_FORWARD:
+        chain.add_edge(new_node, previous_node)
     previous_node.filled_edges += 1
     new_node.filled_edges += 1
 
@@ -0,0 +1,172 @@
+# Chain bookkeeping without duplicated graphs: every node is created once,
+# appended to the "previous_nodes" naming list and added to the dungeon, so
+# a chain is recorded as the ranges of "previous_nodes" it created plus the
+# existing nodes it attaches to. Chains are read back as zero-copy views of
+# the dungeon
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import networkx as nx
+
+from dungeon_net.generation.node import Node
+
+CHAIN_KINDS = ["chain", "join", "fill", "goal"]
+
+
+def merge_chain(dungeon: nx.MultiDiGraph, chain: nx.MultiDiGraph,
+                update=True) -> nx.MultiDiGraph:
+    # Add a generated chain's nodes and edges to the dungeon in place. Like
+    # "nx.compose(dungeon, chain)", the chain's node data overwrites that of
+    # nodes already in the dungeon (e.g. the node it starts from), unless
+    # "update" is False in which case they keep their data
+    if update:
+        dungeon.add_nodes_from(chain.nodes(data=True))
+    else:
+        dungeon.add_nodes_from((n, d) for n, d in chain.nodes(data=True)
+                               if n not in dungeon)
+    dungeon.add_edges_from(chain.edges(keys=True, data=True))
+    return dungeon
+
+
+class ChainRecord:
+    # Chain "key" created nodes[start:stop] of its registry's node list for
+    # every (start, stop) of "ranges" (more than one once regenerated).
+    # "head" are the existing nodes it starts from and "tail" the existing
+    # nodes it ends on (e.g. the end of a join)
+    def __init__(self, key: str, chain_num: int, kind: str,
+                 ranges: Sequence[Tuple[int, int]], head: Sequence[Node] = (),
+                 tail: Sequence[Node] = ()) -> None:
+        self.key = key
+        self.chain_num = chain_num
+        self.kind = kind
+        self.ranges = list(ranges)
+        self.head = tuple(head)
+        self.tail = tuple(tail)
+
+    @property
+    def start(self) -> int:
+        return self.ranges[0][0]
+
+    @property
+    def stop(self) -> int:
+        return self.ranges[-1][1]
+
+    def num_created(self) -> int:
+        return sum(stop - start for start, stop in self.ranges)
+
+    def __repr__(self) -> str:
+        ranges = ", ".join(f"{start}:{stop}" for start, stop in self.ranges)
+        return (f"ChainRecord({self.key!r}, chain_num={self.chain_num}, "
+                f"kind={self.kind!r}, nodes[{ranges}])")
+
+
+class ChainNodes:
+    # Node filter for "nx.subgraph_view" that networkx iterates directly
+    # (via ".nodes") instead of scanning the whole dungeon, in chain order
+    def __init__(self, nodes: Dict[Node, None]) -> None:
+        self.nodes = nodes
+
+    def __call__(self, node: Node) -> bool:
+        return node in self.nodes
+
+
+class ChainRegistry(Mapping):
+    # Read-only mapping of chain key -> view of the chain in "dungeon", in
+    # registration order. "nodes" is the dungeon's "previous_nodes" list,
+    # which must only ever be appended to. A view shows the chain's nodes
+    # still in the dungeon (head, created nodes, tail) and every edge
+    # touching a created node
+    def __init__(self, dungeon: nx.MultiDiGraph, nodes: List[Node]) -> None:
+        self.dungeon = dungeon
+        self.nodes = nodes
+        self.records: Dict[str, ChainRecord] = {}
+        self._key_counts: Dict[str, int] = {}
+
+    # Mapping interface
+    def __getitem__(self, key: str) -> nx.MultiDiGraph:
+        return self.view(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    # Registration
+    def next_key(self, prefix: str) -> str:
+        # "prefix" numbered from 1, e.g. "3_F1", "3_F2", ...
+        count = self._key_counts.get(prefix, 0) + 1
+        self._key_counts[prefix] = count
+        return f"{prefix}{count}"
+
+    def register(self, key: str, chain_num: int, kind: str, start: int,
+                 stop: Optional[int] = None, head: Sequence[Node] = (),
+                 tail: Sequence[Node] = ()) -> ChainRecord:
+        # Record (or replace) chain "key" as nodes[start:stop], by default
+        # everything appended since "start"
+        if kind not in CHAIN_KINDS:
+            raise ValueError(f"kind must be one of {CHAIN_KINDS}, not {kind}")
+        stop = len(self.nodes) if stop is None else stop
+        record = ChainRecord(key, chain_num, kind, [(start, stop)], head, tail)
+        self.records[key] = record
+        return record
+
+    def extend(self, key: str, chain: nx.MultiDiGraph, start: int) -> ChainRecord:
+        # Add the nodes appended since "start" (generated into the scratch
+        # graph "chain") to chain "key", e.g. after regenerating part of it.
+        # Nodes it already had keep belonging to it while in the dungeon
+        record = self.record(key)
+        created = set(self.nodes[start:])
+        known = set(record.head) | set(record.tail)
+        attached = [n for n in chain if n not in created and n not in known]
+        record.ranges.append((start, len(self.nodes)))
+        record.tail += tuple(attached)
+        return record
+
+    def add(self, key: str, chain_num: int, kind: str, chain: nx.MultiDiGraph,
+            start: int) -> ChainRecord:
+        # Record a chain generated into the scratch graph "chain" while
+        # appending to the node list from "start" on. Its other nodes are
+        # the existing ones it attached to: the first is its head, the rest
+        # its tail
+        created = set(self.nodes[start:])
+        attached = [n for n in chain if n not in created]
+        return self.register(key, chain_num, kind, start, head=attached[:1],
+                             tail=attached[1:])
+
+    # Lookup
+    def record(self, key: str) -> ChainRecord:
+        if key not in self.records:
+            raise KeyError(f"No chain '{key}' in chain registry")
+        return self.records[key]
+
+    def resolve(self, chain: Union[int, str]) -> str:
+        # Key of a chain given as a key ("2_C2", "3_F1", "Goal") or as a
+        # chain_num (the first chain registered with it)
+        if isinstance(chain, str):
+            return self.record(chain).key
+        for key, record in self.records.items():
+            if record.chain_num == chain:
+                return key
+        raise KeyError(f"No chain with chain_num {chain} in chain registry")
+
+    def keys_of_kind(self, kind: str) -> List[str]:
+        return [k for k, r in self.records.items() if r.kind == kind]
+
+    def _created(self, record: ChainRecord) -> Dict[Node, None]:
+        created = {}
+        for start, stop in record.ranges:
+            created.update(dict.fromkeys(self.nodes[start:stop]))
+        return created
+
+    def created_nodes(self, key: str) -> List[Node]:
+        # Nodes created by the chain that are still in the dungeon
+        return [n for n in self._created(self.record(key)) if n in self.dungeon]
+
+    def view(self, key: str) -> nx.MultiDiGraph:
+        record = self.record(key)
+        created = self._created(record)
+        members = dict.fromkeys(record.head)
+        members.update(created)
+        members.update(dict.fromkeys(record.tail))
+        return nx.subgraph_view(self.dungeon, filter_node=ChainNodes(members),
+                                filter_edge=lambda u, v, k: u in created or v in created)
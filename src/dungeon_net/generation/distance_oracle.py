@@ -0,0 +1,241 @@
+# Precomputed distance queries for in-game AI: built once per dungeon, then
+# every query is a batch of node ids answered by array indexing. Important
+# targets (Entrance, Goal, Junctions) get exact distance and next-hop
+# tables, arbitrary pairs are exact for dungeons up to "max_pair_nodes"
+# nodes (all-pairs table) and bounded by the targets as landmarks otherwise.
+# Node ids are DungeonArrays (= graph) order, distances follow one-way edges.
+# Memory: the three target tables hold T * N entries each for T targets and
+# N nodes, in int16 up to 32767 nodes (int32 above), plus N * N int16 for
+# the all-pairs table of small dungeons. Junctions are a fixed fraction of
+# the nodes, so taking every one as a target would grow the tables
+# quadratically: at most "junctions" of them (the best connected) are used,
+# which bounds the tables to about 3 * (2 + junctions) * N entries
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+
+from dungeon_net.generation.node import Junction
+from dungeon_net.generation.graph_arrays import DungeonArrays
+from dungeon_net.numerics.csr import csr_multi_bfs, csr_from_arcs, expand_csr_rows
+
+DEFAULT_TARGETS = ["Entrance", "Goal"]
+# Default number of Junctions used as targets
+MAX_JUNCTION_TARGETS = 64
+# Largest dungeon for which all pairwise distances are stored (int16)
+MAX_PAIR_NODES = 2048
+# Targets searched together while building, bounds the temporary arrays to
+# about TARGET_BLOCK * (N + E) entries
+TARGET_BLOCK = 32
+
+
+def node_dtype(num_nodes: int):
+    # Smallest integer type holding every node id and hop distance, and -1
+    return np.int16 if num_nodes <= np.iinfo(np.int16).max else np.int32
+
+
+def first_valid_arc(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray,
+                    valid) -> np.ndarray:
+    # For every node of "rows", the first neighbour "w" (CSR order) for
+    # which valid(query, w) holds, -1 if there is none. "valid" gets the
+    # query number and neighbour of every candidate arc
+    counts = indptr[rows + 1] - indptr[rows]
+    query = np.repeat(np.arange(len(rows)), counts)
+    neighbour = indices[expand_csr_rows(indptr, rows)].astype(np.int64)
+    ok = valid(query, neighbour)
+    hop = np.full(len(rows), -1, dtype=np.int32)
+    # Arcs are grouped by query, so the first ok arc of a query is the
+    # first occurrence of its number
+    found, first = np.unique(query[ok], return_index=True)
+    hop[found] = neighbour[ok][first]
+    return hop
+
+
+class DistanceOracle:
+    # "targets[k]" is the node id of target slot "k" (named
+    # "target_names[k]"), "to_target[k, v]" the hop distance from node "v"
+    # to it, "from_target[k, v]" the distance from it to "v" and
+    # "next_hop[k, v]" the neighbour of "v" one step closer to it (-1 at
+    # the target or where unreachable). "pairs[a, b]" is the distance from
+    # "a" to "b" if the dungeon was small enough, else None. "indptr" /
+    # "indices" are the dungeon's adjacency and "names" its node names,
+    # used to match the oracle to the dungeon
+    def __init__(self, names: np.ndarray, indptr: np.ndarray, indices: np.ndarray,
+                 targets: np.ndarray, target_names: List[str],
+                 to_target: np.ndarray, from_target: np.ndarray,
+                 next_hop: np.ndarray, pairs: Optional[np.ndarray] = None) -> None:
+        self.names = names
+        self.indptr = indptr
+        self.indices = indices
+        self.targets = targets
+        self.target_names = target_names
+        self.to_target = to_target
+        self.from_target = from_target
+        self.next_hop = next_hop
+        self.pairs = pairs
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def from_arrays(cls, arrays: DungeonArrays, target_names=DEFAULT_TARGETS,
+                    junctions=MAX_JUNCTION_TARGETS, max_pair_nodes=MAX_PAIR_NODES):
+        # Targets are the nodes called "target_names" (missing ones are
+        # skipped) and Junctions: the "junctions" with the highest degree
+        # (ties in node order), all of them if True, none if False
+        num_nodes = arrays.num_nodes
+        targets, names = [], []
+        for name in target_names:
+            i = arrays.index_of_name(name)
+            if i >= 0:
+                targets.append(i)
+                names.append(name)
+        if junctions is not False:
+            candidates = np.flatnonzero(arrays.node_type == Junction.type_code)
+            if junctions is not True:
+                order = np.argsort(-arrays.degrees()[candidates], kind="stable")
+                candidates = np.sort(candidates[order[:junctions]])
+            for i in candidates:
+                if i not in targets:
+                    targets.append(int(i))
+                    names.append(arrays.nodes[i].name)
+        targets = np.array(targets, dtype=np.int64)
+
+        indptr, indices = arrays.indptr, arrays.indices
+        sources = np.repeat(np.arange(num_nodes), arrays.degrees())
+        back_indptr, back_indices = csr_from_arcs(indices.astype(np.int64), sources,
+                                                  num_nodes)
+        dtype = node_dtype(num_nodes)
+        shape = (len(targets), num_nodes)
+        to_target = np.empty(shape, dtype=dtype)
+        from_target = np.empty(shape, dtype=dtype)
+        next_hop = np.empty(shape, dtype=dtype)
+        for start in range(0, len(targets), TARGET_BLOCK):
+            block = slice(start, start + TARGET_BLOCK)
+            from_target[block] = csr_multi_bfs(indptr, indices, targets[block])
+            to_block = csr_multi_bfs(back_indptr, back_indices, targets[block])
+            to_target[block] = to_block
+            # Next hop of every (target, node): the first arc v -> w with w
+            # one step closer to the target
+            slot, node = np.divmod(np.arange(to_block.size), num_nodes)
+            dist = to_block.reshape(-1)
+            next_hop[block] = first_valid_arc(
+                indptr, indices, node,
+                lambda q, w: (dist[q] > 0) & (to_block[slot[q], w] == dist[q] - 1)
+            ).reshape(to_block.shape)
+
+        pairs = None
+        if num_nodes <= max_pair_nodes:
+            pairs = csr_multi_bfs(indptr, indices,
+                                  np.arange(num_nodes)).astype(np.int16)
+        return cls(np.array([n.name for n in arrays.nodes]), indptr, indices,
+                   targets, names, to_target, from_target, next_hop, pairs)
+
+    # Targets
+    def target_slot(self, target: Union[str, int]) -> int:
+        # Slot of a target given by name or node id
+        if isinstance(target, str):
+            if target not in self.target_names:
+                raise KeyError(f"No target '{target}' in distance oracle")
+            return self.target_names.index(target)
+        slots = np.flatnonzero(self.targets == target)
+        if not len(slots):
+            raise KeyError(f"Node {target} is not a distance oracle target")
+        return int(slots[0])
+
+    def distance_to_target(self, slots, nodes) -> np.ndarray:
+        # Distance from every node to its target slot, -1 if unreachable.
+        # "slots" and "nodes" are broadcast against each other
+        return self.to_target[slots, nodes]
+
+    def distance_from_target(self, slots, nodes) -> np.ndarray:
+        return self.from_target[slots, nodes]
+
+    def next_hop_to_target(self, slots, nodes) -> np.ndarray:
+        # Neighbour one step closer to the target, -1 at the target itself
+        # or if it is unreachable
+        return self.next_hop[slots, nodes]
+
+    # Arbitrary pairs
+    def distance(self, sources, targets) -> np.ndarray:
+        # Exact distance of every (source, target), -1 if unreachable. Needs
+        # the all-pairs table, see "distance_bounds" otherwise
+        if self.pairs is None:
+            raise ValueError(f"Dungeon of {self.num_nodes} nodes has no all-pairs "
+                             "table, use distance_bounds")
+        return self.pairs[sources, targets]
+
+    def distance_bounds(self, sources, targets) -> Tuple[np.ndarray, np.ndarray]:
+        # (lower, upper) bounds of every distance from the targets used as
+        # landmarks (triangle inequality). Upper is -1 if no path through a
+        # landmark is known, which includes every unreachable pair
+        sources, targets = np.broadcast_arrays(np.asarray(sources),
+                                               np.asarray(targets))
+        # int32 so that sums of two int16 distances cannot overflow
+        to_a, to_b = (self.to_target[:, nodes].astype(np.int32)
+                      for nodes in (sources, targets))
+        from_a, from_b = (self.from_target[:, nodes].astype(np.int32)
+                          for nodes in (sources, targets))
+        both_to = (to_a >= 0) & (to_b >= 0)
+        both_from = (from_a >= 0) & (from_b >= 0)
+        lower = np.maximum(np.where(both_to, to_a - to_b, 0).max(axis=0, initial=0),
+                           np.where(both_from, from_b - from_a, 0).max(axis=0, initial=0))
+        via = np.where((to_a >= 0) & (from_b >= 0), to_a + from_b, np.iinfo(np.int32).max)
+        upper = via.min(axis=0, initial=np.iinfo(np.int32).max)
+        upper = np.where(upper == np.iinfo(np.int32).max, -1, upper)
+        same = sources == targets
+        return np.where(same, 0, lower), np.where(same, 0, upper)
+
+    def next_hop_towards(self, sources, targets) -> np.ndarray:
+        # Neighbour of every source one step closer to its target, -1 if the
+        # source is the target or cannot reach it. Needs the all-pairs table
+        if self.pairs is None:
+            raise ValueError(f"Dungeon of {self.num_nodes} nodes has no all-pairs "
+                             "table, use next_hop_to_target")
+        sources = np.asarray(sources, dtype=np.int64).reshape(-1)
+        targets = np.asarray(targets, dtype=np.int64).reshape(-1)
+        dist = self.pairs[sources, targets]
+        return first_valid_arc(
+            self.indptr, self.indices, sources,
+            lambda q, w: (dist[q] > 0) & (self.pairs[w, targets[q]] == dist[q] - 1))
+
+    # Storage
+    def to_columns(self, prefix="oracle_") -> Dict[str, np.ndarray]:
+        # The adjacency is not stored, it comes from the dungeon saved
+        # alongside (see "from_columns")
+        columns = {"names": self.names, "targets": self.targets,
+                   "target_names": np.array(self.target_names, dtype=str),
+                   "to_target": self.to_target, "from_target": self.from_target,
+                   "next_hop": self.next_hop}
+        if self.pairs is not None:
+            columns["pairs"] = self.pairs
+        return {prefix + k: v for k, v in columns.items()}
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray], arrays: DungeonArrays,
+                     prefix="oracle_"):
+        # Oracle stored by "to_columns" for the dungeon of "arrays", whose
+        # adjacency it uses from then on
+        columns = {k[len(prefix):]: v for k, v in columns.items()
+                   if k.startswith(prefix)}
+        names = np.array([n.name for n in arrays.nodes])
+        if not np.array_equal(columns["names"], names):
+            raise ValueError("Distance oracle was saved for a different dungeon")
+        return cls(names, arrays.indptr, arrays.indices,
+                   columns["targets"], columns["target_names"].tolist(),
+                   columns["to_target"], columns["from_target"],
+                   columns["next_hop"], columns.get("pairs"))
+
+    def matches(self, arrays: DungeonArrays) -> bool:
+        # Whether the oracle was built for this dungeon: the same node
+        # names in the same order and the same arcs, in any CSR order
+        if not np.array_equal(self.names, [n.name for n in arrays.nodes]):
+            return False
+        return np.array_equal(arc_keys(self.indptr, self.indices),
+                              arc_keys(arrays.indptr, arrays.indices))
+
+
+def arc_keys(indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    # Sorted "source * N + target" of every arc of a CSR adjacency
+    num_nodes = len(indptr) - 1
+    sources = np.repeat(np.arange(num_nodes), np.diff(indptr))
+    return np.sort(sources * num_nodes + indices)
@@ -1,11 +1,13 @@
 # Functions for generating dungeons
-from typing import Dict, List, Union, Tuple
+from typing import Dict, List, Optional, Union, Tuple
 import networkx as nx
 import numpy as np
 
 from dungeon_net.generation.node import Node, Room, Corridor
-from dungeon_net.generation.node_utils import new_node_name
+from dungeon_net.generation.node_utils import NodeNames, new_node_name
 from dungeon_net.generation.chain import generate_node_chain, generate_chain_join, add_edge_to_chain
+from dungeon_net.generation.goal import place_goal
+from dungeon_net.generation.chain_registry import ChainRegistry, merge_chain
 
 
 def generate_chain_dungeon(num_iter: int, chain_lengths: Union[Tuple, Dict],
@@ -16,7 +18,10 @@ def generate_chain_dungeon(num_iter: int, chain_lengths: Union[Tuple, Dict],
                            max_fill_chain_length: int,
                            fill_complexity=0.5,
                            fill_self_loop_prob=0.1,
-                           debug=False) -> Tuple[nx.MultiDiGraph, Dict[str, nx.MultiDiGraph]]:
+                           goal_percentile=0.85,
+                           goal_branch="any",
+                           tower_defense=False,
+                           debug=False) -> Tuple[nx.MultiDiGraph, ChainRegistry]:
     # Generates a dungeon with "num_iter" iterations, meant to be a quick
     # way to generate a bunch of interconnected chains
     # "chain_lengths" is either a Tuple[int, int] (chain, join) where the
@@ -27,16 +32,23 @@ def generate_chain_dungeon(num_iter: int, chain_lengths: Union[Tuple, Dict],
     # Each iteration creates 2 chains from a starting node and joins them
     # "chain_prob_matrix" is used for all chains, "join_prob_matrix" is
     # used for all joins
+    # The Goal is placed last with "place_goal", "goal_percentile" of the
+    # way through the dungeon on a Room matching "goal_branch", or next to
+    # the Entrance for "tower_defense" missions
+    # Returns the dungeon and a ChainRegistry of views of its chains: "{i}_C",
+    # "{i}_C2" and "{i}_J1" per iteration, every fill ("{num_iter}_F1",
+    # "{num_iter}_F2", ...) and "Goal"
     # For finer control in generating dungeons, use the other generating
     # functions directly
     entrance = Room(2)
     entrance.base_name = "Entrance"
     entrance.name = "Entrance"
-    previous_nodes = [entrance]
+    previous_nodes = NodeNames([entrance])
     chain_num = 1
     # Storage for generated dungeon
     dungeon = nx.MultiDiGraph()  # the full graph
-    chain_dict = {}  # all the individual chains
+    # all the individual chains, as views of "dungeon"
+    chain_dict = ChainRegistry(dungeon, previous_nodes)
 
     for i in range(num_iter):
         if isinstance(chain_lengths, Dict):
@@ -62,6 +74,7 @@ def generate_chain_dungeon(num_iter: int, chain_lengths: Union[Tuple, Dict],
         # 1.: Chain 1 from start_node
         if debug:
             print(f"\nIter {i+1}/{num_iter}: Chain 1")
+        start = len(previous_nodes)
         chain_1, previous_nodes = generate_node_chain(chain_length,
                                                       chain_node_types,
                                                       chain_prob_matrix,
@@ -69,11 +82,12 @@ def generate_chain_dungeon(num_iter: int, chain_lengths: Union[Tuple, Dict],
                                                       previous_nodes,
                                                       chain_num,
                                                       debug=debug)
+        chain_dict.add(f"{i}_C", chain_num, "chain", chain_1, start)
         chain_num += 1
-        chain_dict[f"{i}_C"] = chain_1
         # 2.: Chain 2 from start_node
         if debug:
             print(f"\nIter {i+1}/{num_iter}: Chain 2")
+        start = len(previous_nodes)
         chain_2, previous_nodes = generate_node_chain(chain_length,
                                                       chain_node_types,
                                                       chain_prob_matrix,
@@ -81,11 +95,12 @@ def generate_chain_dungeon(num_iter: int, chain_lengths: Union[Tuple, Dict],
                                                       previous_nodes,
                                                       chain_num,
                                                       debug=debug)
+        chain_dict.add(f"{i}_C2", chain_num, "chain", chain_2, start)
         chain_num += 1
-        chain_dict[f"{i}_C2"] = chain_2
         # 3.: Join chains 1 & 2 (randomly picks start and end points)
         if debug:
             print(f"\nIter {i+1}/{num_iter}: Joining Chain")
+        start = len(previous_nodes)
         joining_chain, previous_nodes = generate_chain_join(chain_1, chain_2,
                                                             join_length,
                                                             join_node_types,
@@ -95,12 +110,11 @@ def generate_chain_dungeon(num_iter: int, chain_lengths: Union[Tuple, Dict],
                                                             start_node=None,
                                                             end_node=None,
                                                             debug=debug)
-        chain_dict[f"{i}_J1"] = joining_chain
+        chain_dict.add(f"{i}_J1", chain_num, "join", joining_chain, start)
         chain_num += 1
-        # Update overall dungeon
-        # dungeon = nx.compose(dungeon, nx.compose(chain_1, chain_2))
-        dungeon = nx.compose(dungeon, nx.compose(
-            nx.compose(chain_1, chain_2), joining_chain))
+        # Update overall dungeon in place
+        for chain in [chain_1, chain_2, joining_chain]:
+            merge_chain(dungeon, chain)
         # Fill dungeon
         nodes_to_fill: List[Node] = [n for n in dungeon.nodes
                                      if n.has_free_edges() and not n.name == "Entrance"]
@@ -118,29 +132,23 @@ def generate_chain_dungeon(num_iter: int, chain_lengths: Union[Tuple, Dict],
                                                            debug=debug)
         chain_num += 1
 
-    # Add a goal node towards the end of the dungeon (penultimate chain)
-    goal_start_node = list(chain_dict[f"{num_iter-1}_C2"].nodes)[-1]
-    goal_start_node.num_edges += 1
-    if debug:
-        print(f"Adding goal to {goal_start_node.name}")
-    goal_chain, previous_nodes = generate_node_chain(2, chain_node_types,
-                                                     chain_prob_matrix,
-                                                     goal_start_node,
-                                                     previous_nodes,
-                                                     chain_num, debug=debug)
+    # Add a goal node towards the end of the dungeon
+    dungeon, chain_dict, previous_nodes, _ = place_goal(dungeon, chain_dict,
+                                                        previous_nodes,
+                                                        chain_node_types,
+                                                        chain_prob_matrix,
+                                                        chain_num,
+                                                        percentile=goal_percentile,
+                                                        branch=goal_branch,
+                                                        tower_defense=tower_defense,
+                                                        debug=debug)
     chain_num += 1
 
-    goal_node = list(goal_chain.nodes)[-1]
-    goal_node.base_name = "Goal"
-    goal_node.name = "Goal"
-    chain_dict["Goal"] = goal_chain
-    dungeon = nx.compose(dungeon, goal_chain)
-
     return dungeon, chain_dict
 
 
 def fill_dungeon(dungeon: nx.MultiDiGraph,
-                 chain_dict: Dict[str, nx.MultiDiGraph],
+                 chain_dict: Optional[ChainRegistry],
                  nodes_to_fill: List[Node],
                  max_chain_length: int,
                  node_types: List[Node],
@@ -151,9 +159,10 @@ def fill_dungeon(dungeon: nx.MultiDiGraph,
                  fill_complexity=0.5,
                  fill_self_loop_prob=0.1,
                  skip_node_names=["Entrance"],
-                 debug=False) -> Tuple[nx.MultiDiGraph, Dict[str, nx.MultiDiGraph], List[Node]]:
+                 debug=False) -> Tuple[nx.MultiDiGraph, Optional[ChainRegistry], List[Node]]:
     # Fill a generated dungeon recursively, sewing up all the empty edges
-    # with smaller extra chains
+    # with smaller extra chains, in place. Every fill chain is registered in
+    # "chain_dict" (if not None) as "{num_iter}_F1", "{num_iter}_F2", ...
     if debug:
         for n in nodes_to_fill:
             print(f"{n.name} to fill ({n.filled_edges}/{n.num_edges})")
@@ -162,6 +171,7 @@ def fill_dungeon(dungeon: nx.MultiDiGraph,
         return dungeon, chain_dict, previous_nodes
     for node in nodes_to_fill:
         while node.has_free_edges():
+            start = len(previous_nodes)
             if max_chain_length == 1:
                 # Single room to dead-end generation
                 new_node = Room(1)
@@ -176,6 +186,9 @@ def fill_dungeon(dungeon: nx.MultiDiGraph,
                 else:
                     add_edge_to_chain(dungeon, node, new_node, chain_num)
                 previous_nodes.append(new_node)
+                if chain_dict is not None:
+                    chain_dict.register(chain_dict.next_key(f"{num_iter}_F"),
+                                        chain_num, "fill", start, head=[node])
                 continue
             chain_length = int(np.random.randint(1,
                                                  max_chain_length + 1) * fill_complexity)
@@ -185,8 +198,10 @@ def fill_dungeon(dungeon: nx.MultiDiGraph,
                                                         prob_matrix, node,
                                                         previous_nodes, chain_num,
                                                         debug=debug)
-            dungeon = nx.compose(dungeon, chain)
-            chain_dict[f"{num_iter}_F1"] = chain
+            merge_chain(dungeon, chain)
+            if chain_dict is not None:
+                chain_dict.add(chain_dict.next_key(f"{num_iter}_F"), chain_num,
+                               "fill", chain, start)
             # Recurse for newly generated nodes
             new_nodes_to_fill = [n for n in chain if n.has_free_edges()
                                  and not n.name in skip_node_names]
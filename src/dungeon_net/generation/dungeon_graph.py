@@ -0,0 +1,209 @@
+# A dungeon bundled with its chains and naming registry, caching derived
+# metrics until the dungeon is changed through its methods
+from typing import Callable, Dict, List, Union
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.node import Node, Room
+from dungeon_net.generation.node_utils import NodeNames
+from dungeon_net.generation.chain import link_rooms
+from dungeon_net.generation.dungeon import generate_chain_dungeon, fill_dungeon
+from dungeon_net.generation.regeneration import regenerate_chain, chain_number
+from dungeon_net.generation.goal import place_goal, GoalPlacement
+from dungeon_net.generation.chain_registry import ChainRegistry, merge_chain
+from dungeon_net.generation.graph_arrays import DungeonArrays
+from dungeon_net.generation.distance_oracle import DistanceOracle
+from dungeon_net.numerics.csr import csr_bfs, connected_component_labels
+
+# Number of sources whose "distances_from" arrays are kept, least recently
+# used first out (each is one N-length array)
+MAX_CACHED_SOURCES = 8
+
+
+class Dungeon:
+    # "graph" is the full dungeon, "chain_dict" the ChainRegistry of its
+    # chains and "previous_nodes" every node ever named in it (used by
+    # new_node_name), the registry's node list.
+    # Every mutating method bumps "version", cached metrics are only reused
+    # while the version they were computed at is current. Editing "graph"
+    # directly bypasses this, call "invalidate" afterwards
+    def __init__(self, graph=None, chain_dict=None, previous_nodes=None) -> None:
+        self.graph: nx.MultiDiGraph = nx.MultiDiGraph() if graph is None else graph
+        if chain_dict is None:
+            chain_dict = ChainRegistry(self.graph, NodeNames(self.graph.nodes)
+                                       if previous_nodes is None else previous_nodes)
+        elif previous_nodes is not None and previous_nodes is not chain_dict.nodes:
+            raise ValueError("previous_nodes must be the chain registry's node list")
+        self.chain_dict: ChainRegistry = chain_dict
+        self.previous_nodes: List[Node] = chain_dict.nodes
+        self.version = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache = {}
+        self._cache_version = 0
+
+    @classmethod
+    def generate(cls, *args, **kwargs):
+        # Same arguments as "generate_chain_dungeon"
+        result = generate_chain_dungeon(*args, **kwargs)
+        if result == -1:
+            raise ValueError("Dungeon generation failed, check chain_lengths")
+        graph, chain_dict = result
+        return cls(graph, chain_dict)
+
+    def save(self, filename: str, oracle=True):
+        # Save the graph (see "io.archive.save_dungeon") with its distance
+        # oracle unless "oracle" is False. Chains are not saved
+        from dungeon_net.io.archive import save_dungeon
+        save_dungeon(filename, self.graph,
+                     self.distance_oracle() if oracle else None)
+
+    @classmethod
+    def load(cls, filename: str):
+        # Dungeon saved by "save", its saved distance oracle is reused
+        from dungeon_net.io.archive import load_dungeon
+        graph, oracle = load_dungeon(filename)
+        dungeon = cls(graph)
+        if oracle is not None:
+            dungeon.cached("oracle", lambda: oracle)
+        return dungeon
+
+    def __len__(self) -> int:
+        return self.graph.number_of_nodes()
+
+    def __contains__(self, node: Node) -> bool:
+        return node in self.graph
+
+    # Mutation
+    def invalidate(self):
+        self.version += 1
+
+    def add_chain(self, key: str, chain: nx.MultiDiGraph, kind="chain"):
+        # Merge a generated chain into the dungeon in place and register it,
+        # the chain must have been generated with this dungeon's
+        # "previous_nodes" and its new nodes be the last ones named
+        new_nodes = [n for n in chain if n not in self.graph]
+        start = len(self.previous_nodes) - len(new_nodes)
+        if set(self.previous_nodes[start:]) != set(new_nodes):
+            raise ValueError(f"Chain '{key}' was not generated with this "
+                             "dungeon's previous_nodes")
+        merge_chain(self.graph, chain)
+        self.chain_dict.add(key, chain_number(chain), kind, chain, start)
+        self.invalidate()
+
+    def link_rooms(self, room1: Room, room2: Room, chain_num: int) -> Node:
+        # Add a Corridor between two existing rooms, returns the Corridor
+        link_rooms(self.graph, room1, room2, self.previous_nodes, chain_num)
+        self.invalidate()
+        return self.previous_nodes[-1]
+
+    def fill(self, nodes_to_fill: List[Node], max_chain_length: int,
+             node_types: List[Node], prob_matrix: np.ndarray,
+             chain_num: int, num_iter: int, **kwargs):
+        # See "fill_dungeon"
+        self.graph, self.chain_dict, self.previous_nodes = fill_dungeon(
+            self.graph, self.chain_dict, nodes_to_fill, max_chain_length,
+            node_types, prob_matrix, self.previous_nodes, chain_num,
+            num_iter, **kwargs)
+        self.invalidate()
+
+    def regenerate_chain(self, chain: Union[int, str], node_types: List[Node],
+                         prob_matrix: np.ndarray, max_fill_chain_length: int,
+                         **kwargs):
+        # See "regenerate_chain"
+        self.graph, self.chain_dict, self.previous_nodes = regenerate_chain(
+            self.graph, self.chain_dict, chain, node_types, prob_matrix,
+            max_fill_chain_length, previous_nodes=self.previous_nodes,
+            **kwargs)
+        self.invalidate()
+
+    def place_goal(self, node_types: List[Node], prob_matrix: np.ndarray,
+                   chain_num: int, **kwargs) -> GoalPlacement:
+        # See "place_goal", reuses the cached arrays and Entrance distances
+        arrays = self.arrays()
+        entrance = self.node("Entrance")
+        self.graph, self.chain_dict, self.previous_nodes, placement = place_goal(
+            self.graph, self.chain_dict, self.previous_nodes, node_types,
+            prob_matrix, chain_num, arrays=arrays,
+            depth=self.distances_from(entrance), **kwargs)
+        self.invalidate()
+        return placement
+
+    # Caching
+    def cached(self, key, compute: Callable):
+        # Return the cached value for "key", computing it if the dungeon
+        # changed since it was stored
+        if self._cache_version != self.version:
+            self._cache.clear()
+            self._cache_version = self.version
+        if key in self._cache:
+            self.cache_hits += 1
+            return self._cache[key]
+        self.cache_misses += 1
+        value = compute()
+        self._cache[key] = value
+        return value
+
+    def cache_info(self) -> Dict[str, int]:
+        return {"hits": self.cache_hits, "misses": self.cache_misses,
+                "version": self.version,
+                "size": len(self._cache) if self._cache_version == self.version else 0}
+
+    # Metrics
+    def arrays(self) -> DungeonArrays:
+        return self.cached("arrays", lambda: DungeonArrays.from_dungeon(self.graph))
+
+    def node(self, name: str) -> Node:
+        names = self.cached("names", lambda: {n.name: n for n in self.graph})
+        return names[name]
+
+    def degrees(self) -> Dict[Node, int]:
+        # Number of distinct neighbours of every node
+        def compute():
+            arrays = self.arrays()
+            return dict(zip(arrays.nodes, arrays.degrees().tolist()))
+        return self.cached("degrees", compute)
+
+    def distances_from(self, source: Node) -> np.ndarray:
+        # Hop distances from "source" to every node in DungeonArrays order,
+        # -1 where unreachable
+        # Only the MAX_CACHED_SOURCES most recently queried sources stay cached
+        def compute():
+            arrays = self.arrays()
+            source_index = arrays.node_index()[source]
+            return csr_bfs(arrays.indptr, arrays.indices,
+                           np.array([source_index]))
+        key = ("distances", source)
+        depth = self.cached(key, compute)
+        self._cache[key] = self._cache.pop(key)
+        sources = [k for k in self._cache
+                   if isinstance(k, tuple) and k[0] == "distances"]
+        for old in sources[:-MAX_CACHED_SOURCES]:
+            del self._cache[old]
+        return depth
+
+    def shortest_path_length(self, source: Node, target: Node) -> int:
+        # Hop distance from "source" to "target", -1 if unreachable
+        depth = self.distances_from(source)
+        return int(depth[self.arrays().node_index()[target]])
+
+    def distance_oracle(self) -> DistanceOracle:
+        # Distance and next-hop tables for batched queries, see
+        # "DistanceOracle"
+        return self.cached("oracle", lambda: DistanceOracle.from_arrays(self.arrays()))
+
+    def component_labels(self) -> np.ndarray:
+        # Smallest node index of the (undirected) component of every node
+        def compute():
+            arrays = self.arrays()
+            sources = np.repeat(np.arange(arrays.num_nodes), arrays.degrees())
+            return connected_component_labels(sources, arrays.indices,
+                                              arrays.num_nodes)
+        return self.cached("components", compute)
+
+    def num_components(self) -> int:
+        labels = self.component_labels()
+        return int(np.count_nonzero(labels == np.arange(len(labels))))
+
+    def is_connected(self) -> bool:
+        return self.num_components() <= 1
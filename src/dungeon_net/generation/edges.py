@@ -0,0 +1,148 @@
+# Compact edge storage: every connection is stored once with a direction
+# flag instead of as a u -> v, v -> u pair. Generation still builds the
+# doubled MultiDiGraph, an EdgeList is converted from it afterwards (for
+# archives, rendering and array snapshots) so it does not lower the peak
+# memory of generation itself
+from typing import Dict, List, Tuple
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.node import Node
+from dungeon_net.numerics.csr import csr_bfs, csr_from_arcs
+
+# Direction flags of an edge (u, v)
+TWO_WAY = 0
+ONE_WAY_FORWARD = 1  # u -> v only
+ONE_WAY_BACK = 2  # v -> u only
+
+
+class EdgeList:
+    # Nodes are referred to by their index into "nodes", edge "i" connects
+    # u[i] and v[i] and can be traversed as given by direction[i]. Storage
+    # grows by doubling so adding edges is amortized O(1). The CSR
+    # adjacency is cached until the next node or edge is added
+    def __init__(self, capacity=64) -> None:
+        self.nodes: List[Node] = []
+        self.chain_nums: List[int] = []
+        self.node_index: Dict[Node, int] = {}
+        self._u = np.zeros(capacity, dtype=np.int32)
+        self._v = np.zeros(capacity, dtype=np.int32)
+        self._direction = np.zeros(capacity, dtype=np.int8)
+        self.num_edges = 0
+        self._csr: Dict[bool, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return self.num_edges
+
+    @property
+    def u(self) -> np.ndarray:
+        return self._u[:self.num_edges]
+
+    @property
+    def v(self) -> np.ndarray:
+        return self._v[:self.num_edges]
+
+    @property
+    def direction(self) -> np.ndarray:
+        return self._direction[:self.num_edges]
+
+    def nbytes(self) -> int:
+        # Bytes used by the edge arrays (not the Node objects)
+        return self._u.nbytes + self._v.nbytes + self._direction.nbytes
+
+    def add_node(self, node: Node, chain_num=-1) -> int:
+        if node in self.node_index:
+            return self.node_index[node]
+        self.node_index[node] = len(self.nodes)
+        self.nodes.append(node)
+        self.chain_nums.append(chain_num)
+        self._csr.clear()
+        return len(self.nodes) - 1
+
+    def add_edge(self, u: Node, v: Node, direction=TWO_WAY) -> int:
+        # Adds both nodes if necessary, returns the index of the new edge
+        if self.num_edges == len(self._u):
+            capacity = max(2 * len(self._u), 1)
+            self._u = np.resize(self._u, capacity)
+            self._v = np.resize(self._v, capacity)
+            self._direction = np.resize(self._direction, capacity)
+        i = self.num_edges
+        self._u[i] = self.add_node(u)
+        self._v[i] = self.add_node(v)
+        self._direction[i] = direction
+        self.num_edges += 1
+        self._csr.clear()
+        return i
+
+    def arcs(self) -> Tuple[np.ndarray, np.ndarray]:
+        # All traversable (source, target) pairs implied by the flags
+        u, v, direction = self.u, self.v, self.direction
+        forward = direction != ONE_WAY_BACK
+        back = direction != ONE_WAY_FORWARD
+        return (np.concatenate([u[forward], v[back]]),
+                np.concatenate([v[forward], u[back]]))
+
+    def csr(self, directed=True) -> Tuple[np.ndarray, np.ndarray]:
+        # (indptr, indices) adjacency, following the direction flags unless
+        # "directed" is False in which case every edge is two-way
+        if directed not in self._csr:
+            if directed:
+                sources, targets = self.arcs()
+            else:
+                sources = np.concatenate([self.u, self.v])
+                targets = np.concatenate([self.v, self.u])
+            self._csr[directed] = csr_from_arcs(sources, targets, len(self.nodes))
+        return self._csr[directed]
+
+    def successors(self, node: Node) -> List[Node]:
+        # Nodes reachable from "node" in one step
+        i = self.node_index[node]
+        indptr, indices = self.csr()
+        return [self.nodes[j] for j in indices[indptr[i]:indptr[i + 1]].tolist()]
+
+    def bfs_depth(self, source: Node, directed=True) -> np.ndarray:
+        # Hop distance from "source" to every node, -1 where unreachable
+        indptr, indices = self.csr(directed=directed)
+        return csr_bfs(indptr, indices, np.array([self.node_index[source]]))
+
+    def to_multidigraph(self) -> nx.MultiDiGraph:
+        # Compatibility export: two-way edges become a u -> v, v -> u pair as
+        # they are in generated dungeons, one-way edges a single arc
+        graph = nx.MultiDiGraph()
+        for node, chain_num in zip(self.nodes, self.chain_nums):
+            graph.add_node(node, chain_num=chain_num)
+        sources, targets = self.arcs()
+        nodes = self.nodes
+        graph.add_edges_from((nodes[s], nodes[t])
+                             for s, t in zip(sources.tolist(), targets.tolist()))
+        return graph
+
+    @classmethod
+    def from_multidigraph(cls, graph: nx.MultiDiGraph):
+        # Collapse a doubled MultiDiGraph: each matched u -> v / v -> u pair
+        # becomes one two-way edge, unmatched arcs become one-way edges
+        edges = cls(capacity=max(graph.number_of_edges() // 2, 1))
+        for node, chain_num in graph.nodes(data="chain_num"):
+            edges.add_node(node, -1 if chain_num is None else chain_num)
+        index = edges.node_index
+        for u, nbrs in graph.adj.items():
+            for v, keys in nbrs.items():
+                if index[u] > index[v]:
+                    continue
+                num_forward = len(keys)
+                num_back = len(graph.adj[v][u]) if u in graph.adj[v] else 0
+                if u is v:
+                    num_back = 0
+                for _ in range(min(num_forward, num_back)):
+                    edges.add_edge(u, v, TWO_WAY)
+                for _ in range(num_forward - num_back):
+                    edges.add_edge(u, v, ONE_WAY_FORWARD)
+                for _ in range(num_back - num_forward):
+                    edges.add_edge(u, v, ONE_WAY_BACK)
+        # Arcs v -> u with index[v] > index[u] and no u -> v were skipped
+        for u, nbrs in graph.adj.items():
+            for v, keys in nbrs.items():
+                if index[u] > index[v] and u not in graph.adj[v]:
+                    for _ in range(len(keys)):
+                        edges.add_edge(v, u, ONE_WAY_BACK)
+        return edges
@@ -0,0 +1,130 @@
+# Goal placement: one BFS from the Entrance over the finished dungeon picks
+# a Room at a target depth percentile to grow the goal chain from, and the
+# distances of the new nodes are derived from the anchor's instead of
+# running the BFS again
+from typing import Dict, List, Optional, Tuple
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.node import Node, Room, Corridor
+from dungeon_net.generation.chain import generate_node_chain
+from dungeon_net.generation.graph_arrays import DungeonArrays, NODE_TYPES
+from dungeon_net.generation.chain_registry import ChainRegistry, merge_chain
+from dungeon_net.numerics.csr import csr_bfs
+
+# Anchor filters: any Room, Rooms with a single neighbour, Rooms on a path
+GOAL_BRANCHES = ["any", "dead_end", "through"]
+
+
+class GoalPlacement:
+    # Where the Goal went: "nodes" are the dungeon's nodes in DungeonArrays
+    # order followed by the goal chain's new nodes and "depth" their hop
+    # distance from the Entrance (-1 if unreachable)
+    def __init__(self, anchor: Node, goal: Node, goal_depth: int,
+                 nodes: List[Node], depth: np.ndarray) -> None:
+        self.anchor = anchor
+        self.goal = goal
+        self.goal_depth = goal_depth
+        self.nodes = nodes
+        self.depth = depth
+
+
+def goal_anchor_candidates(arrays: DungeonArrays, depth: np.ndarray,
+                           percentile=0.85, tolerance=0.05,
+                           branch="any") -> np.ndarray:
+    # Indices of the Rooms whose depth lies within the "percentile" +/-
+    # "tolerance" quantiles of the reachable nodes' depths and that match
+    # "branch" (see GOAL_BRANCHES). If none do, the Rooms matching "branch"
+    # (or any Rooms) closest to the target depth
+    if branch not in GOAL_BRANCHES:
+        raise ValueError(f"branch must be one of {GOAL_BRANCHES}, not {branch}")
+    reachable = depth >= 0
+    rooms = (arrays.node_type == NODE_TYPES.index(Room)) & (depth > 0)
+    if not rooms.any():
+        return np.zeros(0, dtype=np.int64)
+    degree = arrays.degrees()
+    if branch == "dead_end":
+        rooms_branch = rooms & (degree == 1)
+    elif branch == "through":
+        rooms_branch = rooms & (degree >= 2)
+    else:
+        rooms_branch = rooms
+    low, target, high = np.quantile(depth[reachable],
+                                    [max(percentile - tolerance, 0.),
+                                     percentile,
+                                     min(percentile + tolerance, 1.)])
+    window = rooms_branch & (depth >= low) & (depth <= high)
+    if window.any():
+        return np.flatnonzero(window)
+    pool = rooms_branch if rooms_branch.any() else rooms
+    distance = np.where(pool, np.abs(depth - target), np.inf)
+    return np.flatnonzero(distance == distance.min())
+
+
+def chain_depths(chain: nx.MultiDiGraph, anchor: Node,
+                 anchor_depth: int) -> Dict[Node, int]:
+    # Depth of every node of a chain grown from "anchor", which is its only
+    # link to the rest of the dungeon
+    hops = nx.single_source_shortest_path_length(chain.to_undirected(as_view=True),
+                                                 anchor)
+    return {n: anchor_depth + h for n, h in hops.items()}
+
+
+def place_goal(dungeon: nx.MultiDiGraph, chain_dict: Optional[ChainRegistry],
+               previous_nodes: List[Node], node_types: List[Node],
+               prob_matrix: np.ndarray, chain_num: int, percentile=0.85,
+               tolerance=0.05, branch="any", goal_chain_length=2,
+               tower_defense=False, arrays: Optional[DungeonArrays] = None,
+               depth: Optional[np.ndarray] = None,
+               debug=False) -> Tuple[nx.MultiDiGraph, Optional[ChainRegistry], List[Node], GoalPlacement]:
+    # Grow a goal chain of "goal_chain_length" nodes from a Room about
+    # "percentile" of the way through the dungeon (by BFS depth from the
+    # Entrance) and name its farthest node "Goal". For "tower_defense"
+    # missions the chain is grown from the Entrance instead. "arrays" and
+    # "depth" (from the Entrance, DungeonArrays order) can be passed in if
+    # already computed. The dungeon is updated in place, the goal chain is
+    # registered as "Goal" in "chain_dict" (if not None) and the Goal closes its free edges
+    if goal_chain_length < 2:
+        raise ValueError("goal_chain_length must be at least 2 (anchor and Goal)")
+    if arrays is None:
+        arrays = DungeonArrays.from_dungeon(dungeon)
+    entrance = arrays.index_of_name("Entrance")
+    if entrance < 0:
+        raise ValueError("Dungeon has no Entrance")
+    if depth is None:
+        depth = csr_bfs(arrays.indptr, arrays.indices, np.array([entrance]))
+
+    if tower_defense:
+        anchor_index = entrance
+    else:
+        candidates = goal_anchor_candidates(arrays, depth, percentile,
+                                            tolerance, branch)
+        anchor_index = int(np.random.choice(candidates)) if len(candidates) \
+            else entrance
+    anchor = arrays.nodes[anchor_index]
+    anchor.num_edges += 1
+    if debug:
+        print(f"Adding goal to {anchor.name} (depth {depth[anchor_index]})")
+    start = len(previous_nodes)
+    goal_chain, previous_nodes = generate_node_chain(goal_chain_length,
+                                                     node_types, prob_matrix,
+                                                     anchor, previous_nodes,
+                                                     chain_num, debug=debug)
+    # Incremental distance update: the chain only touches the dungeon at
+    # the anchor
+    chain_depth = chain_depths(goal_chain, anchor, int(depth[anchor_index]))
+    new_nodes = [n for n in goal_chain if n is not anchor]
+    rooms = [n for n in new_nodes if not isinstance(n, Corridor)] or new_nodes
+    goal = max(rooms, key=lambda n: chain_depth[n])
+    goal.base_name = "Goal"
+    goal.name = "Goal"
+    goal.num_edges = max(goal.filled_edges, 1)
+
+    merge_chain(dungeon, goal_chain, update=False)
+    if chain_dict is not None:
+        chain_dict.add("Goal", chain_num, "goal", goal_chain, start)
+    nodes = list(arrays.nodes) + new_nodes
+    depth = np.concatenate([depth, np.array([chain_depth[n] for n in new_nodes],
+                                            dtype=depth.dtype)])
+    return dungeon, chain_dict, previous_nodes, GoalPlacement(
+        anchor, goal, chain_depth[goal], nodes, depth)
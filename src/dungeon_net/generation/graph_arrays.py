@@ -0,0 +1,104 @@
+# Flat array snapshot of a dungeon graph for vectorized algorithms
+from typing import Dict, List
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.node import Node, Room, Corridor, Junction
+from dungeon_net.generation.edges import EdgeList
+from dungeon_net.numerics.csr import csr_degrees
+
+# Integer codes for node types, a node's code is its index in this list
+# (and its class's "type_code", so subclasses share their base's code)
+NODE_TYPES = [Room, Corridor, Junction]
+
+
+def node_type_code(node: Node) -> int:
+    # Plain Nodes and classes not derived from NODE_TYPES have no code
+    code = getattr(node, "type_code", -1)
+    if code < 0:
+        raise ValueError(f"{node.classname()} is not a known node type")
+    return code
+
+
+class DungeonArrays:
+    # Index-based view of a dungeon: node "i" is nodes[i] and its
+    # neighbours are indices[indptr[i]:indptr[i+1]]. Edges are stored once
+    # per direction present in the graph, so the doubled edges made during
+    # generation give a symmetric adjacency
+    def __init__(self, nodes: List[Node], indptr: np.ndarray,
+                 indices: np.ndarray, node_type: np.ndarray,
+                 num_edges: np.ndarray, filled_edges: np.ndarray,
+                 chain_num: np.ndarray) -> None:
+        self.nodes = nodes
+        self.indptr = indptr
+        self.indices = indices
+        self.node_type = node_type
+        self.num_edges = num_edges
+        self.filled_edges = filled_edges
+        self.chain_num = chain_num
+        self._node_index = None
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.nodes)
+
+    def degrees(self) -> np.ndarray:
+        return csr_degrees(self.indptr)
+
+    def node_index(self) -> Dict[Node, int]:
+        if self._node_index is None:
+            self._node_index = {n: i for i, n in enumerate(self.nodes)}
+        return self._node_index
+
+    def index_of_name(self, name: str) -> int:
+        # Index of the first node called "name", -1 if there is none
+        for i, n in enumerate(self.nodes):
+            if n.name == name:
+                return i
+        return -1
+
+    @classmethod
+    def from_dungeon(cls, dungeon: nx.MultiDiGraph):
+        nodes = list(dungeon.nodes)
+        index = {n: i for i, n in enumerate(nodes)}
+        adj = dungeon.adj
+        degrees = np.fromiter((len(adj[n]) for n in nodes), dtype=np.int64,
+                              count=len(nodes))
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        indices = np.fromiter((index[v] for n in nodes for v in adj[n]),
+                              dtype=np.int32, count=int(indptr[-1]))
+        node_type = np.fromiter((node_type_code(n) for n in nodes),
+                                dtype=np.int8, count=len(nodes))
+        num_edges = np.fromiter((n.num_edges for n in nodes), dtype=np.int16,
+                                count=len(nodes))
+        filled_edges = np.fromiter((n.filled_edges for n in nodes),
+                                   dtype=np.int16, count=len(nodes))
+        chain_num = np.fromiter((c if c is not None else -1
+                                 for _, c in dungeon.nodes(data="chain_num")),
+                                dtype=np.int32, count=len(nodes))
+        arrays = cls(nodes, indptr, indices, node_type, num_edges,
+                     filled_edges, chain_num)
+        arrays._node_index = index
+        return arrays
+
+    @classmethod
+    def from_edge_list(cls, edges: EdgeList, directed=True):
+        # Snapshot of a compact EdgeList, one-way edges are only followed in
+        # their allowed direction unless "directed" is False
+        nodes = edges.nodes
+        indptr, indices = edges.csr(directed=directed)
+        node_type = np.fromiter((node_type_code(n) for n in nodes),
+                                dtype=np.int8, count=len(nodes))
+        num_edges = np.fromiter((n.num_edges for n in nodes), dtype=np.int16,
+                                count=len(nodes))
+        filled_edges = np.fromiter((n.filled_edges for n in nodes),
+                                   dtype=np.int16, count=len(nodes))
+        chain_num = np.array(edges.chain_nums, dtype=np.int32)
+        arrays = cls(nodes, indptr, indices, node_type, num_edges,
+                     filled_edges, chain_num)
+        arrays._node_index = edges.node_index
+        return arrays
@@ -1,16 +1,40 @@
 import random
+import sys
 # v abstract for now, not dealing with shapes or prefabs, literally just
 # connectivity
 
 
 class Node:
+    # Nodes are created by the million, so they have no per-instance
+    # __dict__: the attributes live in __slots__, "base_name" is interned
+    # (every Room shares one "Room" string) and the node type is the class
+    # attribute "type_code" (index into graph_arrays.NODE_TYPES), which
+    # only the concrete types define. Nodes hash by identity
+    __slots__ = ("num_edges", "filled_edges", "_base_name", "name")
+
     def __init__(self, num_edges: int) -> None:
         self.num_edges = num_edges
         self.filled_edges = 0  # counts how many edges have been connected
-        self.base_name = self.classname()
+        self._base_name = self.classname()
         self.name = ""
         # maybe name edges and check if locked here
 
+    @property
+    def base_name(self) -> str:
+        return self._base_name
+
+    @base_name.setter
+    def base_name(self, base_name: str):
+        self._base_name = sys.intern(base_name)
+
+    def __setstate__(self, state):
+        # Unpickling would set the slots directly, intern "base_name" again.
+        # "state" is (__dict__ or None, slots) as pickled by object
+        for attrs in state if isinstance(state, tuple) else (state,):
+            for attr, value in (attrs or {}).items():
+                setattr(self, attr, value)
+        self.base_name = self._base_name
+
     def __str__(self) -> str:
         # for debugging
         return self.desc()
@@ -22,13 +46,16 @@ class Node:
     def classname(self) -> str:
         # TODO: make sure this works with room subtypes like "round_room"
         # or "rectangular_room"
-        return f"{self.__class__.__name__}"
+        return self.__class__.__name__
 
     def has_free_edges(self) -> bool:
         return self.filled_edges < self.num_edges
 
 
 class Room(Node):
+    __slots__ = ()
+    type_code = 0
+
     def __init__(self, num_edges: int) -> None:
         super().__init__(num_edges)
 
@@ -38,11 +65,17 @@ class Room(Node):
 
 
 class Corridor(Node):
+    __slots__ = ()
+    type_code = 1
+
     def __init__(self) -> None:
         super().__init__(2)
 
 
 class Junction(Node):
+    __slots__ = ()
+    type_code = 2
+
     def __init__(self, num_edges: int) -> None:
         # min of 2 edges
         if num_edges < 3:
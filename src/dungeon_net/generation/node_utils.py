@@ -1,16 +1,50 @@
 # Useful functions for operating on and with Nodes
 from dungeon_net.generation.node import Node, Corridor
-from typing import List
+from typing import Dict, Iterable, List
+
+
+class NodeNames(list):
+    # A "previous_nodes" list that also counts its nodes by base name, so
+    # "new_node_name" does not have to scan it. Nodes are counted under
+    # their base name when appended, and the list can only be appended to
+    # (or extended), so the counts never go down
+    def __init__(self, nodes: Iterable[Node] = ()) -> None:
+        super().__init__()
+        self.base_name_counts: Dict[str, int] = {}
+        self.extend(nodes)
+
+    def append(self, node: Node):
+        super().append(node)
+        self.base_name_counts[node.base_name] = \
+            self.base_name_counts.get(node.base_name, 0) + 1
+
+    def extend(self, nodes: Iterable[Node]):
+        for node in nodes:
+            self.append(node)
+
+    def __iadd__(self, nodes: Iterable[Node]):
+        self.extend(nodes)
+        return self
+
+    def _append_only(self, *args, **kwargs):
+        raise TypeError("NodeNames can only be appended to")
+
+    insert = remove = pop = clear = sort = reverse = _append_only
+    __setitem__ = __delitem__ = __imul__ = _append_only
 
 
 def new_node_name(node: Node, previous_nodes: List[Node], node_base_name=None) -> str:
     # Generate a numeric name for the node based on how many previous types
     # of the node there were (always increasing so will always be unique
-    # so long as previous_nodes is correctly updated)
+    # so long as previous_nodes is correctly updated). O(1) for a NodeNames
+    # list, a scan of "previous_nodes" otherwise
     if not node_base_name:
         node_base_name = node.classname()
-    node_count = len([n for n in previous_nodes
-                      if n.base_name == node_base_name])
+    if isinstance(previous_nodes, NodeNames):
+        node_count = previous_nodes.base_name_counts.get(node_base_name, 0)
+    else:
+        node_count = len([n for n in previous_nodes
+                          if n.base_name == node_base_name])
     node_name = f"{node_base_name}_{node_count+1}"
     return node_name
 
@@ -0,0 +1,132 @@
+# Placement of themed content (enemies, treasure, ...) over a finished
+# dungeon, done for all nodes at once from the BFS depth to the Entrance
+from typing import Dict, List, Tuple
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.node import Room, Corridor, Junction
+from dungeon_net.generation.graph_arrays import DungeonArrays, NODE_TYPES
+from dungeon_net.numerics.csr import csr_bfs
+
+# A theme describes the content that can be placed and how likely it is:
+# "contents" names each content code, code 0 is always "nothing placed"
+# "type_weights" is the base weight of each content per node type
+# "depth_weights" scales each weight by (1 + w * relative depth), so a
+#   positive entry makes that content more common deeper in the dungeon
+# "chain_weights" optionally multiplies the weights of nodes by chain_num
+# "rules" are (mask name, content, multiplier) density rules, see
+#   "node_masks" for the available masks
+DEFAULT_THEME = {
+    "contents": ["empty", "enemy", "treasure", "guard", "trap"],
+    "type_weights": {
+        Room: [3., 2., 1., 0.2, 0.5],
+        Corridor: [6., 1., 0., 0., 1.],
+        Junction: [3., 1., 0., 1., 0.5],
+    },
+    "depth_weights": [0., 1., 0.5, 0.5, 1.],
+    "chain_weights": {},
+    "rules": [
+        ("dead_end_room", "treasure", 4.),
+        ("junction", "guard", 3.),
+    ],
+}
+
+
+def node_masks(arrays: DungeonArrays, depth: np.ndarray) -> Dict[str, np.ndarray]:
+    # Boolean masks over all nodes that density rules can refer to
+    degrees = arrays.degrees()
+    node_type = arrays.node_type
+    is_room = node_type == NODE_TYPES.index(Room)
+    reachable = depth >= 0
+    max_depth = max(int(depth.max()), 1) if len(depth) else 1
+    return {
+        "room": is_room,
+        "corridor": node_type == NODE_TYPES.index(Corridor),
+        "junction": node_type == NODE_TYPES.index(Junction),
+        "dead_end": degrees <= 1,
+        "dead_end_room": is_room & (degrees <= 1),
+        "deep": reachable & (depth >= 0.75 * max_depth),
+        "shallow": reachable & (depth <= 0.25 * max_depth),
+        "unreachable": ~reachable,
+    }
+
+
+def content_weights(arrays: DungeonArrays, depth: np.ndarray,
+                    theme: Dict) -> np.ndarray:
+    # (num_nodes, num_contents) array of unnormalized sampling weights
+    contents: List[str] = theme["contents"]
+    type_table = np.zeros((len(NODE_TYPES), len(contents)))
+    for node_type, weights in theme["type_weights"].items():
+        type_table[NODE_TYPES.index(node_type)] = weights
+    weights = type_table[arrays.node_type]
+
+    max_depth = max(int(depth.max()), 1) if len(depth) else 1
+    relative_depth = np.clip(depth, 0, None) / max_depth
+    depth_weights = np.asarray(theme.get("depth_weights",
+                                         np.zeros(len(contents))))
+    weights = weights * (1. + relative_depth[:, None] * depth_weights[None, :])
+
+    for chain_num, chain_weights in theme.get("chain_weights", {}).items():
+        weights[arrays.chain_num == chain_num] *= chain_weights
+
+    masks = node_masks(arrays, depth)
+    for mask_name, content, multiplier in theme.get("rules", []):
+        weights[masks[mask_name], contents.index(content)] *= multiplier
+    return np.clip(weights, 0., None)
+
+
+def sample_rows(weights: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # Draw one column index per row with probability proportional to the
+    # row's weights, rows with no weight get 0
+    cumulative = np.cumsum(weights, axis=1)
+    totals = cumulative[:, -1]
+    draws = rng.random(len(weights)) * totals
+    choice = (cumulative <= draws[:, None]).sum(axis=1)
+    choice[totals <= 0] = 0
+    return np.minimum(choice, weights.shape[1] - 1)
+
+
+def populate_dungeon(dungeon: nx.MultiDiGraph, theme=DEFAULT_THEME,
+                     seed=None, arrays=None,
+                     safe_node_names=["Entrance", "Goal"],
+                     sources=None) -> Tuple[DungeonArrays, np.ndarray]:
+    # Assign one content code (an index into theme["contents"]) to every
+    # node of the dungeon. Returns the arrays snapshot the codes are aligned
+    # with and the uint8 content array. "safe_node_names" are left empty.
+    # Depth is measured from the node ids "sources", by default the
+    # Entrance, which the dungeon must then have
+    if arrays is None:
+        arrays = DungeonArrays.from_dungeon(dungeon)
+    if arrays.num_nodes == 0:
+        return arrays, np.zeros(0, dtype=np.uint8)
+    rng = np.random.default_rng(seed)
+    if sources is None:
+        entrance = arrays.index_of_name("Entrance")
+        if entrance < 0:
+            raise ValueError("Dungeon has no Entrance to measure depth from, "
+                             "pass sources")
+        sources = [entrance]
+    depth = csr_bfs(arrays.indptr, arrays.indices, np.asarray(sources))
+    weights = content_weights(arrays, depth, theme)
+    content = sample_rows(weights, rng).astype(np.uint8)
+    for name in safe_node_names:
+        idx = arrays.index_of_name(name)
+        if idx >= 0:
+            content[idx] = 0
+    return arrays, content
+
+
+def save_population(filename: str, arrays: DungeonArrays,
+                    content: np.ndarray, theme=DEFAULT_THEME):
+    # Store the content codes keyed by node name so they can be matched
+    # back to the dungeon on load
+    np.savez_compressed(filename,
+                        names=np.array([n.name for n in arrays.nodes]),
+                        content=content,
+                        contents=np.array(theme["contents"]))
+
+
+def load_population(filename: str) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    # Returns the node names, their content codes and the content names
+    data = np.load(filename)
+    return data["names"], data["content"], data["contents"].tolist()
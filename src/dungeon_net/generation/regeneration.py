@@ -0,0 +1,198 @@
+# Regenerate one region of an existing dungeon (a chain and the fill
+# subtrees hanging off it) without touching the rest
+from typing import List, Set, Tuple, Union
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.node import Node, Corridor
+from dungeon_net.generation.node_utils import new_node_name
+from dungeon_net.generation.chain import generate_node_chain, add_edge_to_chain
+from dungeon_net.generation.dungeon import fill_dungeon
+from dungeon_net.generation.chain_registry import ChainRegistry, merge_chain
+
+
+def chain_number(chain: nx.MultiDiGraph) -> int:
+    # Every node of a generated chain is stored with the chain's number
+    for _, chain_num in chain.nodes(data="chain_num"):
+        return chain_num
+    return -1
+
+
+def resolve_chain_key(chain_dict: ChainRegistry, chain: Union[int, str]) -> str:
+    # Accepts either a "chain_dict" key ("2_C2", "3_F1", "Goal") or a
+    # chain_num and returns the matching key
+    return chain_dict.resolve(chain)
+
+
+def find_region(dungeon: nx.MultiDiGraph, chain: nx.MultiDiGraph,
+                main_chain_nums: Set[int],
+                protected_names=["Entrance", "Goal"]) -> Tuple[List[Node], List[Node]]:
+    # Returns (region, anchors). The region is every node of "chain" that
+    # only connects to the chain itself or to fill nodes, plus the fill
+    # subtrees reached from those nodes. Anchors are the nodes left in the
+    # dungeon that were connected to the region, ordered along the chain
+    # first. Only the chain and its neighbourhood are visited
+    adj = dungeon.adj
+
+    def is_fill(n: Node) -> bool:
+        return dungeon.nodes[n].get("chain_num") not in main_chain_nums
+
+    chain_nodes = list(chain.nodes)
+    in_chain = set(chain_nodes)
+    kept = set()
+    for i, n in enumerate(chain_nodes):
+        if i == 0 or n.name in protected_names or n not in dungeon:
+            kept.add(n)
+            continue
+        for nbr in adj[n]:
+            if nbr not in in_chain and not is_fill(nbr):
+                kept.add(n)
+                break
+
+    region = [n for n in chain_nodes if n not in kept]
+    in_region = set(region)
+    # Walk the hanging fill subtrees
+    stack = list(region)
+    while stack:
+        n = stack.pop()
+        for nbr in adj[n]:
+            if nbr in in_region or nbr in in_chain or nbr.name in protected_names:
+                continue
+            if is_fill(nbr):
+                in_region.add(nbr)
+                region.append(nbr)
+                stack.append(nbr)
+
+    anchors = [n for n in chain_nodes if n in kept and n in dungeon
+               and any(nbr in in_region for nbr in adj[n])]
+    seen = set(anchors)
+    for n in region:
+        for nbr in adj[n]:
+            if nbr not in in_region and nbr not in seen:
+                seen.add(nbr)
+                anchors.append(nbr)
+    return region, anchors
+
+
+def regenerate_chain(dungeon: nx.MultiDiGraph,
+                     chain_dict: ChainRegistry,
+                     chain: Union[int, str],
+                     node_types: List[Node],
+                     prob_matrix: np.ndarray,
+                     max_fill_chain_length: int,
+                     previous_nodes=None,
+                     fill_complexity=0.5,
+                     fill_self_loop_prob=0.1,
+                     debug=False) -> Tuple[nx.MultiDiGraph, ChainRegistry, List[Node]]:
+    # Replace the chain "chain" (a chain_num or a chain_dict key) and its
+    # hanging fill subtrees with newly generated nodes, in place. The new
+    # region is a path through the same anchor nodes with roughly as many
+    # non-Corridor nodes as before, then filled like "fill_dungeon" does, so
+    # every anchor is reconnected to the new region and left without free
+    # edges (loops added along the path may give path anchors extra edges).
+    # "previous_nodes" is the naming registry and must be the registry's
+    # node list (the default), names of removed nodes are never reused so
+    # all names stay unique. The new nodes are added to the chain's record
+    if previous_nodes is None:
+        previous_nodes = chain_dict.nodes
+    elif previous_nodes is not chain_dict.nodes:
+        raise ValueError("previous_nodes must be the chain registry's node list")
+    key = resolve_chain_key(chain_dict, chain)
+    record = chain_dict.record(key)
+    target = chain_dict.view(key)
+    chain_num = record.chain_num
+    main_chain_nums = {r.chain_num for r in chain_dict.records.values()
+                       if r.kind != "fill"}
+    region, anchors = find_region(dungeon, target, main_chain_nums)
+    if debug:
+        print(f"Regenerating {key}: {len(region)} nodes, "
+              f"anchors {[a.name for a in anchors]}")
+    if not anchors:
+        return dungeon, chain_dict, previous_nodes
+
+    # Detach the region, freeing the anchors' edges
+    in_region = set(region)
+    anchor_set = set(anchors)
+    for anchor in anchors:
+        for nbr in list(dungeon.adj[anchor]):
+            if nbr in in_region:
+                num_arcs = max(len(dungeon.adj[anchor][nbr]),
+                               len(dungeon.adj[nbr].get(anchor, {})))
+                anchor.filled_edges -= num_arcs
+    num_rooms = len([n for n in region if not isinstance(n, Corridor)
+                     and n in target])
+    dungeon.remove_nodes_from(region)
+
+    # Path through the anchors that belonged to the chain
+    start = len(previous_nodes)
+    path_anchors = [a for a in anchors if a in target]
+    if not path_anchors:
+        path_anchors = anchors[:1]
+    num_segments = max(len(path_anchors) - 1, 1)
+    if len(path_anchors) == 1:
+        segment_length = max(num_rooms, 1) + 1
+    else:
+        segment_length = max(num_rooms // num_segments, 1) + 1
+    new_chain = nx.MultiDiGraph()
+    new_chain.add_node(path_anchors[0], chain_num=chain_num)
+    for i in range(num_segments):
+        start_node = path_anchors[i]
+        if not start_node.has_free_edges():
+            start_node.num_edges += 1
+        segment, previous_nodes = generate_node_chain(segment_length,
+                                                      node_types, prob_matrix,
+                                                      start_node,
+                                                      previous_nodes,
+                                                      chain_num, debug=debug)
+        new_chain.add_nodes_from(n for n in segment.nodes(data=True)
+                                 if n[0] not in anchor_set)
+        new_chain.add_edges_from(segment.edges)
+        if len(path_anchors) == 1:
+            break
+        # The segment ends on its farthest node, previous_nodes[-1] can be
+        # one of the loop Corridors added by "link_rooms"
+        end_node = path_anchors[i + 1]
+        depths = nx.single_source_shortest_path_length(segment, start_node)
+        last_node = max(depths, key=depths.get)
+        if not last_node.has_free_edges():
+            last_node.num_edges += 1
+        if not end_node.has_free_edges():
+            end_node.num_edges += 1
+        add_edge_to_chain(new_chain, last_node, end_node, chain_num)
+
+    # Reattach anchors outside the chain (e.g. later chains that started on
+    # a fill node) through a Corridor to a new Room or Junction
+    new_nodes = [n for n in new_chain if n not in anchor_set]
+    hubs = [n for n in new_nodes if not isinstance(n, Corridor)]
+    if not hubs:
+        hubs = path_anchors
+    for anchor in anchors:
+        while anchor.has_free_edges() and anchor not in path_anchors:
+            hub = hubs[np.random.randint(len(hubs))]
+            if not hub.has_free_edges():
+                hub.num_edges += 1
+            corridor = Corridor()
+            corridor.name = new_node_name(corridor, previous_nodes)
+            add_edge_to_chain(new_chain, hub, corridor, chain_num)
+            previous_nodes.append(corridor)
+            add_edge_to_chain(new_chain, corridor, anchor, chain_num)
+            new_nodes.append(corridor)
+
+    # Fill the new nodes (and any chain anchor left with a free edge) in
+    # the scratch graph so the cost stays proportional to the region
+    nodes_to_fill = [n for n in new_chain if n.has_free_edges()]
+    new_chain, _, previous_nodes = fill_dungeon(new_chain, None,
+                                                nodes_to_fill,
+                                                max_fill_chain_length,
+                                                node_types,
+                                                prob_matrix,
+                                                previous_nodes,
+                                                chain_num, 0,
+                                                fill_complexity=fill_complexity,
+                                                fill_self_loop_prob=fill_self_loop_prob,
+                                                debug=debug)
+
+    # Merge back into the dungeon in place, anchors keep their chain_num
+    merge_chain(dungeon, new_chain, update=False)
+    chain_dict.extend(key, new_chain, start)
+    return dungeon, chain_dict, previous_nodes
@@ -0,0 +1,2 @@
+from .archive import *
+from .tensors import *
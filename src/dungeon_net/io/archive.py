@@ -0,0 +1,286 @@
+# Binary columnar archive of many dungeons, written as a directory of
+# ".npz" shards so generation can stream into it with flat memory.
+# Each shard is a row group of two tables: a nodes table (one row per node,
+# NODE_COLUMNS) and an edges table (one row per edge, EDGE_COLUMNS, "u" and
+# "v" are node ids within the dungeon). "node_offsets"/"edge_offsets" split
+# the rows by dungeon and "index.npz" records which shard holds which
+# dungeon, so readers only open the shards and columns they need
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.node import Corridor
+from dungeon_net.generation.graph_arrays import DungeonArrays, NODE_TYPES, node_type_code
+from dungeon_net.generation.edges import EdgeList
+from dungeon_net.generation.distance_oracle import DistanceOracle
+
+NODE_COLUMNS = ["node_type", "name", "num_edges", "filled_edges", "chain_num",
+                "role"]
+EDGE_COLUMNS = ["u", "v", "direction"]
+# Values of the "role" column
+ROLES = {"Entrance": 1, "Goal": 2}
+INDEX_FILE = "index.npz"
+# dtypes of the columns as written by "dungeon_columns", for empty reads
+COLUMN_DTYPES = {"node_type": np.int8, "name": str, "num_edges": np.int16,
+                 "filled_edges": np.int16, "chain_num": np.int32,
+                 "role": np.int8, "u": np.int32, "v": np.int32,
+                 "direction": np.int8, "dungeon_id": np.int64,
+                 "node_id": np.int64}
+
+
+def dungeon_columns(dungeon: nx.MultiDiGraph) -> Dict[str, np.ndarray]:
+    # Column arrays for one dungeon, nodes are numbered in graph order and
+    # edges are stored once each (see "EdgeList")
+    edges = EdgeList.from_multidigraph(dungeon)
+    nodes = edges.nodes
+    count = len(nodes)
+    return {
+        "node_type": np.fromiter((node_type_code(n) for n in nodes),
+                                 dtype=np.int8, count=count),
+        "name": np.array([n.name for n in nodes], dtype=str),
+        "num_edges": np.fromiter((n.num_edges for n in nodes),
+                                 dtype=np.int16, count=count),
+        "filled_edges": np.fromiter((n.filled_edges for n in nodes),
+                                    dtype=np.int16, count=count),
+        "chain_num": np.array(edges.chain_nums, dtype=np.int32),
+        "role": np.fromiter((ROLES.get(n.name, 0) for n in nodes),
+                            dtype=np.int8, count=count),
+        "u": edges.u.copy(),
+        "v": edges.v.copy(),
+        "direction": edges.direction.copy(),
+    }
+
+
+def columns_to_dungeon(columns: Dict[str, np.ndarray]) -> nx.MultiDiGraph:
+    # Rebuild a dungeon from its columns, nodes in the same order
+    edges = EdgeList(capacity=max(len(columns["u"]), 1))
+    role_names = {code: name for name, code in ROLES.items()}
+    for code, name, num_edges, filled_edges, chain_num, role in zip(
+            columns["node_type"].tolist(), columns["name"].tolist(),
+            columns["num_edges"].tolist(), columns["filled_edges"].tolist(),
+            columns["chain_num"].tolist(), columns["role"].tolist()):
+        node_type = NODE_TYPES[code]
+        node = Corridor() if node_type is Corridor else node_type(num_edges)
+        node.num_edges = num_edges
+        node.filled_edges = filled_edges
+        node.name = name
+        if role in role_names:
+            node.base_name = role_names[role]
+        edges.add_node(node, chain_num)
+    nodes = edges.nodes
+    for u, v, direction in zip(columns["u"].tolist(), columns["v"].tolist(),
+                               columns["direction"].tolist()):
+        edges.add_edge(nodes[u], nodes[v], direction)
+    return edges.to_multidigraph()
+
+
+def save_dungeon(filename: str, dungeon: nx.MultiDiGraph,
+                 oracle: Optional[DistanceOracle] = None, compress=True):
+    # One dungeon as a ".npz" of its columns, plus its distance oracle's
+    # tables (prefixed "oracle_") so they do not have to be rebuilt
+    columns = dungeon_columns(dungeon)
+    if oracle is not None:
+        if not oracle.matches(DungeonArrays.from_dungeon(dungeon)):
+            raise ValueError("Distance oracle was built for a different dungeon")
+        columns.update(oracle.to_columns())
+    save = np.savez_compressed if compress else np.savez
+    save(filename, **columns)
+
+
+def load_dungeon(filename: str) -> Tuple[nx.MultiDiGraph, Optional[DistanceOracle]]:
+    # Dungeon saved by "save_dungeon" and its distance oracle (None if it
+    # was saved without one). The oracle takes the reloaded dungeon's
+    # adjacency, whose arcs may be in another order, its stored next hops
+    # stay valid for it
+    with np.load(filename) as data:
+        columns = {k: data[k] for k in data.files}
+    dungeon = columns_to_dungeon(columns)
+    oracle = None
+    if "oracle_names" in columns:
+        oracle = DistanceOracle.from_columns(columns,
+                                             DungeonArrays.from_dungeon(dungeon))
+    return dungeon, oracle
+
+
+class DungeonArchiveWriter:
+    # Buffers the columns of up to "shard_size" dungeons and then writes
+    # them as one shard (row group): every column concatenated over the
+    # shard's dungeons, plus "dungeon_id", "node_offsets" and
+    # "edge_offsets" to split them again. Memory use is bounded by one
+    # shard however many dungeons are written. An existing archive at
+    # "path" is refused, or deleted first if "overwrite"
+    def __init__(self, path: str, shard_size=1000, compress=False,
+                 overwrite=False) -> None:
+        self.path = path
+        self.shard_size = shard_size
+        self.compress = compress
+        self.num_shards = 0
+        self.num_dungeons = 0
+        self._ids: List[int] = []
+        self._shard_ids: List[np.ndarray] = []
+        self._columns: Dict[str, List[np.ndarray]] = {
+            c: [] for c in NODE_COLUMNS + EDGE_COLUMNS}
+        os.makedirs(path, exist_ok=True)
+        existing = [f for _, f in list_shards(path)]
+        if os.path.exists(os.path.join(path, INDEX_FILE)):
+            existing.append(INDEX_FILE)
+        if existing and not overwrite:
+            raise ValueError(f"{path} already holds an archive "
+                             f"({len(existing)} files), pass overwrite to replace it")
+        for filename in existing:
+            os.remove(os.path.join(path, filename))
+
+    def add(self, dungeon_id: int, columns: Dict[str, np.ndarray]):
+        self._ids.append(dungeon_id)
+        for name, values in self._columns.items():
+            values.append(columns[name])
+        self.num_dungeons += 1
+        if len(self._ids) >= self.shard_size:
+            self.flush()
+
+    def add_dungeon(self, dungeon_id: int, dungeon: nx.MultiDiGraph):
+        self.add(dungeon_id, dungeon_columns(dungeon))
+
+    def flush(self):
+        if not self._ids:
+            return
+        node_counts = [len(c) for c in self._columns["node_type"]]
+        edge_counts = [len(c) for c in self._columns["u"]]
+        shard = {name: np.concatenate(values)
+                 for name, values in self._columns.items()}
+        shard["dungeon_id"] = np.array(self._ids, dtype=np.int64)
+        shard["node_offsets"] = np.concatenate([[0], np.cumsum(node_counts)])
+        shard["edge_offsets"] = np.concatenate([[0], np.cumsum(edge_counts)])
+        save = np.savez_compressed if self.compress else np.savez
+        save(os.path.join(self.path, shard_filename(self.num_shards)), **shard)
+        self._shard_ids.append(shard["dungeon_id"])
+        self.num_shards += 1
+        self._ids = []
+        for values in self._columns.values():
+            values.clear()
+
+    def close(self):
+        self.flush()
+        ids = self._shard_ids or [np.zeros(0, dtype=np.int64)]
+        np.savez(os.path.join(self.path, INDEX_FILE),
+                 dungeon_id=np.concatenate(ids),
+                 shard=np.repeat(np.arange(len(self._shard_ids)),
+                                 [len(i) for i in self._shard_ids]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def shard_filename(shard: int) -> str:
+    return f"shard_{shard:05d}.npz"
+
+
+def list_shards(path: str) -> List[Tuple[int, str]]:
+    # (shard number, filename) of every shard in "path", by number
+    shards = []
+    for filename in os.listdir(path):
+        number = filename[len("shard_"):-len(".npz")]
+        if filename.startswith("shard_") and filename.endswith(".npz") \
+                and number.isdigit():
+            shards.append((int(number), filename))
+    return sorted(shards)
+
+
+def export_dungeons(dungeons: Iterable[Tuple[int, nx.MultiDiGraph]],
+                    path: str, shard_size=1000, compress=False,
+                    overwrite=False) -> int:
+    # Write (dungeon_id, dungeon) pairs from any iterable, e.g. a generator
+    # that creates them lazily. Returns the number of dungeons written
+    with DungeonArchiveWriter(path, shard_size=shard_size, compress=compress,
+                              overwrite=overwrite) as writer:
+        for dungeon_id, dungeon in dungeons:
+            writer.add_dungeon(dungeon_id, dungeon)
+    return writer.num_dungeons
+
+
+def iter_shards(path: str, columns=None):
+    # Yields the column dict of every shard of an archive, in order. With
+    # "columns" only those are loaded (decompressed), plus "dungeon_id",
+    # "node_offsets" and "edge_offsets" which every shard needs
+    for _, filename in list_shards(path):
+        with np.load(os.path.join(path, filename)) as data:
+            keys = data.files if columns is None else \
+                ["dungeon_id", "node_offsets", "edge_offsets"] + list(columns)
+            yield {k: data[k] for k in keys}
+
+
+class DungeonArchiveReader:
+    # Reads tables back from an archive. Only the shards holding the
+    # requested dungeons are opened and only the requested columns are
+    # decompressed. Table rows gain "dungeon_id" and, for nodes, "node_id"
+    def __init__(self, path: str) -> None:
+        self.path = path
+        index_file = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_file):
+            with np.load(index_file) as index:
+                self.dungeon_ids = index["dungeon_id"]
+                self.shard_of = index["shard"]
+        else:
+            # Archive from an interrupted run, rebuild the index
+            ids, shards = [], []
+            for shard, f in list_shards(path):
+                with np.load(os.path.join(path, f)) as data:
+                    ids.append(data["dungeon_id"])
+                    shards.append(np.full(len(ids[-1]), shard))
+            self.dungeon_ids = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+            self.shard_of = np.concatenate(shards) if shards else np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.dungeon_ids)
+
+    def _read(self, table: str, dungeon_ids, columns) -> Dict[str, np.ndarray]:
+        all_columns = NODE_COLUMNS if table == "nodes" else EDGE_COLUMNS
+        offsets_key = "node_offsets" if table == "nodes" else "edge_offsets"
+        columns = all_columns if columns is None else list(columns)
+        if dungeon_ids is None:
+            shards = np.unique(self.shard_of)
+        else:
+            wanted = np.isin(self.dungeon_ids, dungeon_ids)
+            shards = np.unique(self.shard_of[wanted])
+        parts: Dict[str, List[np.ndarray]] = {c: [] for c in
+                                              ["dungeon_id"] + columns}
+        if table == "nodes":
+            parts["node_id"] = []
+        for shard in shards:
+            with np.load(os.path.join(self.path, shard_filename(shard))) as data:
+                ids, offsets = data["dungeon_id"], data[offsets_key]
+                counts = np.diff(offsets)
+                row_dungeon = np.repeat(np.arange(len(ids)), counts)
+                rows = slice(None) if dungeon_ids is None \
+                    else np.isin(ids, dungeon_ids)[row_dungeon]
+                parts["dungeon_id"].append(ids[row_dungeon][rows])
+                if table == "nodes":
+                    node_id = np.arange(offsets[-1]) - offsets[row_dungeon]
+                    parts["node_id"].append(node_id[rows])
+                for c in columns:
+                    parts[c].append(data[c][rows])
+        return {c: np.concatenate(v) if v else np.zeros(0, dtype=COLUMN_DTYPES[c])
+                for c, v in parts.items()}
+
+    def read_nodes(self, dungeon_ids=None, columns=None) -> Dict[str, np.ndarray]:
+        # Nodes table of the selected dungeons (default: all) restricted to
+        # "columns" (default: NODE_COLUMNS)
+        return self._read("nodes", dungeon_ids, columns)
+
+    def read_edges(self, dungeon_ids=None, columns=None) -> Dict[str, np.ndarray]:
+        # Edges table, "u"/"v" index the nodes table's "node_id"
+        return self._read("edges", dungeon_ids, columns)
+
+    def read_dungeon(self, dungeon_id: int) -> Dict[str, np.ndarray]:
+        # All columns of a single dungeon, as returned by "dungeon_columns",
+        # plus the nodes' "dungeon_id" and "node_id". The edges' own
+        # "dungeon_id" is dropped so it does not replace the nodes' one
+        columns = self.read_nodes([dungeon_id])
+        edges = self.read_edges([dungeon_id])
+        del edges["dungeon_id"]
+        columns.update(edges)
+        return columns
@@ -0,0 +1,297 @@
+# Padded tensor export of many dungeons for learning pipelines. Dungeons
+# (as the column dicts of "dungeon_columns") are packed into shape buckets
+# by size so a batch is only padded up to its bucket, and every full batch
+# is written straight to disk as one shard, so an ensemble of any size can
+# be streamed from generation workers with flat memory.
+# A batch of B dungeons padded to N nodes and E arcs holds:
+#   "node_type_one_hot": (B, N, len(NODE_TYPES)) float32
+#   "node_features": (B, N, len(NODE_FEATURES)) float32
+#   "role": (B, N) int8, see ROLES
+#   "node_mask": (B, N) bool, True for real nodes
+#   "edge_index": (B, 2, E) int32 (source, target) arcs following the
+#       direction flags, -1 where padded
+#   "edge_mask": (B, E) bool, True for real arcs
+#   "adjacency": (B, N, N) uint8, only if "dense". Dense batches are cut
+#       to at most MAX_DENSE_BYTES of adjacency, so large buckets get fewer
+#       dungeons per shard, and dungeons needing more than that on their
+#       own are refused
+#   "num_nodes", "num_arcs": (B,) int32 and "dungeon_id": (B,) int64
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+from dungeon_net.generation.graph_arrays import NODE_TYPES
+from dungeon_net.generation.edges import TWO_WAY, ONE_WAY_FORWARD, ONE_WAY_BACK
+from dungeon_net.io.archive import iter_shards
+
+NODE_FEATURES = ["num_edges", "filled_edges", "chain_num"]
+TENSOR_FORMATS = ["npz", "npy"]
+# Default bucket edge capacity, in arcs per node of the bucket
+ARCS_PER_NODE = 3
+# Largest dense adjacency of one batch: 256 MB, 16 dungeons of the 4096
+# node bucket or a single dungeon of up to 16384 nodes
+MAX_DENSE_BYTES = 1 << 28
+
+
+def geometric_buckets(min_nodes=16, max_nodes=4096, ratio=1.25) -> List[int]:
+    # Bucket node capacities growing by "ratio", so padding wastes at most
+    # a fraction 1 - 1 / ratio of a bucket
+    sizes = [min_nodes]
+    while sizes[-1] < max_nodes:
+        sizes.append(max(int(np.ceil(sizes[-1] * ratio)), sizes[-1] + 1))
+    return sizes
+
+
+def dungeon_arcs(columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    # Traversable (source, target) node ids of one dungeon's edges table
+    u, v, direction = columns["u"], columns["v"], columns["direction"]
+    forward = direction != ONE_WAY_BACK
+    back = direction != ONE_WAY_FORWARD
+    return (np.concatenate([u[forward], v[back]]),
+            np.concatenate([v[forward], u[back]]))
+
+
+def num_arcs(columns: Dict[str, np.ndarray]) -> int:
+    direction = columns["direction"]
+    return len(direction) + int(np.count_nonzero(direction == TWO_WAY))
+
+
+def pad_batch(batch: Sequence[Dict[str, np.ndarray]], dungeon_ids: Sequence[int],
+              max_nodes: Optional[int] = None, max_arcs: Optional[int] = None,
+              dense=False) -> Dict[str, np.ndarray]:
+    # Padded tensors (see the top of this file) of a batch of dungeon
+    # column dicts. "max_nodes"/"max_arcs" default to the largest dungeon
+    # of the batch. The whole batch is scattered in one go per tensor
+    if not len(batch):
+        raise ValueError("Cannot pad an empty batch")
+    nodes_per = np.array([len(c["node_type"]) for c in batch], dtype=np.int64)
+    arcs = [dungeon_arcs(c) for c in batch]
+    arcs_per = np.array([len(s) for s, _ in arcs], dtype=np.int64)
+    max_nodes = int(nodes_per.max(initial=0)) if max_nodes is None else max_nodes
+    max_arcs = int(arcs_per.max(initial=0)) if max_arcs is None else max_arcs
+    if nodes_per.max(initial=0) > max_nodes or arcs_per.max(initial=0) > max_arcs:
+        raise ValueError(f"Batch does not fit in {max_nodes} nodes and "
+                         f"{max_arcs} arcs")
+    size = len(batch)
+
+    node_dungeon = np.repeat(np.arange(size), nodes_per)
+    node_slot = np.arange(len(node_dungeon)) - np.repeat(
+        np.cumsum(nodes_per) - nodes_per, nodes_per)
+    node_type = np.concatenate([c["node_type"] for c in batch])
+    tensors = {"dungeon_id": np.asarray(dungeon_ids, dtype=np.int64),
+               "num_nodes": nodes_per.astype(np.int32),
+               "num_arcs": arcs_per.astype(np.int32)}
+    one_hot = np.zeros((size, max_nodes, len(NODE_TYPES)), dtype=np.float32)
+    one_hot[node_dungeon, node_slot, node_type] = 1.
+    tensors["node_type_one_hot"] = one_hot
+    features = np.zeros((size, max_nodes, len(NODE_FEATURES)), dtype=np.float32)
+    for k, name in enumerate(NODE_FEATURES):
+        features[node_dungeon, node_slot, k] = np.concatenate(
+            [c[name] for c in batch])
+    tensors["node_features"] = features
+    role = np.zeros((size, max_nodes), dtype=np.int8)
+    role[node_dungeon, node_slot] = np.concatenate([c["role"] for c in batch])
+    tensors["role"] = role
+    tensors["node_mask"] = np.arange(max_nodes) < nodes_per[:, None]
+
+    arc_dungeon = np.repeat(np.arange(size), arcs_per)
+    arc_slot = np.arange(len(arc_dungeon)) - np.repeat(
+        np.cumsum(arcs_per) - arcs_per, arcs_per)
+    source = np.concatenate([s for s, _ in arcs])
+    target = np.concatenate([t for _, t in arcs])
+    edge_index = np.full((size, 2, max_arcs), -1, dtype=np.int32)
+    edge_index[arc_dungeon, 0, arc_slot] = source
+    edge_index[arc_dungeon, 1, arc_slot] = target
+    tensors["edge_index"] = edge_index
+    tensors["edge_mask"] = np.arange(max_arcs) < arcs_per[:, None]
+    if dense:
+        adjacency = np.zeros((size, max_nodes, max_nodes), dtype=np.uint8)
+        adjacency[arc_dungeon, source, target] = 1
+        tensors["adjacency"] = adjacency
+    return tensors
+
+
+class BucketPacker:
+    # Sorts dungeons into shape buckets: a dungeon goes to the smallest
+    # bucket with at least as many nodes and "arcs_per_node" times as many
+    # arcs, dungeons too big for every bucket get a bucket of their own
+    # size rounded up to a power of two. "add" returns the padded batch of
+    # a bucket once it holds "batch_size" dungeons (fewer if "dense", see
+    # MAX_DENSE_BYTES), "flush" the leftovers
+    def __init__(self, buckets: Optional[Sequence[int]] = None, batch_size=256,
+                 arcs_per_node=ARCS_PER_NODE, dense=False) -> None:
+        self.buckets = np.array(sorted(geometric_buckets() if buckets is None
+                                       else buckets), dtype=np.int64)
+        self.batch_size = batch_size
+        self.arcs_per_node = arcs_per_node
+        self.dense = dense
+        self.num_dungeons = 0
+        self.num_packed_nodes = 0
+        self.num_padded_nodes = 0
+        self._pending: Dict[int, Tuple[List[int], List[Dict[str, np.ndarray]]]] = {}
+
+    def bucket_of(self, num_nodes: int, num_arcs: int) -> int:
+        needed = max(num_nodes, int(np.ceil(num_arcs / self.arcs_per_node)))
+        i = int(np.searchsorted(self.buckets, needed))
+        if i < len(self.buckets):
+            return int(self.buckets[i])
+        return 1 << max(needed - 1, 0).bit_length()
+
+    def batch_size_of(self, bucket: int) -> int:
+        if not self.dense:
+            return self.batch_size
+        return min(self.batch_size, MAX_DENSE_BYTES // (bucket * bucket))
+
+    def _pad(self, bucket: int) -> Dict[str, np.ndarray]:
+        ids, batch = self._pending.pop(bucket)
+        self.num_packed_nodes += sum(len(c["node_type"]) for c in batch)
+        self.num_padded_nodes += bucket * len(batch)
+        return pad_batch(batch, ids, bucket, bucket * self.arcs_per_node,
+                         dense=self.dense)
+
+    def add(self, dungeon_id: int,
+            columns: Dict[str, np.ndarray]) -> Optional[Tuple[int, Dict[str, np.ndarray]]]:
+        bucket = self.bucket_of(len(columns["node_type"]), num_arcs(columns))
+        batch_size = self.batch_size_of(bucket)
+        if batch_size < 1:
+            raise ValueError(f"Dungeon {dungeon_id} needs a {bucket}x{bucket} "
+                             f"dense adjacency, more than {MAX_DENSE_BYTES} bytes")
+        ids, batch = self._pending.setdefault(bucket, ([], []))
+        ids.append(dungeon_id)
+        batch.append(columns)
+        self.num_dungeons += 1
+        if len(batch) >= batch_size:
+            return bucket, self._pad(bucket)
+        return None
+
+    def flush(self) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+        for bucket in sorted(self._pending):
+            yield bucket, self._pad(bucket)
+
+    def padding_ratio(self) -> float:
+        # Node slots over real nodes of the batches padded so far
+        return self.num_padded_nodes / max(self.num_packed_nodes, 1)
+
+
+def iter_tensor_batches(dungeons: Iterable[Tuple[int, Dict[str, np.ndarray]]],
+                        buckets: Optional[Sequence[int]] = None, batch_size=256,
+                        arcs_per_node=ARCS_PER_NODE,
+                        dense=False) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+    # Stream (bucket, padded batch) pairs from (dungeon_id, columns) pairs,
+    # full batches as soon as they fill up and the partial ones at the end
+    packer = BucketPacker(buckets, batch_size, arcs_per_node, dense)
+    for dungeon_id, columns in dungeons:
+        full = packer.add(dungeon_id, columns)
+        if full is not None:
+            yield full
+    yield from packer.flush()
+
+
+def tensor_shard_path(path: str, bucket: int, shard: int, fmt="npz") -> str:
+    # "npz" shards are one file, "npy" shards a directory of one ".npy" per
+    # tensor so they can be memory-mapped
+    name = os.path.join(path, f"bucket_{bucket:05d}", f"shard_{shard:05d}")
+    return name + ".npz" if fmt == "npz" else name
+
+
+def write_tensor_shard(filename: str, tensors: Dict[str, np.ndarray], fmt="npz",
+                       compress=False):
+    if fmt not in TENSOR_FORMATS:
+        raise ValueError(f"fmt must be one of {TENSOR_FORMATS}, not {fmt}")
+    if fmt == "npz":
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        save = np.savez_compressed if compress else np.savez
+        save(filename, **tensors)
+    else:
+        os.makedirs(filename, exist_ok=True)
+        for name, values in tensors.items():
+            np.save(os.path.join(filename, f"{name}.npy"), values)
+
+
+class TensorShardWriter:
+    # Packs dungeons added one at a time into buckets (see "BucketPacker")
+    # and writes every full batch as a shard under "path", one directory
+    # per bucket. Memory use is bounded by one pending batch per bucket
+    def __init__(self, path: str, buckets: Optional[Sequence[int]] = None,
+                 batch_size=256, arcs_per_node=ARCS_PER_NODE, dense=False,
+                 fmt="npz", compress=False) -> None:
+        if fmt not in TENSOR_FORMATS:
+            raise ValueError(f"fmt must be one of {TENSOR_FORMATS}, not {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.compress = compress
+        self.packer = BucketPacker(buckets, batch_size, arcs_per_node, dense)
+        self.num_shards: Dict[int, int] = {}
+        os.makedirs(path, exist_ok=True)
+
+    @property
+    def num_dungeons(self) -> int:
+        return self.packer.num_dungeons
+
+    def _write(self, bucket: int, tensors: Dict[str, np.ndarray]):
+        shard = self.num_shards.get(bucket, 0)
+        write_tensor_shard(tensor_shard_path(self.path, bucket, shard, self.fmt),
+                           tensors, fmt=self.fmt, compress=self.compress)
+        self.num_shards[bucket] = shard + 1
+
+    def add(self, dungeon_id: int, columns: Dict[str, np.ndarray]):
+        full = self.packer.add(dungeon_id, columns)
+        if full is not None:
+            self._write(*full)
+
+    def close(self):
+        for bucket, tensors in self.packer.flush():
+            self._write(bucket, tensors)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_tensor_shards(dungeons: Iterable[Tuple[int, Dict[str, np.ndarray]]],
+                         path: str, buckets: Optional[Sequence[int]] = None,
+                         batch_size=256, arcs_per_node=ARCS_PER_NODE, dense=False,
+                         fmt="npz", compress=False) -> Dict[int, int]:
+    # Write (dungeon_id, columns) pairs from any iterable (e.g. results
+    # streamed from a worker pool, or "iter_archive_columns") as padded
+    # tensor shards. Returns the number of shards per bucket
+    with TensorShardWriter(path, buckets, batch_size, arcs_per_node, dense,
+                           fmt, compress) as writer:
+        for dungeon_id, columns in dungeons:
+            writer.add(dungeon_id, columns)
+    return writer.num_shards
+
+
+def iter_archive_columns(path: str) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+    # (dungeon_id, columns) of every dungeon of a columnar archive (see
+    # "archive"), one shard in memory at a time
+    for shard in iter_shards(path):
+        node_offsets, edge_offsets = shard["node_offsets"], shard["edge_offsets"]
+        for i, dungeon_id in enumerate(shard["dungeon_id"]):
+            nodes = slice(node_offsets[i], node_offsets[i + 1])
+            edges = slice(edge_offsets[i], edge_offsets[i + 1])
+            columns = {c: shard[c][nodes] for c in ["node_type", "num_edges",
+                                                     "filled_edges", "chain_num",
+                                                     "role"]}
+            columns.update({c: shard[c][edges] for c in ["u", "v", "direction"]})
+            yield int(dungeon_id), columns
+
+
+def iter_tensor_shards(path: str, mmap=True) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+    # (bucket, tensors) of every shard written by "export_tensor_shards",
+    # "npy" shards are memory-mapped unless "mmap" is False
+    for bucket_dir in sorted(d for d in os.listdir(path) if d.startswith("bucket_")):
+        bucket = int(bucket_dir[len("bucket_"):])
+        bucket_path = os.path.join(path, bucket_dir)
+        for name in sorted(os.listdir(bucket_path)):
+            filename = os.path.join(bucket_path, name)
+            if name.endswith(".npz"):
+                with np.load(filename) as data:
+                    yield bucket, {k: data[k] for k in data.files}
+            elif os.path.isdir(filename):
+                yield bucket, {f[:-len(".npy")]: np.load(os.path.join(filename, f),
+                                                          mmap_mode="r" if mmap else None)
+                               for f in sorted(os.listdir(filename))
+                               if f.endswith(".npy")}
@@ -1 +1,2 @@
-from .array_utils import *
\ No newline at end of file
+from .array_utils import *
+from .csr import *
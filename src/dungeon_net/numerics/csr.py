@@ -0,0 +1,93 @@
+# Vectorized helpers for graphs stored in CSR (compressed sparse row) form:
+# the neighbours of node "i" are indices[indptr[i]:indptr[i+1]]
+import numpy as np
+
+
+def csr_degrees(indptr: np.ndarray) -> np.ndarray:
+    # Number of stored neighbours of every node
+    return np.diff(indptr)
+
+
+def expand_csr_rows(indptr: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    # Positions into "indices" of every neighbour of every node in "rows",
+    # concatenated in the order of "rows", without a Python loop
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(total)
+
+
+def csr_bfs(indptr: np.ndarray, indices: np.ndarray,
+            sources: np.ndarray) -> np.ndarray:
+    # Breadth-first search from all "sources" at once, returns the hop
+    # distance to every node (-1 where unreachable). Each level is expanded
+    # as a whole frontier so the cost is O(V + E) numpy work
+    num_nodes = len(indptr) - 1
+    depth = np.full(num_nodes, -1, dtype=np.int32)
+    frontier = np.unique(np.asarray(sources, dtype=np.int64))
+    depth[frontier] = 0
+    level = 0
+    while frontier.size:
+        level += 1
+        neighbours = indices[expand_csr_rows(indptr, frontier)]
+        neighbours = np.unique(neighbours[depth[neighbours] < 0])
+        depth[neighbours] = level
+        frontier = neighbours
+    return depth
+
+
+def csr_multi_bfs(indptr: np.ndarray, indices: np.ndarray,
+                  sources: np.ndarray) -> np.ndarray:
+    # Separate breadth-first searches from every source, run together:
+    # row "s" is the hop distance from sources[s] to every node (-1 where
+    # unreachable). The frontiers of all searches are expanded as one array
+    # of (search, node) pairs per level, O(S * (V + E)) numpy work
+    sources = np.asarray(sources, dtype=np.int64)
+    num_nodes = len(indptr) - 1
+    depth = np.full((len(sources), num_nodes), -1, dtype=np.int32)
+    flat = depth.reshape(-1)
+    search = np.arange(len(sources))
+    frontier = sources
+    depth[search, frontier] = 0
+    level = 0
+    while frontier.size:
+        level += 1
+        counts = indptr[frontier + 1] - indptr[frontier]
+        keys = np.repeat(search, counts) * num_nodes + \
+            indices[expand_csr_rows(indptr, frontier)]
+        keys = np.unique(keys[flat[keys] < 0])
+        flat[keys] = level
+        search, frontier = np.divmod(keys, num_nodes)
+    return depth
+
+
+def csr_from_arcs(sources: np.ndarray, targets: np.ndarray,
+                  num_nodes: int):
+    # (indptr, indices) for the directed arcs sources[i] -> targets[i]
+    order = np.argsort(sources, kind="stable")
+    counts = np.bincount(sources, minlength=num_nodes)
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, targets[order].astype(np.int32)
+
+
+def connected_component_labels(u: np.ndarray, v: np.ndarray,
+                               num_nodes: int) -> np.ndarray:
+    # Label every node with the smallest node index in its (undirected)
+    # component, by min-label propagation over the edges with pointer
+    # jumping, so each round is a few vectorized passes over the edges
+    labels = np.arange(num_nodes)
+    if len(u) == 0:
+        return labels
+    while True:
+        edge_min = np.minimum(labels[u], labels[v])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, u, edge_min)
+        np.minimum.at(new_labels, v, edge_min)
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
@@ -4,6 +4,7 @@ from typing import List, Tuple
 from collections import defaultdict
 import math
 import networkx as nx
+import numpy as np
 import plotly.graph_objects as go
 
 
@@ -56,10 +57,18 @@ class Room:
 
         self.room_graph = room_graph
 
-    def generate_doors_from_tiles(self):
-        # TODO: Find a good metric for where to place doors and how many,
-        # then just pick a tile to be a door-tile
-        pass
+    def generate_doors_from_tiles(self, num_doors=1, directions=None):
+        # Pick "num_doors" boundary tiles as doors, facing "directions"
+        # ((dx, dy) per door) and spread apart, see "spatial.doors"
+        from dungeon_net.spatial.doors import room_doors
+        x0 = min(c.x for c in self.coords)
+        y0 = min(c.y for c in self.coords)
+        mask = np.zeros((max(c.y for c in self.coords) - y0 + 1,
+                         max(c.x for c in self.coords) - x0 + 1), dtype=bool)
+        for coord in self.coords:
+            mask[coord.y - y0, coord.x - x0] = True
+        xs, ys = room_doors(mask, num_doors, directions)
+        self.doors = [Coord(int(x) + x0, int(y) + y0) for x, y in zip(xs, ys)]
 
     @classmethod
     def rectangular(cls, length: int, width: int):
@@ -0,0 +1 @@
+from .inhabitants import *
@@ -0,0 +1,152 @@
+# Inhabitants of a dungeon stored as struct-of-arrays and stepped with
+# vectorized operations over the dungeon's CSR adjacency
+import numpy as np
+
+from dungeon_net.generation.graph_arrays import DungeonArrays
+
+# Inhabitant states
+IDLE = 0
+WANDERING = 1
+FIGHTING = 2
+DEAD = 3
+
+
+class Inhabitants:
+    # One entry per creature in each array, creature "i" is at node
+    # position[i] (an index into DungeonArrays.nodes), belongs to
+    # faction[i] and has health[i] and state[i]
+    def __init__(self) -> None:
+        self.position = np.zeros(0, dtype=np.int32)
+        self.faction = np.zeros(0, dtype=np.int16)
+        self.health = np.zeros(0, dtype=np.float32)
+        self.state = np.zeros(0, dtype=np.int8)
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    def alive(self) -> np.ndarray:
+        return self.state != DEAD
+
+    def spawn(self, position: np.ndarray, faction: np.ndarray,
+              health: np.ndarray, state=IDLE):
+        # Append a batch of creatures, all array arguments must have the
+        # same length (scalars are broadcast)
+        position = np.asarray(position, dtype=np.int32)
+        count = len(position)
+        self.position = np.concatenate([self.position, position])
+        self.faction = np.concatenate(
+            [self.faction, np.broadcast_to(faction, count).astype(np.int16)])
+        self.health = np.concatenate(
+            [self.health, np.broadcast_to(health, count).astype(np.float32)])
+        self.state = np.concatenate(
+            [self.state, np.full(count, state, dtype=np.int8)])
+
+    def compact(self):
+        # Drop dead creatures, this reorders nothing so the surviving
+        # creatures keep their relative order
+        keep = self.alive()
+        self.position = self.position[keep]
+        self.faction = self.faction[keep]
+        self.health = self.health[keep]
+        self.state = self.state[keep]
+
+    def counts_per_node(self, num_nodes: int, num_factions: int) -> np.ndarray:
+        # (num_nodes, num_factions) array of living creatures at each node
+        alive = self.alive()
+        keys = (self.position[alive].astype(np.int64) * num_factions
+                + self.faction[alive])
+        counts = np.bincount(keys, minlength=num_nodes * num_factions)
+        return counts.reshape(num_nodes, num_factions)
+
+
+class InhabitantSimulation:
+    # Time-dependent evolution of the inhabitants of one dungeon. Every
+    # random draw comes from a single seeded generator and is made for the
+    # whole population at once, so a run is reproducible from "seed"
+    # "move_prob" is the chance a wandering creature takes an edge per tick
+    # "wake_prob" is the chance an idle creature starts wandering
+    # "attack" is the damage dealt per enemy present at the same node
+    # "spawn_nodes"/"spawn_factions"/"spawn_rates" describe lairs, each
+    # produces Poisson("spawn_rate") creatures of its faction per tick
+    def __init__(self, arrays: DungeonArrays, num_factions: int, seed=None,
+                 move_prob=0.5, wake_prob=0.1, attack=1.,
+                 spawn_health=10., spawn_nodes=None, spawn_factions=None,
+                 spawn_rates=None, compact_every=32) -> None:
+        self.arrays = arrays
+        self.num_factions = num_factions
+        self.rng = np.random.default_rng(seed)
+        self.move_prob = move_prob
+        self.wake_prob = wake_prob
+        self.attack = attack
+        self.spawn_health = spawn_health
+        self.spawn_nodes = np.zeros(0, dtype=np.int32) if spawn_nodes is None \
+            else np.asarray(spawn_nodes, dtype=np.int32)
+        self.spawn_factions = np.zeros(0, dtype=np.int16) if spawn_factions is None \
+            else np.asarray(spawn_factions, dtype=np.int16)
+        self.spawn_rates = np.zeros(0) if spawn_rates is None \
+            else np.broadcast_to(spawn_rates, len(self.spawn_nodes))
+        self.compact_every = compact_every
+        self.inhabitants = Inhabitants()
+        self.tick = 0
+
+    def populate(self, count: int, faction_probs=None):
+        # Scatter "count" creatures uniformly over the dungeon nodes
+        position = self.rng.integers(0, self.arrays.num_nodes, size=count)
+        faction = self.rng.choice(self.num_factions, size=count,
+                                  p=faction_probs)
+        self.inhabitants.spawn(position, faction, self.spawn_health)
+
+    def move(self):
+        # Wandering creatures pick a uniformly random neighbour of their node
+        # idle ones may wake up, nodes without neighbours keep them in place
+        inh = self.inhabitants
+        indptr, indices = self.arrays.indptr, self.arrays.indices
+        waking = (inh.state == IDLE) & (self.rng.random(len(inh)) < self.wake_prob)
+        inh.state[waking] = WANDERING
+        movers = np.flatnonzero((inh.state == WANDERING)
+                                & (self.rng.random(len(inh)) < self.move_prob))
+        position = inh.position[movers]
+        start = indptr[position]
+        degree = indptr[position + 1] - start
+        has_exit = degree > 0
+        movers, start, degree = movers[has_exit], start[has_exit], degree[has_exit]
+        choice = (self.rng.random(len(movers)) * degree).astype(np.int64)
+        inh.position[movers] = indices[start + choice]
+
+    def interact(self):
+        # Creatures sharing a node with other factions fight: each one takes
+        # "attack" damage per enemy present, and dies at zero health.
+        # Survivors of a fight that are now alone go back to wandering
+        inh = self.inhabitants
+        alive = inh.alive()
+        counts = inh.counts_per_node(self.arrays.num_nodes, self.num_factions)
+        totals = counts.sum(axis=1)
+        enemies = (totals[inh.position]
+                   - counts[inh.position, inh.faction]) * alive
+        fighting = enemies > 0
+        inh.health -= self.attack * enemies
+        inh.state[fighting] = FIGHTING
+        inh.state[alive & ~fighting & (inh.state == FIGHTING)] = WANDERING
+        inh.state[alive & (inh.health <= 0)] = DEAD
+
+    def spawn(self):
+        if not len(self.spawn_nodes):
+            return
+        counts = self.rng.poisson(self.spawn_rates)
+        self.inhabitants.spawn(np.repeat(self.spawn_nodes, counts),
+                               np.repeat(self.spawn_factions, counts),
+                               self.spawn_health)
+
+    def step(self, num_ticks=1):
+        for _ in range(num_ticks):
+            self.move()
+            self.interact()
+            self.spawn()
+            self.tick += 1
+            if self.compact_every and self.tick % self.compact_every == 0:
+                self.inhabitants.compact()
+
+    def population(self) -> np.ndarray:
+        # (node, faction) counts of the living population
+        return self.inhabitants.counts_per_node(self.arrays.num_nodes,
+                                                self.num_factions)
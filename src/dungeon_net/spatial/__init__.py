@@ -0,0 +1,5 @@
+from .spatial_hash import *
+from .placement import *
+from .routing import *
+from .doors import *
+from .templates import *
@@ -0,0 +1,211 @@
+# Door placement on room boundaries: every room gets "num_edges" door tiles
+# on its boundary, facing the neighbours it connects to and spread apart.
+# Tiles are scored with array operations, all rooms of a dungeon are
+# handled together, one round per door of the busiest room
+from typing import Optional, Tuple
+import numpy as np
+
+from dungeon_net.spatial.placement import Placement
+
+# Score penalty of corner tiles (doors there would open diagonally)
+CORNER_PENALTY = 1.
+
+
+def mask_boundary(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # (x, y, normal_x, normal_y) of the tiles of a boolean room mask
+    # ("mask[y, x]") with at least one of their 4 neighbours outside the
+    # room. The normal points out of the room, summed over open sides
+    padded = np.pad(np.asarray(mask, dtype=bool), 1)
+    inside = padded[1:-1, 1:-1]
+    open_left = inside & ~padded[1:-1, :-2]
+    open_right = inside & ~padded[1:-1, 2:]
+    open_down = inside & ~padded[:-2, 1:-1]
+    open_up = inside & ~padded[2:, 1:-1]
+    normal_x = open_right.astype(np.int8) - open_left
+    normal_y = open_up.astype(np.int8) - open_down
+    y, x = np.nonzero(open_left | open_right | open_down | open_up)
+    return x, y, normal_x[y, x], normal_y[y, x]
+
+
+def rect_boundaries(x0: np.ndarray, y0: np.ndarray, width: np.ndarray,
+                    height: np.ndarray) -> Tuple[np.ndarray, ...]:
+    # Boundary tiles of many rectangles at once, as (room, x, y, normal_x,
+    # normal_y) with the tiles of every room contiguous and in room order
+    width = np.asarray(width, dtype=np.int64)
+    height = np.asarray(height, dtype=np.int64)
+    counts = width * height
+    room = np.repeat(np.arange(len(width)), counts)
+    k = np.arange(len(room)) - np.repeat(np.cumsum(counts) - counts, counts)
+    local_x, local_y = k % width[room], k // width[room]
+    right = local_x == width[room] - 1
+    up = local_y == height[room] - 1
+    on_edge = (local_x == 0) | right | (local_y == 0) | up
+    normal_x = right.astype(np.int8) - (local_x == 0)
+    normal_y = up.astype(np.int8) - (local_y == 0)
+    room, local_x, local_y = room[on_edge], local_x[on_edge], local_y[on_edge]
+    return (room, x0[room] + local_x, y0[room] + local_y,
+            normal_x[on_edge], normal_y[on_edge])
+
+
+def assign_doors(tile_room: np.ndarray, tile_x: np.ndarray, tile_y: np.ndarray,
+                 normal_x: np.ndarray, normal_y: np.ndarray,
+                 centre_x: np.ndarray, centre_y: np.ndarray,
+                 door_room: np.ndarray, direction_x: np.ndarray,
+                 direction_y: np.ndarray, spacing=None) -> np.ndarray:
+    # Choose a boundary tile for every door, returns the chosen tile index
+    # per door (-1 if its room has no free boundary tile). "tile_room" and
+    # "door_room" are the room of every tile and door, a door with a zero
+    # direction only has to keep its distance from the others. A tile scores the
+    # alignment of its normal and of its offset from the room centre with
+    # the door's direction, minus a Gaussian penalty of width "spacing"
+    # (default: the room's perimeter over twice its number of doors) around
+    # the doors already placed in the room
+    num_rooms = len(centre_x)
+    num_doors = len(door_room)
+    chosen = np.full(num_doors, -1, dtype=np.int64)
+    if not num_doors or not len(tile_room):
+        return chosen
+    tiles_per_room = np.bincount(tile_room, minlength=num_rooms)
+    doors_per_room = np.bincount(door_room, minlength=num_rooms)
+    if spacing is None:
+        spacing = np.maximum(tiles_per_room / (2. * np.maximum(doors_per_room, 1)), 1.)
+    else:
+        spacing = np.broadcast_to(np.asarray(spacing, dtype=float), (num_rooms,))
+    # Rank of each door within its room, doors are placed one rank per round
+    order = np.argsort(door_room, kind="stable")
+    first_door = np.cumsum(doors_per_room) - doors_per_room
+    rank = np.empty(num_doors, dtype=np.int64)
+    rank[order] = np.arange(num_doors) - first_door[door_room[order]]
+
+    offset_x = tile_x + 0.5 - centre_x[tile_room]
+    offset_y = tile_y + 0.5 - centre_y[tile_room]
+    offset_len = np.maximum(np.hypot(offset_x, offset_y), 1e-9)
+    normal_len = np.maximum(np.hypot(normal_x, normal_y), 1)
+    unit_x, unit_y = offset_x / offset_len, offset_y / offset_len
+    norm_x, norm_y = normal_x / normal_len, normal_y / normal_len
+    base = -CORNER_PENALTY * ((normal_x != 0) & (normal_y != 0))
+    penalty = np.zeros(len(tile_room))
+    taken = np.zeros(len(tile_room), dtype=bool)
+
+    for r in range(int(rank.max()) + 1):
+        doors = np.flatnonzero(rank == r)
+        rooms = door_room[doors]
+        dir_x = np.zeros(num_rooms)
+        dir_y = np.zeros(num_rooms)
+        length = np.maximum(np.hypot(direction_x[doors], direction_y[doors]), 1e-9)
+        dir_x[rooms] = direction_x[doors] / length
+        dir_y[rooms] = direction_y[doors] / length
+        active = np.zeros(num_rooms, dtype=bool)
+        active[rooms] = True
+        dx, dy = dir_x[tile_room], dir_y[tile_room]
+        score = base + norm_x * dx + norm_y * dy + unit_x * dx + unit_y * dy - penalty
+        score[~active[tile_room] | taken] = -np.inf
+        # Best tile of every active room: sort by (room, -score)
+        best_order = np.lexsort((-score, tile_room))
+        firsts = np.cumsum(tiles_per_room) - tiles_per_room
+        has_tiles = active & (tiles_per_room > 0)
+        best = best_order[firsts[has_tiles]]
+        valid = np.isfinite(score[best])
+        best, best_rooms = best[valid], np.flatnonzero(has_tiles)[valid]
+        door_of_room = np.full(num_rooms, -1, dtype=np.int64)
+        door_of_room[rooms] = doors
+        chosen[door_of_room[best_rooms]] = best
+        taken[best] = True
+        # Push later doors of the same rooms away from the new ones
+        new_x = np.zeros(num_rooms)
+        new_y = np.zeros(num_rooms)
+        placed = np.zeros(num_rooms, dtype=bool)
+        new_x[best_rooms], new_y[best_rooms] = tile_x[best], tile_y[best]
+        placed[best_rooms] = True
+        near = placed[tile_room]
+        dist2 = (tile_x[near] - new_x[tile_room[near]]) ** 2 + \
+            (tile_y[near] - new_y[tile_room[near]]) ** 2
+        width = spacing[tile_room[near]]
+        penalty[near] += 2. * np.exp(-dist2 / (2. * width ** 2))
+    return chosen
+
+
+def room_doors(mask: np.ndarray, num_doors: int, directions=None,
+               spacing=None) -> Tuple[np.ndarray, np.ndarray]:
+    # (x, y) of "num_doors" door tiles on the boundary of one room mask
+    # ("mask[y, x]"). "directions" is an optional (k, 2) array of (dx, dy)
+    # towards the rooms the first k doors lead to
+    x, y, normal_x, normal_y = mask_boundary(mask)
+    ys, xs = np.nonzero(mask)
+    centre_x = np.array([xs.mean() + 0.5 if len(xs) else 0.])
+    centre_y = np.array([ys.mean() + 0.5 if len(ys) else 0.])
+    direction = np.zeros((num_doors, 2))
+    if directions is not None and len(directions):
+        directions = np.asarray(directions, dtype=float)[:num_doors]
+        direction[:len(directions)] = directions
+    chosen = assign_doors(np.zeros(len(x), dtype=np.int64), x, y, normal_x,
+                          normal_y, centre_x, centre_y,
+                          np.zeros(num_doors, dtype=np.int64),
+                          direction[:, 0], direction[:, 1], spacing)
+    chosen = chosen[chosen >= 0]
+    return x[chosen], y[chosen]
+
+
+class Doors:
+    # Door tiles of a placed dungeon: door "k" is at (x[k], y[k]) on the
+    # boundary of node "room[k]" (DungeonArrays order), facing outward
+    # along (normal_x[k], normal_y[k]) and leading to node "neighbour[k]"
+    # (-1 for doors beyond the room's connections). Doors that found no
+    # free boundary tile are dropped
+    def __init__(self, room: np.ndarray, neighbour: np.ndarray, x: np.ndarray,
+                 y: np.ndarray, normal_x: np.ndarray, normal_y: np.ndarray) -> None:
+        self.room = room
+        self.neighbour = neighbour
+        self.x = x
+        self.y = y
+        self.normal_x = normal_x
+        self.normal_y = normal_y
+
+    def __len__(self) -> int:
+        return len(self.room)
+
+    def outside(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Tiles just outside every door, where a corridor attaches
+        return self.x + np.sign(self.normal_x), self.y + np.sign(self.normal_y)
+
+
+def dungeon_doors(placement: Placement, num_doors: Optional[np.ndarray] = None,
+                  spacing=None) -> Doors:
+    # Doors of every node with a footprint in one batched call. A room gets
+    # "num_doors" doors (default: its num_edges, at least one per distinct
+    # neighbour), one facing each neighbour's position and the rest spread
+    # over the remaining boundary
+    arrays = placement.arrays
+    degrees = arrays.degrees()
+    if num_doors is None:
+        num_doors = arrays.num_edges
+    num_doors = np.maximum(np.asarray(num_doors, dtype=np.int64), degrees)
+    num_doors[~placement.has_footprint] = 0
+
+    rooms = np.flatnonzero(placement.has_footprint)
+    x0, y0, _, _ = placement.rects()
+    tile_room, tile_x, tile_y, normal_x, normal_y = rect_boundaries(
+        x0[rooms], y0[rooms], placement.width[rooms], placement.height[rooms])
+    tile_room = rooms[tile_room]
+
+    # Doors of each room: its arcs first, then the spare doors
+    sources = np.repeat(np.arange(arrays.num_nodes), degrees)
+    has_arc = placement.has_footprint[sources]
+    spare = num_doors - degrees * placement.has_footprint
+    door_room = np.concatenate([sources[has_arc],
+                                np.repeat(np.arange(arrays.num_nodes), spare)])
+    neighbour = np.concatenate([arrays.indices[has_arc],
+                                np.full(int(spare.sum()), -1, dtype=np.int64)])
+    order = np.argsort(door_room, kind="stable")
+    door_room, neighbour = door_room[order], neighbour[order]
+    towards = neighbour >= 0
+    direction_x = np.where(towards, placement.x[neighbour] - placement.x[door_room], 0.)
+    direction_y = np.where(towards, placement.y[neighbour] - placement.y[door_room], 0.)
+
+    chosen = assign_doors(tile_room, tile_x, tile_y, normal_x, normal_y,
+                          placement.x, placement.y, door_room, direction_x,
+                          direction_y, spacing)
+    ok = chosen >= 0
+    tile = chosen[ok]
+    return Doors(door_room[ok], neighbour[ok], tile_x[tile], tile_y[tile],
+                 normal_x[tile], normal_y[tile])
@@ -0,0 +1,199 @@
+# Physical placement of a dungeon graph: every Room and Junction gets a
+# rectangular footprint on the tile grid, positions are settled with springs
+# along the graph edges and overlaps are pushed apart using the spatial hash
+from typing import Tuple
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.node import Corridor, Junction
+from dungeon_net.generation.graph_arrays import DungeonArrays, NODE_TYPES
+from dungeon_net.numerics.csr import csr_bfs
+from dungeon_net.spatial.spatial_hash import overlapping_pairs
+
+
+class Placement:
+    # Node "i" of "arrays" is centred at (x[i], y[i]) with a width[i] x
+    # height[i] footprint in tiles. Corridors have a zero footprint, they
+    # only get a position between their neighbours
+    def __init__(self, arrays: DungeonArrays, x: np.ndarray, y: np.ndarray,
+                 width: np.ndarray, height: np.ndarray) -> None:
+        self.arrays = arrays
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    @property
+    def has_footprint(self) -> np.ndarray:
+        return self.width > 0
+
+    def rects(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # Integer tile bounds (x0, y0, x1, y1) of every footprint, x1/y1
+        # exclusive
+        x0 = np.floor(self.x - self.width / 2).astype(np.int64)
+        y0 = np.floor(self.y - self.height / 2).astype(np.int64)
+        return x0, y0, x0 + self.width, y0 + self.height
+
+    def bounds(self) -> Tuple[int, int, int, int]:
+        # Tile bounds covering every footprint
+        x0, y0, x1, y1 = self.rects()
+        return int(x0.min()), int(y0.min()), int(x1.max()), int(y1.max())
+
+    def overlaps(self, gap=0) -> int:
+        # Number of pairs of footprints overlapping (or closer than "gap")
+        # on the tile grid
+        rooms = np.flatnonzero(self.has_footprint)
+        x0, y0, x1, y1 = self.rects()
+        i, _, _, _ = overlapping_pairs(((x0 + x1) / 2)[rooms],
+                                       ((y0 + y1) / 2)[rooms],
+                                       self.width[rooms].astype(float),
+                                       self.height[rooms].astype(float),
+                                       gap=gap - 1e-9)
+        return len(i)
+
+
+def default_footprints(arrays: DungeonArrays, rng: np.random.Generator,
+                       min_room_size=3, max_growth=8) -> Tuple[np.ndarray, np.ndarray]:
+    # Rooms grow with the number of doors they need (up to "max_growth"
+    # tiles), Junctions are small squares and Corridors have no footprint
+    num_edges = np.minimum(arrays.num_edges.astype(np.int64), max_growth)
+    node_type = arrays.node_type
+    width = min_room_size + num_edges + rng.integers(0, 3, len(num_edges))
+    height = min_room_size + num_edges + rng.integers(0, 3, len(num_edges))
+    junctions = node_type == NODE_TYPES.index(Junction)
+    width[junctions] = height[junctions] = 3
+    corridors = node_type == NODE_TYPES.index(Corridor)
+    width[corridors] = height[corridors] = 0
+    return width, height
+
+
+def radial_order(arrays: DungeonArrays, depth: np.ndarray,
+                 rng: np.random.Generator) -> np.ndarray:
+    # Node indices sorted by BFS depth, nodes of the same depth sorted by
+    # the position of their parent (a neighbour one layer up) in the
+    # previous layer, so subtrees occupy contiguous angles
+    sources = np.repeat(np.arange(arrays.num_nodes), arrays.degrees())
+    up = depth[arrays.indices] == depth[sources] - 1
+    children, first = np.unique(sources[up], return_index=True)
+    parent = np.full(arrays.num_nodes, -1)
+    parent[children] = arrays.indices[up][first]
+    position = np.zeros(arrays.num_nodes)
+    by_depth = np.argsort(depth, kind="stable")
+    bounds = np.searchsorted(depth[by_depth], np.arange(int(depth.max()) + 2))
+    layers = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        layer = by_depth[start:end]
+        key = np.where(parent[layer] >= 0, position[np.maximum(parent[layer], 0)],
+                       rng.random(len(layer)))
+        layer = layer[np.lexsort((rng.random(len(layer)), key))]
+        position[layer] = np.arange(len(layer)) / max(len(layer), 1)
+        layers.append(layer)
+    return np.concatenate(layers)
+
+
+def place_rooms(dungeon: nx.MultiDiGraph, seed=None, arrays=None,
+                footprints=None, gap=2, spring=0.1, num_iter=100,
+                separate_every=5, max_separation_iter=2000,
+                inflate=0.05) -> Placement:
+    # Place every Room/Junction so that it does not overlap any other and
+    # stays close to its graph neighbours. "footprints" is an optional
+    # (width, height) pair of arrays in DungeonArrays order, "gap" is the
+    # minimum number of free tiles between footprints (room for walls and
+    # corridors). Rooms start on rings around the Entrance by BFS depth,
+    # then "num_iter" steps of springs along edges + overlap separation are
+    # run (separating every "separate_every" steps), followed by separation
+    # only until nothing overlaps. Pairwise pushes alone stall in crowded
+    # regions, so while overlaps remain the whole layout is also scaled up
+    # around its centre, by up to "inflate" when every room overlaps (this
+    # never creates new overlaps and bounds the number of iterations)
+    if arrays is None:
+        arrays = DungeonArrays.from_dungeon(dungeon)
+    rng = np.random.default_rng(seed)
+    width, height = default_footprints(arrays, rng) if footprints is None \
+        else footprints
+    width = np.asarray(width, dtype=np.int64)
+    height = np.asarray(height, dtype=np.int64)
+    num_nodes = arrays.num_nodes
+    size = np.maximum(width, height).astype(float)
+    rooms = np.flatnonzero(width > 0)
+
+    # Spread nodes uniformly over a disk with room for every footprint as a
+    # radial tree: nodes further from the Entrance (by BFS depth) further
+    # out and every BFS layer ordered by the angle of its parents
+    entrance = max(arrays.index_of_name("Entrance"), 0)
+    depth = csr_bfs(arrays.indptr, arrays.indices, np.array([entrance]))
+    depth[depth < 0] = depth.max() + 1
+    area = float(((width[rooms] + gap) * (height[rooms] + gap)).sum())
+    radius = 1.5 * np.sqrt(max(area, 1.) / np.pi)
+    order = radial_order(arrays, depth, rng)
+    rank = np.empty(num_nodes)
+    rank[order] = np.arange(num_nodes)
+    ring = radius * np.sqrt((rank + 0.5) / max(num_nodes, 1))
+    layer_start = np.searchsorted(depth[order], depth)
+    layer_size = np.bincount(depth)[depth]
+    angle = 2 * np.pi * (rank - layer_start + rng.random(num_nodes)) / layer_size
+    x, y = ring * np.cos(angle), ring * np.sin(angle)
+
+    sources = np.repeat(np.arange(num_nodes), arrays.degrees())
+    targets = arrays.indices
+    sizes_w = width[rooms].astype(float)
+    sizes_h = height[rooms].astype(float)
+    # Relax with half a tile of extra margin so rounding to the grid
+    # cannot create overlaps
+    margin = gap + 1
+    rest = (size[sources] + size[targets]) / 2 + margin
+
+    def separate() -> int:
+        i, j, pen_x, pen_y = overlapping_pairs(x[rooms], y[rooms], sizes_w,
+                                               sizes_h, gap=margin)
+        if not len(i):
+            return 0
+        along_x = pen_x < pen_y
+        dx = x[rooms][j] - x[rooms][i]
+        dy = y[rooms][j] - y[rooms][i]
+        sign_x = np.where(dx >= 0, 1., -1.)
+        sign_y = np.where(dy >= 0, 1., -1.)
+        # Each side of a pair moves slightly more than half the penetration
+        # along the axis where it is smallest
+        push_x = np.where(along_x, sign_x * pen_x * 0.55, 0.)
+        push_y = np.where(along_x, 0., sign_y * pen_y * 0.55)
+        num_rooms = len(rooms)
+        x[rooms] += np.bincount(j, push_x, num_rooms) - np.bincount(i, push_x, num_rooms)
+        y[rooms] += np.bincount(j, push_y, num_rooms) - np.bincount(i, push_y, num_rooms)
+        return len(i)
+
+    for step in range(num_iter):
+        dx = x[targets] - x[sources]
+        dy = y[targets] - y[sources]
+        dist = np.maximum(np.hypot(dx, dy), 1e-9)
+        strength = spring * (1. - step / num_iter) * (dist - rest) / dist
+        fx = np.bincount(sources, weights=strength * dx, minlength=num_nodes)
+        fy = np.bincount(sources, weights=strength * dy, minlength=num_nodes)
+        x += fx
+        y += fy
+        if step % separate_every == 0:
+            separate()
+    for _ in range(max_separation_iter):
+        num_overlaps = separate()
+        if not num_overlaps:
+            break
+        scale = 1.001 + inflate * min(num_overlaps / len(rooms), 1.)
+        centre_x, centre_y = x[rooms].mean(), y[rooms].mean()
+        x[:] = centre_x + (x - centre_x) * scale
+        y[:] = centre_y + (y - centre_y) * scale
+
+    # Corridors sit at the mean position of their neighbours
+    corridors = np.flatnonzero(width == 0)
+    if len(corridors):
+        degree = np.maximum(arrays.degrees(), 1)
+        mean_x = np.bincount(sources, weights=x[targets], minlength=num_nodes) / degree
+        mean_y = np.bincount(sources, weights=y[targets], minlength=num_nodes) / degree
+        x[corridors] = mean_x[corridors]
+        y[corridors] = mean_y[corridors]
+    # Snap footprints to the tile grid
+    x = np.round(x - width / 2) + width / 2
+    y = np.round(y - height / 2) + height / 2
+    return Placement(arrays, x, y, width, height)
@@ -0,0 +1,220 @@
+# Corridor routing: every Corridor node of a placed dungeon becomes a path of
+# tiles between the footprints of its neighbours. All routes share one cost
+# grid, A* runs on it with search buffers reused between routes and every
+# routed tile gets a congestion cost so later corridors avoid it
+import heapq
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from dungeon_net.generation.node import Corridor
+from dungeon_net.generation.graph_arrays import NODE_TYPES
+from dungeon_net.spatial.placement import Placement
+
+BLOCKED = np.inf
+
+
+class CorridorRouter:
+    # A* on a 4-connected grid. "cost[y, x]" is the cost of stepping onto a
+    # tile (>= 1 so the Manhattan heuristic is admissible, BLOCKED for
+    # walls). The border of the grid must be BLOCKED. The g / parent /
+    # visited buffers are allocated once and stamped with a search id, so a
+    # route costs only the tiles it touches
+    def __init__(self, cost: np.ndarray, heuristic_weight=1.) -> None:
+        self.cost = cost
+        self.height, self.width = cost.shape
+        self.heuristic_weight = heuristic_weight
+        size = cost.size
+        self.g = np.zeros(size)
+        self.parent = np.zeros(size, dtype=np.int64)
+        self.opened = np.zeros(size, dtype=np.int32)
+        self.closed = np.zeros(size, dtype=np.int32)
+        self.goal = np.zeros(size, dtype=np.int32)
+        self.num_searches = 0
+        self.num_expanded = 0
+
+    def flat(self, x, y):
+        return np.asarray(y) * self.width + np.asarray(x)
+
+    def route(self, starts: Sequence[int], goals: Sequence[int]) -> Optional[List[int]]:
+        # Cheapest path (flat tile indices, start to goal) from any of
+        # "starts" to any of "goals", None if they are not connected. Start
+        # tiles are entered for free even when BLOCKED
+        self.num_searches += 1
+        search = self.num_searches
+        width = self.width
+        weight = self.heuristic_weight
+        # memoryviews give fast scalar access to the shared numpy buffers
+        cost = memoryview(self.cost.reshape(-1))
+        g = memoryview(self.g)
+        parent = memoryview(self.parent)
+        opened = memoryview(self.opened)
+        closed = memoryview(self.closed)
+        goal = memoryview(self.goal)
+
+        goal_y, goal_x = np.divmod(np.asarray(goals, dtype=np.int64), width)
+        if not len(goal_x):
+            return None
+        self.goal[np.asarray(goals, dtype=np.int64)] = search
+        # Heuristic: Manhattan distance to the bounding box of the goals
+        x0, x1 = int(goal_x.min()), int(goal_x.max())
+        y0, y1 = int(goal_y.min()), int(goal_y.max())
+
+        heap = []
+        for tile in starts:
+            tile = int(tile)
+            g[tile] = 0.
+            parent[tile] = -1
+            opened[tile] = search
+            y, x = divmod(tile, width)
+            h = max(x0 - x, 0, x - x1) + max(y0 - y, 0, y - y1)
+            heap.append((weight * h, tile))
+        heapq.heapify(heap)
+        pop, push = heapq.heappop, heapq.heappush
+        while heap:
+            _, tile = pop(heap)
+            if closed[tile] == search:
+                continue
+            closed[tile] = search
+            self.num_expanded += 1
+            if goal[tile] == search:
+                path = [tile]
+                while parent[tile] >= 0:
+                    tile = parent[tile]
+                    path.append(tile)
+                return path[::-1]
+            g_tile = g[tile]
+            for step in (1, -1, width, -width):
+                next_tile = tile + step
+                step_cost = cost[next_tile]
+                if step_cost == BLOCKED or closed[next_tile] == search:
+                    continue
+                g_next = g_tile + step_cost
+                if opened[next_tile] != search or g_next < g[next_tile]:
+                    opened[next_tile] = search
+                    g[next_tile] = g_next
+                    parent[next_tile] = tile
+                    y, x = divmod(next_tile, width)
+                    h = max(x0 - x, 0, x - x1) + max(y0 - y, 0, y - y1)
+                    push(heap, (g_next + weight * h, next_tile))
+        return None
+
+
+class CorridorRoutes:
+    # Result of "route_corridors": "paths[i]" is the (n, 2) array of (x, y)
+    # tiles of Corridor node "i" (DungeonArrays order, empty if it could not
+    # be routed), "usage[y - origin_y, x - origin_x]" counts the corridors
+    # using a tile and "cost" is the final shared cost grid
+    def __init__(self, placement: Placement, origin: Tuple[int, int],
+                 cost: np.ndarray, usage: np.ndarray,
+                 paths: Dict[int, np.ndarray], failed: List[int]) -> None:
+        self.placement = placement
+        self.origin = origin
+        self.cost = cost
+        self.usage = usage
+        self.paths = paths
+        self.failed = failed
+
+    def tile_mask(self) -> np.ndarray:
+        # Boolean grid of corridor tiles, same frame as "usage"
+        return self.usage > 0
+
+    def num_shared_tiles(self) -> int:
+        # Tiles used by more than one corridor
+        return int(np.count_nonzero(self.usage > 1))
+
+
+def footprint_ports(placement: Placement, node: np.ndarray, towards_x: np.ndarray,
+                    towards_y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Tile just outside the footprint of each "node" on the side facing
+    # (towards_x, towards_y), aligned with the target where possible.
+    # Nodes without a footprint are their own port
+    x0, y0, x1, y1 = (r[node] for r in placement.rects())
+    centre_x, centre_y = placement.x[node], placement.y[node]
+    dx, dy = towards_x - centre_x, towards_y - centre_y
+    half_w = np.maximum(placement.width[node], 1) / 2
+    half_h = np.maximum(placement.height[node], 1) / 2
+    horizontal = np.abs(dx) / half_w >= np.abs(dy) / half_h
+    along_x = np.clip(np.round(towards_x - 0.5), x0, np.maximum(x1 - 1, x0)).astype(np.int64)
+    along_y = np.clip(np.round(towards_y - 0.5), y0, np.maximum(y1 - 1, y0)).astype(np.int64)
+    port_x = np.where(horizontal, np.where(dx >= 0, x1, x0 - 1), along_x)
+    port_y = np.where(horizontal, along_y, np.where(dy >= 0, y1, y0 - 1))
+    point = placement.width[node] == 0
+    port_x[point] = np.floor(centre_x[point])
+    port_y[point] = np.floor(centre_y[point])
+    return port_x.astype(np.int64), port_y.astype(np.int64)
+
+
+def route_corridors(placement: Placement, seed=None, roughness=0.5,
+                    congestion=4., padding=8, heuristic_weight=2.) -> CorridorRoutes:
+    # Route every Corridor node of a placement, in node order. A Corridor
+    # is a tree of tiles joining ports next to its Room/Junction neighbours
+    # and the paths of already routed neighbouring Corridors. "roughness"
+    # adds seeded random cost so paths meander, "congestion" is added to
+    # every tile a route uses so later routes avoid sharing it, and
+    # "heuristic_weight" > 1 trades optimality for fewer expanded tiles.
+    # Routes are deterministic for a given seed
+    arrays = placement.arrays
+    rng = np.random.default_rng(seed)
+    bx0, by0, bx1, by1 = placement.bounds()
+    origin_x, origin_y = bx0 - padding, by0 - padding
+    grid_w = bx1 - bx0 + 2 * padding
+    grid_h = by1 - by0 + 2 * padding
+
+    cost = 1. + roughness * rng.random((grid_h, grid_w))
+    x0, y0, x1, y1 = placement.rects()
+    for i in np.flatnonzero(placement.has_footprint):
+        cost[y0[i] - origin_y:y1[i] - origin_y,
+             x0[i] - origin_x:x1[i] - origin_x] = BLOCKED
+    cost[[0, -1], :] = BLOCKED
+    cost[:, [0, -1]] = BLOCKED
+    usage = np.zeros((grid_h, grid_w), dtype=np.int32)
+    router = CorridorRouter(cost, heuristic_weight)
+
+    # Ports of every (corridor, neighbour) arc, neighbours facing the
+    # corridor's position
+    sources = np.repeat(np.arange(arrays.num_nodes), arrays.degrees())
+    targets = arrays.indices
+    is_corridor = arrays.node_type == NODE_TYPES.index(Corridor)
+    arcs = np.flatnonzero(is_corridor[sources])
+    port_x, port_y = footprint_ports(placement, targets[arcs],
+                                     placement.x[sources[arcs]],
+                                     placement.y[sources[arcs]])
+    port = router.flat(port_x - origin_x, port_y - origin_y)
+    # Ports squeezed against another footprint become doors through it
+    # instead of unreachable goals
+    flat_cost = cost.reshape(-1)
+    flat_cost[port[flat_cost[port] == BLOCKED]] = 1.
+    arc_start = np.searchsorted(sources[arcs], np.arange(arrays.num_nodes + 1))
+
+    paths: Dict[int, np.ndarray] = {}
+    failed: List[int] = []
+    flat_usage = usage.reshape(-1)
+    for corridor in np.flatnonzero(is_corridor):
+        ends = []
+        for k in range(arc_start[corridor], arc_start[corridor + 1]):
+            neighbour = targets[arcs[k]]
+            if not is_corridor[neighbour]:
+                ends.append([port[k]])
+            elif neighbour in paths and len(paths[neighbour]):
+                ends.append(list(router.flat(paths[neighbour][:, 0] - origin_x,
+                                             paths[neighbour][:, 1] - origin_y)))
+        if not ends:
+            ends = [[int(router.flat(np.floor(placement.x[corridor]) - origin_x,
+                                     np.floor(placement.y[corridor]) - origin_y))]]
+        tree = list(ends[0])
+        ok = True
+        for goals in ends[1:]:
+            path = router.route(tree, goals)
+            if path is None:
+                ok = False
+                continue
+            tree.extend(path[1:])
+        # Tiles in routing order, each once
+        tiles = np.fromiter(dict.fromkeys(tree), dtype=np.int64)
+        if not ok:
+            failed.append(int(corridor))
+        flat_usage[tiles] += 1
+        flat_cost[tiles] += congestion
+        tile_y, tile_x = np.divmod(tiles, grid_w)
+        paths[int(corridor)] = np.stack([tile_x + origin_x, tile_y + origin_y], axis=1)
+    return CorridorRoutes(placement, (origin_x, origin_y), cost, usage, paths, failed)
@@ -0,0 +1,72 @@
+# Uniform-grid spatial hash for broad-phase collision detection between
+# axis-aligned rectangles, fully vectorized so one query is ~O(N)
+from typing import Tuple
+import numpy as np
+
+
+def _range_pairs(starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Every (i, j) with i < j both in range(starts[k], starts[k] + counts[k]),
+    # for all k
+    i = np.repeat(starts, counts)
+    i += np.arange(len(i)) - np.repeat(np.cumsum(counts) - counts, counts)
+    # Entry "i" pairs with every later entry of its group
+    ends = np.repeat(starts + counts, counts)
+    per_i = ends - i - 1
+    j = np.repeat(i + 1, per_i)
+    j += np.arange(len(j)) - np.repeat(np.cumsum(per_i) - per_i, per_i)
+    return np.repeat(i, per_i), j
+
+
+def cell_entries(x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray,
+                 cell_size: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (box index, cell x, cell y) of every grid cell each box [x0, x1] x
+    # [y0, y1] touches. Large boxes are entered in several cells instead of
+    # forcing a large cell size on everything
+    cx0 = np.floor(x0 / cell_size).astype(np.int64)
+    cy0 = np.floor(y0 / cell_size).astype(np.int64)
+    nx = np.floor(x1 / cell_size).astype(np.int64) - cx0 + 1
+    ny = np.floor(y1 / cell_size).astype(np.int64) - cy0 + 1
+    counts = nx * ny
+    box = np.repeat(np.arange(len(x0)), counts)
+    k = np.arange(len(box)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return box, cx0[box] + k // ny[box], cy0[box] + k % ny[box]
+
+
+def overlapping_pairs(x: np.ndarray, y: np.ndarray, width: np.ndarray,
+                      height: np.ndarray, gap=0.) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Pairs (i < j) of rectangles (centres x, y) closer than "gap", returned
+    # with their penetration depth along each axis. Rectangles are grown by
+    # gap / 2 on every side and hashed into a grid sized for the typical
+    # rectangle; a pair sharing several cells is only reported by the cell
+    # holding the lower corner of its intersection
+    empty = np.zeros(0, dtype=np.int64)
+    if len(x) < 2:
+        return empty, empty, np.zeros(0), np.zeros(0)
+    half_w = (width + gap) / 2
+    half_h = (height + gap) / 2
+    x0, x1 = x - half_w, x + half_w
+    y0, y1 = y - half_h, y + half_h
+    cell_size = max(float(np.median(np.maximum(width, height))) + gap, 1.)
+    box, cx, cy = cell_entries(x0, y0, x1, y1, cell_size)
+    cx -= cx.min()
+    cy -= cy.min()
+    key = cx * (int(cy.max()) + 1) + cy
+    order = np.argsort(key, kind="stable")
+    _, starts, counts = np.unique(key[order], return_index=True,
+                                  return_counts=True)
+    a, b = _range_pairs(starts, counts)
+    if not len(a):
+        return empty, empty, np.zeros(0), np.zeros(0)
+    a, b = order[a], order[b]
+    i, j = box[a], box[b]
+    # Deduplicate: keep the pair in the cell of its intersection's corner
+    corner_x = np.floor(np.maximum(x0[i], x0[j]) / cell_size).astype(np.int64)
+    corner_y = np.floor(np.maximum(y0[i], y0[j]) / cell_size).astype(np.int64)
+    origin_x = np.floor(x0.min() / cell_size).astype(np.int64)
+    origin_y = np.floor(y0.min() / cell_size).astype(np.int64)
+    own = (corner_x - origin_x == cx[a]) & (corner_y - origin_y == cy[a])
+    i, j = np.minimum(i[own], j[own]), np.maximum(i[own], j[own])
+    pen_x = (width[i] + width[j]) / 2 + gap - np.abs(x[j] - x[i])
+    pen_y = (height[i] + height[j]) / 2 + gap - np.abs(y[j] - y[i])
+    hit = (pen_x > 0) & (pen_y > 0)
+    return i[hit], j[hit], pen_x[hit], pen_y[hit]
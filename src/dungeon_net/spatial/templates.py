@@ -0,0 +1,288 @@
+# Room template library: precomputed room masks with their door candidate
+# tiles and metadata, written to a single pack file and read back through
+# memory maps so only the templates actually used are paged in.
+# Pack layout: MAGIC, the header length (uint64) and a JSON header giving
+# the dtype, shape and byte offset of every column, then the columns.
+# Templates are indexed by tag and by the number of doors they must hold:
+# bucket (tag, k) lists every template with that tag and capacity >= k, so
+# choosing a template is one random offset into a bucket
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+from dungeon_net.generation.node import Room, Junction
+from dungeon_net.generation.graph_arrays import DungeonArrays, NODE_TYPES
+from dungeon_net.spatial.doors import mask_boundary
+
+MAGIC = b"DNTPL1\n"
+ALIGNMENT = 64
+TEMPLATE_TAGS = ["rectangular", "square", "circular", "l_shape", "cross",
+                 "junction"]
+# Tag used for templates of each node type in "assign_templates", None for
+# any template
+TYPE_TAGS = {Room: None, Junction: "junction"}
+
+
+# Room shapes as boolean masks ("mask[y, x]")
+def rectangle_mask(width: int, height: int) -> np.ndarray:
+    return np.ones((height, width), dtype=bool)
+
+
+def circle_mask(radius: int) -> np.ndarray:
+    y, x = np.mgrid[:2 * radius + 1, :2 * radius + 1] - radius
+    return x ** 2 + y ** 2 <= radius ** 2 + radius
+
+
+def l_shape_mask(width: int, height: int, cut_width: int, cut_height: int) -> np.ndarray:
+    mask = rectangle_mask(width, height)
+    mask[height - cut_height:, width - cut_width:] = False
+    return mask
+
+
+def cross_mask(width: int, height: int, arm: int) -> np.ndarray:
+    mask = np.zeros((height, width), dtype=bool)
+    mask[(height - arm) // 2:(height - arm) // 2 + arm, :] = True
+    mask[:, (width - arm) // 2:(width - arm) // 2 + arm] = True
+    return mask
+
+
+def door_candidates(mask: np.ndarray) -> Tuple[np.ndarray, ...]:
+    # Boundary tiles facing exactly one direction (no corners) as
+    # (x, y, normal_x, normal_y)
+    x, y, normal_x, normal_y = mask_boundary(mask)
+    straight = (normal_x == 0) != (normal_y == 0)
+    return x[straight], y[straight], normal_x[straight], normal_y[straight]
+
+
+def door_capacity(mask: np.ndarray, door_spacing=2) -> int:
+    # Number of doors a mask can hold with at least "door_spacing" tiles
+    # between doors on the same wall
+    x, y, normal_x, normal_y = door_candidates(mask)
+    if not len(x):
+        return 0
+    # Count runs of candidates along each wall: tiles on the same wall
+    # share their normal and their coordinate across the wall
+    across = np.where(normal_x != 0, x, y)
+    along = np.where(normal_x != 0, y, x)
+    wall = (normal_x + 2) * 3 + normal_y + 2
+    order = np.lexsort((along, across, wall))
+    new_run = np.ones(len(x), dtype=bool)
+    new_run[1:] = (np.diff(wall[order]) != 0) | (np.diff(across[order]) != 0) | \
+        (np.diff(along[order]) != 1)
+    run_length = np.diff(np.append(np.flatnonzero(new_run), len(x)))
+    return int(((run_length + door_spacing) // (door_spacing + 1)).sum())
+
+
+def default_templates(min_size=3, max_size=16) -> List[Tuple[np.ndarray, List[str]]]:
+    # (mask, tags) of rectangles, squares, circles, L-shapes and crosses up
+    # to "max_size" tiles across. Small squares and crosses are also
+    # tagged "junction"
+    templates = []
+    for width in range(min_size, max_size + 1):
+        for height in range(min_size, max_size + 1):
+            if width == height:
+                tags = ["square"] + (["junction"] if width <= 5 else [])
+            else:
+                tags = ["rectangular"]
+            templates.append((rectangle_mask(width, height), tags))
+            if width >= 5 and height >= 5:
+                templates.append((l_shape_mask(width, height, width // 2,
+                                               height // 2), ["l_shape"]))
+            if width == height and width >= 5 and width % 2:
+                templates.append((cross_mask(width, height, max(width // 3, 1)),
+                                  ["cross", "junction"]))
+    for radius in range(2, max_size // 2 + 1):
+        templates.append((circle_mask(radius), ["circular"]))
+    return templates
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_template_pack(path: str, templates: Iterable[Tuple[np.ndarray, Sequence[str]]],
+                        max_capacity=16) -> int:
+    # Write (mask, tags) templates as a pack, returns the number written
+    masks, bits, door_columns = [], [], [[], [], [], []]
+    tags, capacity = [], []
+    for mask, template_tags in templates:
+        mask = np.asarray(mask, dtype=bool)
+        masks.append(mask)
+        bits.append(np.packbits(mask.reshape(-1)))
+        for column, values in zip(door_columns, door_candidates(mask)):
+            column.append(values)
+        tags.append(sum(1 << TEMPLATE_TAGS.index(t) for t in template_tags))
+        capacity.append(min(door_capacity(mask), max_capacity))
+    num = len(masks)
+    tags = np.array(tags, dtype=np.uint32)
+    capacity = np.array(capacity, dtype=np.int16)
+    columns = {
+        "height": np.array([m.shape[0] for m in masks], dtype=np.int16),
+        "width": np.array([m.shape[1] for m in masks], dtype=np.int16),
+        "area": np.array([m.sum() for m in masks], dtype=np.int32),
+        "tags": tags,
+        "capacity": capacity,
+        "mask_offsets": np.concatenate([[0], np.cumsum([len(b) for b in bits])]).astype(np.int64),
+        "mask_bits": np.concatenate(bits) if bits else np.zeros(0, dtype=np.uint8),
+        "door_offsets": np.concatenate([[0], np.cumsum([len(x) for x in door_columns[0]])]).astype(np.int64),
+    }
+    for name, values, dtype in zip(["door_x", "door_y", "door_normal_x", "door_normal_y"],
+                                   door_columns, [np.int16, np.int16, np.int8, np.int8]):
+        columns[name] = np.concatenate(values).astype(dtype) if values \
+            else np.zeros(0, dtype=dtype)
+    # Buckets: one row per tag plus a last row for "any tag", one column
+    # per number of doors 0..max_capacity
+    has_tag = np.vstack([(tags >> t) & 1 for t in range(len(TEMPLATE_TAGS))] +
+                        [np.ones(num, dtype=np.uint32)]).astype(bool)
+    entries, counts = [], []
+    for row in has_tag:
+        for k in range(max_capacity + 1):
+            members = np.flatnonzero(row & (capacity >= k))
+            entries.append(members)
+            counts.append(len(members))
+    columns["bucket_offsets"] = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    columns["bucket_templates"] = np.concatenate(entries).astype(np.int32)
+
+    header = {"tags": TEMPLATE_TAGS, "max_capacity": max_capacity,
+              "num_templates": num, "columns": {}}
+    # Offsets are relative to the end of the header
+    offset = 0
+    for name, values in columns.items():
+        offset = _aligned(offset)
+        header["columns"][name] = [values.dtype.str, list(values.shape), offset]
+        offset += values.nbytes
+    header_bytes = json.dumps(header).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(header_bytes))
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        for name, values in columns.items():
+            f.seek(data_start + header["columns"][name][2])
+            f.write(np.ascontiguousarray(values).tobytes())
+    return num
+
+
+def build_template_pack(path: str, min_size=3, max_size=16, max_capacity=16) -> int:
+    return write_template_pack(path, default_templates(min_size, max_size),
+                               max_capacity)
+
+
+class TemplateLibrary:
+    # Read-only view of a template pack. Every column is a memory map, so
+    # opening a pack reads only its header and choosing a template touches
+    # two entries of the index
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a room template pack")
+            header_length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(header_length))
+        data_start = _aligned(len(MAGIC) + 8 + header_length)
+        self.tags: List[str] = header["tags"]
+        self.max_capacity: int = header["max_capacity"]
+        self.num_templates: int = header["num_templates"]
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, (dtype, shape, offset) in header["columns"].items():
+            if int(np.prod(shape)) == 0:
+                self.columns[name] = np.zeros(shape, dtype=dtype)
+            else:
+                self.columns[name] = np.memmap(path, dtype=dtype, mode="r",
+                                               offset=data_start + offset,
+                                               shape=tuple(shape))
+
+    def __len__(self) -> int:
+        return self.num_templates
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        # Columns as attributes, e.g. "library.width"
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def _bucket(self, num_doors, tag: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        # (start, count) of the bucket of every "num_doors", count is 0 for
+        # more doors than the pack indexes (capacities are capped at
+        # max_capacity, so no template is known to hold them)
+        row = len(self.tags) if tag is None else self.tags.index(tag)
+        num_doors = np.asarray(num_doors)
+        k = np.clip(num_doors, 0, self.max_capacity)
+        bucket = row * (self.max_capacity + 1) + k
+        offsets = self.columns["bucket_offsets"]
+        start = np.asarray(offsets[bucket], dtype=np.int64)
+        count = np.asarray(offsets[bucket + 1], dtype=np.int64) - start
+        return start, np.where(num_doors > self.max_capacity, 0, count)
+
+    def candidates(self, num_doors: int, tag: Optional[str] = None) -> np.ndarray:
+        # Ids of every template with "tag" (any if None) holding at least
+        # "num_doors" doors, none above the pack's max_capacity
+        start, count = self._bucket(num_doors, tag)
+        return self.columns["bucket_templates"][int(start):int(start + count)]
+
+    def choose(self, num_doors, tag: Optional[str] = None,
+               rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        # Uniformly random template id for every entry of "num_doors" (int
+        # or array), -1 where no template fits
+        rng = np.random.default_rng() if rng is None else rng
+        start, count = self._bucket(np.asarray(num_doors), tag)
+        pick = start + (rng.random(start.shape) * count).astype(np.int64)
+        ids = np.full(start.shape, -1, dtype=np.int64)
+        fits = count > 0
+        ids[fits] = self.columns["bucket_templates"][pick[fits]]
+        return int(ids) if ids.ndim == 0 else ids
+
+    def mask(self, template: int) -> np.ndarray:
+        height, width = int(self.height[template]), int(self.width[template])
+        offsets = self.columns["mask_offsets"]
+        bits = self.columns["mask_bits"][offsets[template]:offsets[template + 1]]
+        return np.unpackbits(bits, count=height * width).astype(bool).reshape(height, width)
+
+    def doors(self, template: int) -> Tuple[np.ndarray, ...]:
+        # Door candidate tiles of a template as (x, y, normal_x, normal_y)
+        offsets = self.columns["door_offsets"]
+        rows = slice(offsets[template], offsets[template + 1])
+        return tuple(np.asarray(self.columns[c][rows]) for c in
+                     ["door_x", "door_y", "door_normal_x", "door_normal_y"])
+
+    def metadata(self, template: int) -> Dict:
+        tags = int(self.columns["tags"][template])
+        return {"width": int(self.width[template]),
+                "height": int(self.height[template]),
+                "area": int(self.area[template]),
+                "capacity": int(self.capacity[template]),
+                "tags": [t for i, t in enumerate(self.tags) if tags >> i & 1]}
+
+
+def assign_templates(arrays: DungeonArrays, library: TemplateLibrary, seed=None,
+                     type_tags=TYPE_TAGS, strict=True) -> np.ndarray:
+    # Template id for every Room/Junction of a dungeon (-1 for Corridors),
+    # chosen with "type_tags" and enough door capacity for the node's
+    # num_edges. A Room/Junction no template fits raises a ValueError, or
+    # gets -1 (and so no footprint) if "strict" is False
+    rng = np.random.default_rng(seed)
+    templates = np.full(arrays.num_nodes, -1, dtype=np.int64)
+    for node_type, tag in type_tags.items():
+        nodes = np.flatnonzero(arrays.node_type == NODE_TYPES.index(node_type))
+        if not len(nodes):
+            continue
+        templates[nodes] = library.choose(arrays.num_edges[nodes], tag, rng)
+        missing = nodes[templates[nodes] < 0]
+        if strict and len(missing):
+            raise ValueError(f"No {tag or 'any'} template holds the doors of "
+                             f"{len(missing)} {node_type.__name__} nodes, e.g. "
+                             f"{arrays.nodes[missing[0]].name} with "
+                             f"{arrays.num_edges[missing[0]]} doors")
+    return templates
+
+
+def template_footprints(library: TemplateLibrary, templates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # (width, height) per node for "place_rooms", zero where there is no
+    # template
+    has = templates >= 0
+    width = np.zeros(len(templates), dtype=np.int64)
+    height = np.zeros(len(templates), dtype=np.int64)
+    width[has] = library.width[templates[has]]
+    height[has] = library.height[templates[has]]
+    return width, height
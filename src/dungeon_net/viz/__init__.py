@@ -1,2 +1,3 @@
 from .color_utils import *
-from .pgv_nx import *
\ No newline at end of file
+from .pgv_nx import *
+from .raster import *
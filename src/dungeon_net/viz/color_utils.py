@@ -1,7 +1,11 @@
-import matplotlib.colors as colors
-import matplotlib as mpl
+# matplotlib is only imported when a color is first requested
 
-def tabcmapper(i: int, cmap=mpl.colormaps["tab20"], mod=19):
+
+def tabcmapper(i: int, cmap=None, mod=19):
     # Returns the i mod-(n-1)th color from cmap, only use with qualitative
-    # color maps
+    # color maps, "cmap" defaults to matplotlib's "tab20"
+    import matplotlib as mpl
+    import matplotlib.colors as colors
+    if cmap is None:
+        cmap = mpl.colormaps["tab20"]
     return colors.rgb2hex(cmap(i % mod), keep_alpha=True)
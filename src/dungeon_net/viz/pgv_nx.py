@@ -1,16 +1,16 @@
 # Plotting NetworkX as PyGraphViz
 import networkx as nx
-import matplotlib as mpl
 
 from dungeon_net.generation.node_utils import choose_node_shape, choose_node_style
 from dungeon_net.viz.color_utils import tabcmapper
 
 
 def visualize_dungeon(dungeon: nx.MultiDiGraph,
-                      filename: str, cmap=mpl.colormaps["tab20"],
+                      filename: str, cmap=None,
                       cmap_mod=19):
     # Write the dungeon into a PNG, naming the nodes with their names
-    # color by chain number
+    # color by chain number, "cmap" defaults to matplotlib's "tab20".
+    # pygraphviz is loaded by networkx on the first call
     attrs = {n: {
         "color": tabcmapper(i, cmap=cmap, mod=cmap_mod),
         "shape": choose_node_shape(n),
@@ -0,0 +1,273 @@
+# Headless dungeon rendering: a layered layout computed from the BFS depth
+# to the Entrance, rasterized straight into a NumPy image and written as a
+# PNG with zlib, so no graphviz subprocess, matplotlib or Pillow is needed
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.node import Corridor
+from dungeon_net.generation.edges import EdgeList
+from dungeon_net.generation.node_utils import choose_node_shape, choose_node_style
+from dungeon_net.generation.graph_arrays import DungeonArrays, NODE_TYPES
+from dungeon_net.io.archive import ROLES
+from dungeon_net.numerics.csr import csr_bfs, csr_from_arcs
+
+# matplotlib's "tab20". Colours are indexed like "tabcmapper", which wraps
+# at TAB_MOD so the last colour is never used
+TAB_MOD = 19
+TAB20 = ["#1f77b4", "#aec7e8", "#ff7f0e", "#ffbb78", "#2ca02c", "#98df8a",
+         "#d62728", "#ff9896", "#9467bd", "#c5b0d5", "#8c564b", "#c49c94",
+         "#e377c2", "#f7b6d2", "#7f7f7f", "#c7c7c7", "#bcbd22", "#dbdb8d",
+         "#17becf", "#9edae5"]
+# Shape codes, names as returned by "choose_node_shape"
+SHAPES = ["none", "square", "rect", "invtriangle", "diamond", "house", "circle"]
+HIGHLIGHT = (128, 0, 0)  # Entrance and Goal, "#800000" as in visualize_dungeon
+EDGE_COLOR = (120, 120, 120)
+
+
+def hex_to_rgb(color: str) -> Tuple[int, int, int]:
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+
+PALETTE = np.array([hex_to_rgb(c) for c in TAB20], dtype=np.uint8)
+
+
+def layered_layout(indptr: np.ndarray, indices: np.ndarray,
+                   root=0) -> Tuple[np.ndarray, np.ndarray]:
+    # (x, y) positions in grid cells: y is the BFS depth from "root",
+    # nodes in a layer are ordered by the mean x of their neighbours in the
+    # layer above and centred. Unreachable nodes go in a final layer
+    num_nodes = len(indptr) - 1
+    if num_nodes == 0:
+        return np.zeros(0), np.zeros(0)
+    depth = csr_bfs(indptr, indices, np.array([root]))
+    depth[depth < 0] = depth.max() + 1
+    x = np.zeros(num_nodes)
+    sources = np.repeat(np.arange(num_nodes), np.diff(indptr))
+    # Arcs from one layer to the next, grouped by the layer they enter
+    down = depth[indices] == depth[sources] + 1
+    parent, child = sources[down], indices[down]
+    order = np.argsort(depth[child], kind="stable")
+    parent, child = parent[order], child[order]
+    num_layers = int(depth.max()) + 1
+    arc_bounds = np.searchsorted(depth[child], np.arange(num_layers + 1))
+    node_order = np.argsort(depth, kind="stable")
+    node_bounds = np.searchsorted(depth[node_order], np.arange(num_layers + 1))
+    total = np.zeros(num_nodes)
+    count = np.zeros(num_nodes)
+    for layer in range(num_layers):
+        members = node_order[node_bounds[layer]:node_bounds[layer + 1]]
+        a0, a1 = arc_bounds[layer], arc_bounds[layer + 1]
+        if a1 > a0:
+            np.add.at(total, child[a0:a1], x[parent[a0:a1]])
+            np.add.at(count, child[a0:a1], 1)
+            barycentre = total[members] / np.maximum(count[members], 1)
+            members = members[np.argsort(barycentre, kind="stable")]
+        x[members] = np.arange(len(members)) - (len(members) - 1) / 2
+    return x, depth.astype(float)
+
+
+def shape_stamps(radius: int) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    # {shape: (fill offsets, outline offsets)}, offsets are (dy, dx) pixel
+    # arrays relative to the node centre
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    r = float(radius)
+    masks = {
+        "none": dx**2 + dy**2 <= (r / 3)**2,
+        "square": np.maximum(abs(dx), abs(dy)) <= 0.8 * r,
+        "rect": (abs(dx) <= r) & (abs(dy) <= 0.6 * r),
+        "invtriangle": abs(dx) <= (r - dy) / 2,
+        "diamond": abs(dx) + abs(dy) <= r,
+        "house": np.where(dy >= 0, abs(dx) <= 0.8 * r,
+                          abs(dx) <= 0.8 * r + dy),
+        "circle": dx**2 + dy**2 <= r**2,
+    }
+    stamps = {}
+    for shape, mask in masks.items():
+        padded = np.pad(mask, 1)
+        interior = (padded[:-2, 1:-1] & padded[2:, 1:-1]
+                    & padded[1:-1, :-2] & padded[1:-1, 2:])
+        outline = mask & ~interior
+        stamps[shape] = (np.stack([dy[mask], dx[mask]]),
+                         np.stack([dy[outline], dx[outline]]))
+    return stamps
+
+
+def rasterize(x: np.ndarray, y: np.ndarray, u: np.ndarray, v: np.ndarray,
+              shape_code: np.ndarray, dashed: np.ndarray,
+              color_index: np.ndarray, highlight: np.ndarray,
+              scale=12, radius=4, background=(255, 255, 255)) -> np.ndarray:
+    # Draw edges (u[i], v[i]) as lines and nodes as shapes into an
+    # (H, W, 3) uint8 image. Solid nodes are filled with their colour,
+    # dashed ones (free edges) only get a dashed outline
+    margin = radius + 2
+    px = np.round((x - x.min()) * scale).astype(np.int64) + margin \
+        if len(x) else np.zeros(0, dtype=np.int64)
+    py = np.round((y - y.min()) * scale).astype(np.int64) + margin \
+        if len(y) else np.zeros(0, dtype=np.int64)
+    width = int(px.max()) + margin + 1 if len(px) else 2 * margin
+    height = int(py.max()) + margin + 1 if len(py) else 2 * margin
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = background
+
+    # Edges, sampled at one point per pixel of length
+    if len(u):
+        lengths = np.hypot(px[v] - px[u], py[v] - py[u])
+        samples = np.ceil(lengths).astype(np.int64) + 1
+        edge = np.repeat(np.arange(len(u)), samples)
+        starts = np.cumsum(samples) - samples
+        t = (np.arange(samples.sum()) - starts[edge]) / np.maximum(samples[edge] - 1, 1)
+        lx = np.round(px[u][edge] + t * (px[v] - px[u])[edge]).astype(np.int64)
+        ly = np.round(py[u][edge] + t * (py[v] - py[u])[edge]).astype(np.int64)
+        image[ly, lx] = EDGE_COLOR
+
+    # Nodes, one vectorized stamp per shape
+    colors = PALETTE[color_index % TAB_MOD]
+    stamps = shape_stamps(radius)
+    for code, shape in enumerate(SHAPES):
+        fill, outline = stamps[shape]
+        nodes = np.flatnonzero(shape_code == code)
+        if not len(nodes):
+            continue
+        for is_dashed, offsets in ((False, fill), (True, outline)):
+            selected = nodes[dashed[nodes] == is_dashed]
+            if not len(selected):
+                continue
+            dy, dx = offsets
+            if is_dashed:
+                # Dashes: keep every other pair of outline pixels
+                keep = ((dy + dx + 2 * radius) // 2) % 2 == 0
+                dy, dx = dy[keep], dx[keep]
+            ys = (py[selected][:, None] + dy[None, :]).ravel()
+            xs = (px[selected][:, None] + dx[None, :]).ravel()
+            image[ys, xs] = np.repeat(colors[selected], len(dy), axis=0)
+        marked = nodes[highlight[nodes]]
+        if len(marked):
+            dy, dx = outline
+            ys = (py[marked][:, None] + dy[None, :]).ravel()
+            xs = (px[marked][:, None] + dx[None, :]).ravel()
+            image[ys, xs] = HIGHLIGHT
+    return image
+
+
+def write_png(filename: str, image: np.ndarray):
+    # Minimal 8-bit RGB PNG encoder
+    height, width, _ = image.shape
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (struct.pack(">I", len(data)) + tag + data
+                + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff))
+
+    with open(filename, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2,
+                                           0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def render_dungeon(dungeon: nx.MultiDiGraph, filename=None, scale=12,
+                   radius=4) -> np.ndarray:
+    # Render a dungeon graph without modifying it, coloured by chain_num and
+    # styled with "choose_node_shape"/"choose_node_style". Writes a PNG if
+    # "filename" is given, returns the image
+    arrays = DungeonArrays.from_dungeon(dungeon)
+    nodes = arrays.nodes
+    shape_code = np.fromiter((SHAPES.index(choose_node_shape(n)) for n in nodes),
+                             dtype=np.int8, count=len(nodes))
+    dashed = np.fromiter((choose_node_style(n) == "dashed" for n in nodes),
+                         dtype=bool, count=len(nodes))
+    highlight = np.fromiter((n.name in ["Entrance", "Goal"] for n in nodes),
+                            dtype=bool, count=len(nodes))
+    root = max(arrays.index_of_name("Entrance"), 0)
+    x, y = layered_layout(arrays.indptr, arrays.indices, root=root)
+    # One line per edge: the doubled arcs are collapsed, one-way arcs (in
+    # either direction) and self-loops kept. EdgeList nodes are in graph
+    # order, as are the arrays'
+    edges = EdgeList.from_multidigraph(dungeon)
+    image = rasterize(x, y, edges.u.astype(np.int64), edges.v.astype(np.int64),
+                      shape_code,
+                      dashed, np.maximum(arrays.chain_num, 0), highlight,
+                      scale=scale, radius=radius)
+    if filename is not None:
+        write_png(filename, image)
+    return image
+
+
+def column_shape_codes(node_type: np.ndarray,
+                       num_edges: np.ndarray) -> np.ndarray:
+    # Vectorized "choose_node_shape" for archive columns
+    codes = np.where((num_edges >= 1) & (num_edges <= 5), num_edges,
+                     SHAPES.index("circle"))
+    codes[node_type == NODE_TYPES.index(Corridor)] = SHAPES.index("none")
+    return codes.astype(np.int8)
+
+
+def render_columns(columns: Dict[str, np.ndarray], filename=None, scale=12,
+                   radius=4) -> np.ndarray:
+    # Render one dungeon from its archive columns (see "dungeon_columns")
+    num_nodes = len(columns["node_type"])
+    u, v = columns["u"].astype(np.int64), columns["v"].astype(np.int64)
+    indptr, indices = csr_from_arcs(np.concatenate([u, v]),
+                                    np.concatenate([v, u]), num_nodes)
+    role = columns["role"]
+    roots = np.flatnonzero(role == ROLES["Entrance"])
+    x, y = layered_layout(indptr, indices, root=roots[0] if len(roots) else 0)
+    image = rasterize(x, y, u, v,
+                      column_shape_codes(columns["node_type"], columns["num_edges"]),
+                      columns["filled_edges"] < columns["num_edges"],
+                      np.maximum(columns["chain_num"], 0), role > 0,
+                      scale=scale, radius=radius)
+    if filename is not None:
+        write_png(filename, image)
+    return image
+
+
+def _render_one(job):
+    dungeon, filename, scale, radius = job
+    render_dungeon(dungeon, filename, scale=scale, radius=radius)
+    return filename
+
+
+def render_batch(dungeons: List[nx.MultiDiGraph], filenames: List[str],
+                 workers=None, scale=12, radius=4, chunksize=16) -> List[str]:
+    # Render many dungeons across a process pool
+    jobs = [(d, f, scale, radius) for d, f in zip(dungeons, filenames)]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(_render_one, jobs, chunksize=chunksize))
+
+
+def _render_shard(job):
+    shard_file, out_dir, scale, radius = job
+    rendered = []
+    with np.load(shard_file) as data:
+        shard = {k: data[k] for k in data.files}
+    node_offsets, edge_offsets = shard["node_offsets"], shard["edge_offsets"]
+    for i, dungeon_id in enumerate(shard["dungeon_id"]):
+        n0, n1 = node_offsets[i], node_offsets[i + 1]
+        e0, e1 = edge_offsets[i], edge_offsets[i + 1]
+        columns = {k: shard[k][n0:n1] for k in
+                   ["node_type", "num_edges", "filled_edges", "chain_num", "role"]}
+        columns.update({k: shard[k][e0:e1] for k in ["u", "v"]})
+        filename = os.path.join(out_dir, f"dungeon_{dungeon_id}.png")
+        render_columns(columns, filename, scale=scale, radius=radius)
+        rendered.append(filename)
+    return rendered
+
+
+def render_archive(path: str, out_dir: str, workers=None, scale=12,
+                   radius=4) -> int:
+    # Render every dungeon of an archive written by "dungeon-gen", one
+    # shard per task. Returns the number of images written
+    os.makedirs(out_dir, exist_ok=True)
+    shards = sorted(os.path.join(path, f) for f in os.listdir(path)
+                    if f.startswith("shard_") and f.endswith(".npz"))
+    jobs = [(s, out_dir, scale, radius) for s in shards]
+    with ProcessPoolExecutor(workers) as pool:
+        return sum(len(r) for r in pool.map(_render_shard, jobs))
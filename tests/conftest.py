@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from dungeon_net.cli import DEFAULT_CONFIG, generation_args
+from dungeon_net.generation import generate_chain_dungeon
+
+
+def generate_dungeon(seed=0, num_iter=3):
+    # Dungeon and chain registry from the CLI's default config
+    config = dict(DEFAULT_CONFIG, num_iter=num_iter)
+    np.random.seed(seed)
+    return generate_chain_dungeon(*generation_args(config),
+                                  fill_complexity=config["fill_complexity"],
+                                  fill_self_loop_prob=config["fill_self_loop_prob"])
+
+
+@pytest.fixture
+def generate():
+    return generate_dungeon
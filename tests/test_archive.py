@@ -0,0 +1,91 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from dungeon_net.analysis.statistics import archive_statistics, shard_statistics
+from dungeon_net.generation import Room, Corridor, add_edge_to_chain
+from dungeon_net.generation.edges import ONE_WAY_FORWARD
+from dungeon_net.io.archive import (DungeonArchiveReader, NODE_COLUMNS,
+                                    columns_to_dungeon, export_dungeons,
+                                    iter_shards)
+
+
+def make_dungeon(num_rooms: int) -> nx.MultiDiGraph:
+    # Entrance, Rooms and Goal joined by Corridors, plus a one-way loop
+    # back to the Entrance and a self-loop on the Goal so that the edge
+    # and node counts differ
+    rooms = [Room(3) for _ in range(num_rooms)]
+    for i, room in enumerate(rooms):
+        room.name = f"Room_{i}"
+    rooms[0].name, rooms[-1].name = "Entrance", "Goal"
+    dungeon = nx.MultiDiGraph()
+    dungeon.add_node(rooms[0], chain_num=1)
+    for i, room in enumerate(rooms[1:]):
+        corridor = Corridor()
+        corridor.name = f"Corridor_{i}"
+        add_edge_to_chain(dungeon, rooms[i], corridor, 1)
+        add_edge_to_chain(dungeon, corridor, room, 2)
+    add_edge_to_chain(dungeon, rooms[-1], rooms[0], 1, ONE_WAY_FORWARD)
+    add_edge_to_chain(dungeon, rooms[-1], rooms[-1], 2)
+    return dungeon
+
+
+def test_read_dungeon_columns(tmp_path):
+    dungeons = [(10, make_dungeon(3)), (11, make_dungeon(5))]
+    export_dungeons(dungeons, str(tmp_path), shard_size=1)
+    reader = DungeonArchiveReader(str(tmp_path))
+    for dungeon_id, dungeon in dungeons:
+        columns = reader.read_dungeon(dungeon_id)
+        num_nodes = dungeon.number_of_nodes()
+        for c in NODE_COLUMNS + ["dungeon_id", "node_id"]:
+            assert len(columns[c]) == num_nodes, c
+        assert np.all(columns["dungeon_id"] == dungeon_id)
+        assert len(columns["u"]) == len(columns["v"]) == len(columns["direction"])
+        rebuilt = columns_to_dungeon(columns)
+        assert [n.name for n in rebuilt] == [n.name for n in dungeon]
+        assert rebuilt.number_of_edges() == dungeon.number_of_edges()
+
+
+def test_iter_shards_columns(tmp_path):
+    export_dungeons([(i, make_dungeon(i + 2)) for i in range(5)],
+                    str(tmp_path), shard_size=2)
+    full = list(iter_shards(str(tmp_path)))
+    partial = list(iter_shards(str(tmp_path), columns=["u", "v"]))
+    assert len(full) == len(partial) == 3
+    for shard, columns in zip(full, partial):
+        assert set(columns) == {"dungeon_id", "node_offsets", "edge_offsets",
+                                "u", "v"}
+        for k, values in columns.items():
+            assert np.array_equal(values, shard[k])
+    stats = archive_statistics(str(tmp_path))
+    expected = [shard_statistics(shard) for shard in full]
+    for k, values in stats.items():
+        assert np.array_equal(values, np.concatenate([e[k] for e in expected]))
+
+
+def test_reader_without_index(tmp_path):
+    export_dungeons([(i, make_dungeon(i + 2)) for i in range(4)],
+                    str(tmp_path), shard_size=1)
+    # Interrupted run with a gap in the shard numbers
+    (tmp_path / "index.npz").unlink()
+    (tmp_path / "shard_00001.npz").unlink()
+    reader = DungeonArchiveReader(str(tmp_path))
+    assert sorted(reader.dungeon_ids.tolist()) == [0, 2, 3]
+    for dungeon_id in [0, 2, 3]:
+        columns = reader.read_dungeon(dungeon_id)
+        assert len(columns["name"]) == 2 * (dungeon_id + 2) - 1
+    empty = reader.read_nodes([1])
+    assert all(len(values) == 0 for values in empty.values())
+    assert empty["node_type"].dtype == np.int8 and empty["node_id"].dtype == np.int64
+    assert reader.read_edges([1])["u"].dtype == np.int32
+
+
+def test_writer_refuses_existing_archive(tmp_path):
+    export_dungeons([(i, make_dungeon(2)) for i in range(3)], str(tmp_path),
+                    shard_size=1)
+    with pytest.raises(ValueError):
+        export_dungeons([(9, make_dungeon(2))], str(tmp_path))
+    export_dungeons([(9, make_dungeon(2))], str(tmp_path), overwrite=True)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index.npz",
+                                                           "shard_00000.npz"]
+    assert DungeonArchiveReader(str(tmp_path)).dungeon_ids.tolist() == [9]
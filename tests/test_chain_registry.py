@@ -0,0 +1,110 @@
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation import ChainRegistry, generate_chain_dungeon, merge_chain
+from dungeon_net.generation.graph_arrays import NODE_TYPES
+from dungeon_net.numerics import normalize_matrix
+
+# chain_num of every node of the seed 0, 2 iteration dungeon below as
+# generated when chains were merged with nx.compose
+BASELINE_CHAIN_NUMS = {
+    "Entrance": 3,
+    "Corridor_1": 1,
+    "Room_1": 1,
+    "Corridor_2": 1,
+    "Room_2": 4,
+    "Corridor_3": 2,
+    "Room_3": 7,
+    "Corridor_4": 2,
+    "Junction_1": 3,
+    "Corridor_5": 3,
+    "Junction_2": 3,
+    "Corridor_6": 4,
+    "Room_4": 4,
+    "Corridor_7": 4,
+    "Room_5": 4,
+    "Corridor_8": 4,
+    "Room_6": 4,
+    "Corridor_9": 4,
+    "Room_7": 4,
+    "Corridor_10": 4,
+    "Room_8": 4,
+    "Corridor_11": 4,
+    "Room_9": 4,
+    "Corridor_12": 5,
+    "Room_10": 8,
+    "Corridor_13": 5,
+    "Room_11": 5,
+    "Corridor_14": 5,
+    "Corridor_15": 5,
+    "Corridor_16": 6,
+    "Room_12": 7,
+    "Corridor_17": 6,
+    "Room_13": 6,
+    "Corridor_18": 7,
+    "Junction_3": 7,
+    "Corridor_19": 8,
+    "Room_14": 8,
+    "Corridor_20": 8,
+    "Room_15": 8,
+    "Corridor_21": 8,
+    "Room_16": 8,
+    "Corridor_22": 8,
+    "Room_17": 8,
+    "Corridor_23": 8,
+    "Room_18": 8,
+    "Corridor_24": 9,
+    "Goal": 9,
+    "Corridor_25": 9,
+    "Corridor_26": 9,
+}
+
+
+def generate(seed=0, num_iter=2):
+    chain_matrix = np.zeros((3, 3))
+    chain_matrix[0, 1] = 1.
+    chain_matrix[1, 0], chain_matrix[1, 2] = 0.9, 0.1
+    chain_matrix[2, 1] = 1.
+    join_matrix = np.zeros((3, 3))
+    join_matrix[0, 1] = 1.
+    join_matrix[1, 0], join_matrix[1, 2] = 0.3, 0.7
+    join_matrix[2, 1] = 1.
+    np.random.seed(seed)
+    return generate_chain_dungeon(num_iter, (3, 2), NODE_TYPES, NODE_TYPES,
+                                  normalize_matrix(chain_matrix),
+                                  normalize_matrix(join_matrix),
+                                  max_fill_chain_length=2)
+
+
+def test_chain_nums_match_compose_baseline():
+    dungeon, _ = generate()
+    chain_nums = {n.name: c for n, c in dungeon.nodes(data="chain_num")}
+    assert chain_nums == BASELINE_CHAIN_NUMS
+
+
+def test_merge_chain_matches_compose():
+    dungeon, chain_dict = generate()
+    chain = chain_dict["0_C"]
+    start = next(iter(chain))
+    other = nx.MultiDiGraph()
+    other.add_node(start, chain_num=99)
+    expected = nx.compose(dungeon, other)
+    merge_chain(dungeon, other)
+    assert dict(dungeon.nodes(data="chain_num")) == \
+        dict(expected.nodes(data="chain_num"))
+    again = nx.MultiDiGraph()
+    again.add_node(start, chain_num=1)
+    merge_chain(dungeon, again, update=False)
+    assert dungeon.nodes[start]["chain_num"] == 99
+
+
+def test_views_cover_dungeon():
+    dungeon, chain_dict = generate(num_iter=4)
+    assert isinstance(chain_dict, ChainRegistry)
+    nodes, edges = set(), set()
+    for key in chain_dict:
+        view = chain_dict[key]
+        nodes.update(view.nodes)
+        edges.update(view.edges(keys=True))
+    assert nodes == set(dungeon.nodes)
+    assert edges == set(dungeon.edges(keys=True))
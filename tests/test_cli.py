@@ -0,0 +1,22 @@
+import numpy as np
+
+from dungeon_net.cli import main
+from dungeon_net.io.archive import DungeonArchiveReader, columns_to_dungeon
+
+
+def test_generate_archive(tmp_path, capsys):
+    out = tmp_path / "dungeons"
+    status = main(["--seeds", "0:12", "--workers", "2", "--chunksize", "2",
+                   "--shard-size", "5", "--out", str(out)])
+    printed = capsys.readouterr().out
+    assert "largest worker" in printed
+    reader = DungeonArchiveReader(str(out))
+    failed = 12 - len(reader)
+    assert status == (1 if failed else 0)
+    assert len(np.unique(reader.dungeon_ids)) == len(reader) > 0
+    assert set(reader.dungeon_ids.tolist()) <= set(range(12))
+    for dungeon_id in reader.dungeon_ids:
+        columns = reader.read_dungeon(dungeon_id)
+        dungeon = columns_to_dungeon(columns)
+        assert dungeon.number_of_nodes() == len(columns["name"])
+        assert "Entrance" in columns["name"] and "Goal" in columns["name"]
@@ -0,0 +1,26 @@
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.graph_arrays import DungeonArrays
+from dungeon_net.numerics.csr import csr_bfs, csr_degrees
+
+
+def test_csr_bfs_matches_networkx(generate):
+    dungeon, _ = generate(seed=1)
+    arrays = DungeonArrays.from_dungeon(dungeon)
+    assert np.array_equal(arrays.degrees(), csr_degrees(arrays.indptr))
+    for source in [0, arrays.index_of_name("Entrance"), arrays.num_nodes - 1]:
+        depth = csr_bfs(arrays.indptr, arrays.indices, np.array([source]))
+        expected = np.full(arrays.num_nodes, -1)
+        lengths = nx.single_source_shortest_path_length(dungeon, arrays.nodes[source])
+        for node, length in lengths.items():
+            expected[arrays.node_index()[node]] = length
+        assert np.array_equal(depth, expected)
+
+
+def test_csr_bfs_multiple_sources():
+    # Path 0 -> 1 -> ... -> 5
+    indptr = np.array([0, 1, 2, 3, 4, 5, 5])
+    indices = np.array([1, 2, 3, 4, 5])
+    assert list(csr_bfs(indptr, indices, np.array([0, 3]))) == [0, 1, 2, 0, 1, 2]
+    assert list(csr_bfs(indptr, indices, np.array([4]))) == [-1, -1, -1, -1, 0, 1]
@@ -0,0 +1,109 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from dungeon_net.generation import (DistanceOracle, Dungeon, Room, Junction,
+                                    add_edge_to_chain)
+from dungeon_net.generation.edges import ONE_WAY_FORWARD
+from dungeon_net.generation.graph_arrays import DungeonArrays
+from dungeon_net.io.archive import save_dungeon
+
+
+def make_dungeon(num_nodes=60, seed=0) -> nx.MultiDiGraph:
+    # Random tree of Rooms and Junctions plus a few one-way loop edges
+    rng = np.random.default_rng(seed)
+    nodes = []
+    for i in range(num_nodes):
+        node = Junction(3) if i % 5 == 2 else Room(3)
+        node.name = f"{node.base_name}_{i}"
+        nodes.append(node)
+    nodes[0].name, nodes[-1].name = "Entrance", "Goal"
+    dungeon = nx.MultiDiGraph()
+    dungeon.add_node(nodes[0], chain_num=1)
+    for i in range(1, num_nodes):
+        add_edge_to_chain(dungeon, nodes[rng.integers(i)], nodes[i], 1)
+    for u, v in rng.integers(num_nodes, size=(num_nodes // 10, 2)):
+        add_edge_to_chain(dungeon, nodes[u], nodes[v], 2, ONE_WAY_FORWARD)
+    return dungeon
+
+
+def test_target_tables_match_networkx():
+    dungeon = make_dungeon()
+    arrays = DungeonArrays.from_dungeon(dungeon)
+    oracle = DistanceOracle.from_arrays(arrays, junctions=True)
+    nodes = arrays.nodes
+    assert oracle.to_target.dtype == oracle.next_hop.dtype == np.int16
+    assert len(oracle.targets) == 2 + np.sum(arrays.node_type == Junction.type_code)
+    for slot, target in enumerate(oracle.targets):
+        to = nx.single_target_shortest_path_length(dungeon, nodes[target])
+        to = dict(to)
+        for v, node in enumerate(nodes):
+            assert oracle.distance_to_target(slot, v) == to.get(node, -1)
+            hop = oracle.next_hop_to_target(slot, v)
+            if to.get(node, 0) > 0:
+                assert dungeon.has_edge(node, nodes[hop])
+                assert to[nodes[hop]] == to[node] - 1
+            else:
+                assert hop == -1
+
+
+def test_restricted_junction_targets():
+    arrays = DungeonArrays.from_dungeon(make_dungeon())
+    none = DistanceOracle.from_arrays(arrays, junctions=False)
+    assert none.target_names == ["Entrance", "Goal"]
+    some = DistanceOracle.from_arrays(arrays, junctions=3)
+    assert some.to_target.shape == (5, arrays.num_nodes)
+    junctions = some.targets[2:]
+    assert np.all(arrays.node_type[junctions] == Junction.type_code)
+    degrees = arrays.degrees()
+    others = np.setdiff1d(np.flatnonzero(arrays.node_type == Junction.type_code),
+                          junctions)
+    assert degrees[junctions].min() >= degrees[others].max()
+
+
+def test_distance_bounds_contain_distance():
+    arrays = DungeonArrays.from_dungeon(make_dungeon())
+    oracle = DistanceOracle.from_arrays(arrays, junctions=4)
+    sources, targets = np.meshgrid(np.arange(arrays.num_nodes),
+                                   np.arange(arrays.num_nodes))
+    exact = oracle.distance(sources, targets)
+    lower, upper = oracle.distance_bounds(sources, targets)
+    reachable = exact >= 0
+    assert np.all(lower[reachable] <= exact[reachable])
+    known = reachable & (upper >= 0)
+    assert np.all(upper[known] >= exact[known])
+
+
+def test_save_load_round_trip(generate, tmp_path):
+    graph, chain_dict = generate(seed=1)
+    dungeon = Dungeon(graph, chain_dict)
+    oracle = dungeon.distance_oracle()
+    filename = str(tmp_path / "dungeon.npz")
+    dungeon.save(filename)
+    loaded = Dungeon.load(filename)
+    assert [(n.name, c) for n, c in loaded.graph.nodes(data="chain_num")] == \
+        [(n.name, c) for n, c in graph.nodes(data="chain_num")]
+    arrays = loaded.arrays()
+    reloaded = loaded.distance_oracle()
+    fresh = DistanceOracle.from_arrays(arrays)
+    assert reloaded.matches(arrays) and oracle.matches(arrays)
+    assert reloaded.target_names == fresh.target_names
+    assert np.array_equal(reloaded.to_target, fresh.to_target)
+    assert np.array_equal(reloaded.from_target, fresh.from_target)
+    assert np.array_equal(reloaded.pairs, fresh.pairs)
+    # Stored next hops may differ from a rebuilt oracle's (arc order) but
+    # must be valid moves in the reloaded dungeon
+    slots, nodes = np.nonzero(reloaded.to_target > 0)
+    hops = reloaded.next_hop_to_target(slots, nodes)
+    assert np.array_equal(reloaded.to_target[slots, hops],
+                          reloaded.to_target[slots, nodes] - 1)
+    assert all(loaded.graph.has_edge(arrays.nodes[a], arrays.nodes[b])
+               for a, b in zip(nodes.tolist(), hops.tolist()))
+
+
+def test_save_rejects_other_dungeon(generate, tmp_path):
+    graph, _ = generate(seed=1)
+    other, _ = generate(seed=2)
+    oracle = DistanceOracle.from_arrays(DungeonArrays.from_dungeon(other))
+    with pytest.raises(ValueError):
+        save_dungeon(str(tmp_path / "dungeon.npz"), graph, oracle)
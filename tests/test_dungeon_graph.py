@@ -0,0 +1,32 @@
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation import MAX_CACHED_SOURCES, Dungeon
+
+
+def test_distances_cache_is_bounded(generate):
+    dungeon = Dungeon(*generate())
+    nodes = list(dungeon.arrays().nodes)
+    assert len(nodes) > 2 * MAX_CACHED_SOURCES
+    for source in nodes:
+        depth = dungeon.distances_from(source)
+        assert dungeon.cache_info()["size"] <= MAX_CACHED_SOURCES + 1
+    expected = nx.single_source_shortest_path_length(dungeon.graph, nodes[-1])
+    index = dungeon.arrays().node_index()
+    assert all(depth[index[n]] == d for n, d in expected.items())
+
+    # Most recently used sources are kept, the oldest ones recomputed
+    misses = dungeon.cache_misses
+    dungeon.distances_from(nodes[-1])
+    assert dungeon.cache_misses == misses
+    dungeon.distances_from(nodes[0])
+    assert dungeon.cache_misses == misses + 1
+
+
+def test_distances_recomputed_after_invalidate(generate):
+    dungeon = Dungeon(*generate())
+    entrance = dungeon.node("Entrance")
+    depth = dungeon.distances_from(entrance)
+    dungeon.invalidate()
+    assert dungeon.distances_from(entrance) is not depth
+    assert np.array_equal(dungeon.distances_from(entrance), depth)
@@ -0,0 +1,64 @@
+import networkx as nx
+
+from dungeon_net.generation import Room
+from dungeon_net.generation.edges import (EdgeList, ONE_WAY_BACK, ONE_WAY_FORWARD,
+                                          TWO_WAY)
+
+
+def arc_counts(graph: nx.MultiDiGraph):
+    return sorted((u.name, v.name, len(keys)) for u, nbrs in graph.adj.items()
+                  for v, keys in nbrs.items())
+
+
+def test_multidigraph_round_trip(generate):
+    for seed in range(5):
+        dungeon, _ = generate(seed)
+        edges = EdgeList.from_multidigraph(dungeon)
+        assert 2 * len(edges) >= dungeon.number_of_edges()
+        graph = edges.to_multidigraph()
+        assert list(graph.nodes) == list(dungeon.nodes)
+        assert dict(graph.nodes(data="chain_num")) == \
+            dict(dungeon.nodes(data="chain_num"))
+        assert arc_counts(graph) == arc_counts(dungeon)
+
+
+def make_edges():
+    # a - b two-way (stored as b, a), b -> c forward and d -> c stored
+    # backwards as (c, d)
+    a, b, c, d = (Room(2) for _ in range(4))
+    for node, name in zip((a, b, c, d), "abcd"):
+        node.name = name
+    edges = EdgeList(capacity=1)
+    edges.add_edge(b, a, TWO_WAY)
+    edges.add_edge(b, c, ONE_WAY_FORWARD)
+    edges.add_edge(c, d, ONE_WAY_BACK)
+    return edges, (a, b, c, d)
+
+
+def test_direction_flags():
+    edges, (a, b, c, d) = make_edges()
+    assert edges.successors(a) == [b]
+    assert set(edges.successors(b)) == {a, c}
+    assert edges.successors(c) == []
+    assert edges.successors(d) == [c]
+    index = edges.node_index
+    sources, targets = edges.arcs()
+    arcs = {(edges.nodes[s].name, edges.nodes[t].name)
+            for s, t in zip(sources, targets)}
+    assert arcs == {("b", "a"), ("a", "b"), ("b", "c"), ("d", "c")}
+    depth = edges.bfs_depth(a)
+    assert depth[[index[a], index[b], index[c], index[d]]].tolist() == [0, 1, 2, -1]
+    depth = edges.bfs_depth(a, directed=False)
+    assert depth[[index[a], index[b], index[c], index[d]]].tolist() == [0, 1, 2, 3]
+    assert edges.bfs_depth(c)[[index[a], index[d]]].tolist() == [-1, -1]
+
+
+def test_csr_cache_follows_new_edges():
+    edges, (a, b, c, d) = make_edges()
+    assert edges.successors(c) == []
+    edges.add_edge(c, a, ONE_WAY_FORWARD)
+    assert edges.successors(c) == [a]
+    e = Room(1)
+    edges.add_edge(d, e, TWO_WAY)
+    assert set(edges.successors(d)) == {c, e}
+    assert edges.bfs_depth(d)[edges.node_index[e]] == 1
@@ -0,0 +1,24 @@
+import numpy as np
+
+from dungeon_net.generation.graph_arrays import DungeonArrays
+from dungeon_net.simulation.inhabitants import DEAD, InhabitantSimulation
+
+
+def test_creatures_only_move_along_edges(generate):
+    dungeon, _ = generate(seed=2)
+    arrays = DungeonArrays.from_dungeon(dungeon)
+    sim = InhabitantSimulation(arrays, num_factions=3, seed=0, move_prob=0.9,
+                               wake_prob=0.5, spawn_nodes=[0], spawn_factions=[1],
+                               spawn_rates=2., compact_every=0)
+    sim.populate(500)
+    moved = 0
+    for _ in range(20):
+        before = sim.inhabitants.position.copy()
+        sim.step()
+        after = sim.inhabitants.position[:len(before)]
+        for old, new in zip(before[before != after], after[before != after]):
+            assert dungeon.has_edge(arrays.nodes[old], arrays.nodes[new])
+        moved += np.count_nonzero(before != after)
+    assert moved > 0
+    assert np.any(sim.inhabitants.state == DEAD)
+    assert sim.population().sum() == np.count_nonzero(sim.inhabitants.state != DEAD)
@@ -0,0 +1,62 @@
+import pickle
+import sys
+
+import networkx as nx
+import pytest
+
+from dungeon_net.generation import Corridor, Junction, Node, Room, add_edge_to_chain
+from dungeon_net.generation.graph_arrays import NODE_TYPES, node_type_code
+from dungeon_net.io.archive import dungeon_columns
+
+
+class RoundRoom(Room):
+    __slots__ = ()
+
+
+class Statue(Node):
+    __slots__ = ()
+
+
+def test_nodes_have_no_dict():
+    for node in [Room(2), Corridor(), Junction(3), RoundRoom(1)]:
+        assert not hasattr(node, "__dict__")
+        with pytest.raises(AttributeError):
+            node.colour = "red"
+
+
+def test_base_name_is_interned():
+    room = Room(2)
+    assert room.base_name is sys.intern("Room")
+    room.base_name = "".join(["Entr", "ance"])
+    assert room.base_name is sys.intern("Entrance")
+
+
+def test_pickle_round_trip():
+    room, corridor = Room(3), Corridor()
+    room.name, corridor.name = "Entrance", "Corridor_1"
+    room.base_name = "Entrance"
+    room.filled_edges = 1
+    loaded = pickle.loads(pickle.dumps([room, corridor]))
+    assert [type(n) for n in loaded] == [Room, Corridor]
+    assert [(n.name, n.num_edges, n.filled_edges) for n in loaded] == \
+        [("Entrance", 3, 1), ("Corridor_1", 2, 0)]
+    assert loaded[0].base_name is sys.intern("Entrance")
+    assert loaded[1].base_name is sys.intern("Corridor")
+
+
+def test_node_type_code():
+    assert [node_type_code(t(3)) for t in (Room, Junction)] == [0, 2]
+    assert node_type_code(Corridor()) == NODE_TYPES.index(Corridor)
+    assert node_type_code(RoundRoom(1)) == NODE_TYPES.index(Room)
+    for node in [Node(1), Statue(1)]:
+        with pytest.raises(ValueError):
+            node_type_code(node)
+
+
+def test_unknown_node_type_is_rejected_on_export():
+    room = Room(1)
+    room.name = "Entrance"
+    dungeon = nx.MultiDiGraph()
+    add_edge_to_chain(dungeon, room, Statue(1), 1)
+    with pytest.raises(ValueError):
+        dungeon_columns(dungeon)
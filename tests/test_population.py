@@ -0,0 +1,65 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from dungeon_net.generation import Corridor, Junction, Room
+from dungeon_net.generation.graph_arrays import DungeonArrays, NODE_TYPES
+from dungeon_net.generation.population import (DEFAULT_THEME, content_weights,
+                                               node_masks, populate_dungeon)
+from dungeon_net.numerics.csr import csr_bfs
+
+
+def theme_with(**changes):
+    theme = dict(DEFAULT_THEME)
+    theme.update(changes)
+    return theme
+
+
+def test_guards_only_at_junctions(generate):
+    dungeon, _ = generate(seed=3)
+    # Every node type could get a guard but the rules remove it from Rooms
+    # and Corridors
+    theme = theme_with(type_weights={t: [1., 1., 1., 1., 1.] for t in NODE_TYPES},
+                       rules=[("room", "guard", 0.), ("corridor", "guard", 0.)])
+    guard = theme["contents"].index("guard")
+    arrays, content = populate_dungeon(dungeon, theme, seed=0)
+    assert np.any(content == guard)
+    assert np.all(arrays.node_type[content == guard] == NODE_TYPES.index(Junction))
+
+
+def test_rules_scale_masked_weights(generate):
+    dungeon, _ = generate(seed=3)
+    arrays = DungeonArrays.from_dungeon(dungeon)
+    depth = csr_bfs(arrays.indptr, arrays.indices,
+                    np.array([arrays.index_of_name("Entrance")]))
+    base = content_weights(arrays, depth, theme_with(rules=[]))
+    weights = content_weights(arrays, depth, DEFAULT_THEME)
+    masks = node_masks(arrays, depth)
+    treasure = DEFAULT_THEME["contents"].index("treasure")
+    dead_end_room = masks["dead_end_room"]
+    assert np.allclose(weights[dead_end_room, treasure],
+                       4. * base[dead_end_room, treasure])
+    assert np.allclose(weights[~dead_end_room, treasure],
+                       base[~dead_end_room, treasure])
+
+
+def test_safe_nodes_stay_empty(generate):
+    dungeon, _ = generate(seed=3)
+    # No weight for "empty", so only the safe nodes get code 0
+    theme = theme_with(type_weights={t: [0., 1., 1., 1., 1.] for t in NODE_TYPES})
+    arrays, content = populate_dungeon(dungeon, theme, seed=1)
+    names = np.array([n.name for n in arrays.nodes])
+    assert sorted(names[content == 0].tolist()) == ["Entrance", "Goal"]
+
+
+def test_depth_sources():
+    room, corridor = Room(1), Corridor()
+    room.name, corridor.name = "Room_1", "Corridor_1"
+    dungeon = nx.MultiDiGraph()
+    dungeon.add_edges_from([(room, corridor), (corridor, room)])
+    with pytest.raises(ValueError):
+        populate_dungeon(dungeon)
+    arrays, content = populate_dungeon(dungeon, sources=[1], seed=0)
+    assert len(content) == 2
+    arrays, content = populate_dungeon(nx.MultiDiGraph())
+    assert arrays.num_nodes == 0 and content.dtype == np.uint8 and len(content) == 0
@@ -0,0 +1,62 @@
+import struct
+import zlib
+
+import networkx as nx
+import numpy as np
+
+from dungeon_net.generation.graph_arrays import DungeonArrays
+from dungeon_net.viz.raster import layered_layout, render_dungeon
+
+
+def read_png(filename: str) -> np.ndarray:
+    # Decoder for the 8-bit RGB, unfiltered PNGs of "write_png"
+    with open(filename, "rb") as f:
+        data = f.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, chunks = 8, {}
+    while pos < len(data):
+        length, = struct.unpack(">I", data[pos:pos + 4])
+        tag, body = data[pos + 4:pos + 8], data[pos + 8:pos + 8 + length]
+        crc, = struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])
+        assert crc == zlib.crc32(tag + body) & 0xffffffff
+        chunks[tag] = chunks.get(tag, b"") + body
+        pos += 12 + length
+    width, height, depth, color_type = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    assert (depth, color_type) == (8, 2) and b"IEND" in chunks
+    raw = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8)
+    raw = raw.reshape(height, width * 3 + 1)
+    assert np.all(raw[:, 0] == 0)
+    return raw[:, 1:].reshape(height, width, 3)
+
+
+def node_state(dungeon: nx.MultiDiGraph):
+    return [(n.name, n.base_name, n.num_edges, n.filled_edges, dict(data))
+            for n, data in dungeon.nodes(data=True)]
+
+
+def test_render_dungeon_png(generate, tmp_path):
+    dungeon, _ = generate(seed=2)
+    before = node_state(dungeon)
+    edges = sorted(dungeon.edges(keys=True), key=lambda e: (e[0].name, e[1].name, e[2]))
+    filename = str(tmp_path / "dungeon.png")
+    image = render_dungeon(dungeon, filename, scale=10, radius=3)
+    assert node_state(dungeon) == before
+    assert sorted(dungeon.edges(keys=True),
+                  key=lambda e: (e[0].name, e[1].name, e[2])) == edges
+    assert image.dtype == np.uint8 and image.shape[2] == 3
+    assert np.array_equal(read_png(filename), image)
+    # Layout cells are "scale" pixels apart, plus a margin on every side
+    arrays = DungeonArrays.from_dungeon(dungeon)
+    x, y = layered_layout(arrays.indptr, arrays.indices,
+                          root=arrays.index_of_name("Entrance"))
+    margin = 3 + 2
+    assert image.shape[0] == round((y.max() - y.min()) * 10) + 2 * margin + 1
+    assert image.shape[1] == round((x.max() - x.min()) * 10) + 2 * margin + 1
+
+
+def test_render_empty_dungeon(tmp_path):
+    x, y = layered_layout(np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32))
+    assert len(x) == len(y) == 0
+    filename = str(tmp_path / "empty.png")
+    image = render_dungeon(nx.MultiDiGraph(), filename)
+    assert np.array_equal(read_png(filename), image)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from dungeon_net.cli import DEFAULT_CONFIG, generation_args
+from dungeon_net.generation import NodeNames, Room, new_node_name, regenerate_chain
+from dungeon_net.generation.regeneration import find_region
+
+ARGS = generation_args(DEFAULT_CONFIG)
+NODE_TYPES, PROB_MATRIX, MAX_FILL_CHAIN_LENGTH = ARGS[2], ARGS[4], ARGS[6]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_regenerate_chain_invariants(generate, seed):
+    dungeon, chain_dict = generate(seed)
+    keys = chain_dict.keys_of_kind("chain") + chain_dict.keys_of_kind("join")
+    for key in keys:
+        main_chain_nums = {r.chain_num for r in chain_dict.records.values()
+                           if r.kind != "fill"}
+        region, anchors = find_region(dungeon, chain_dict.view(key), main_chain_nums)
+        in_region = set(region)
+        old_nodes = set(dungeon)
+        outside = {n: (n.name, n.num_edges, n.filled_edges,
+                       sorted(m.name for m in dungeon.adj[n]))
+                   for n in dungeon if n not in in_region and n not in anchors}
+        anchor_links = {a: sorted(m.name for m in dungeon.adj[a] if m not in in_region)
+                        for a in anchors}
+        np.random.seed(seed)
+        regenerate_chain(dungeon, chain_dict, key, NODE_TYPES, PROB_MATRIX,
+                         MAX_FILL_CHAIN_LENGTH)
+
+        names = [n.name for n in dungeon]
+        assert len(set(names)) == len(names)
+        for n in dungeon:
+            assert dungeon.out_degree(n) == n.filled_edges <= n.num_edges, n.desc()
+        for anchor, links in anchor_links.items():
+            assert anchor in dungeon and not anchor.has_free_edges()
+            assert sorted(m.name for m in dungeon.adj[anchor]
+                          if m in old_nodes and m not in in_region) == links
+            assert any(m not in old_nodes for m in dungeon.adj[anchor])
+        for n, state in outside.items():
+            assert (n.name, n.num_edges, n.filled_edges,
+                    sorted(m.name for m in dungeon.adj[n])) == state
+        assert not in_region & set(dungeon)
+
+
+def test_node_names_counts():
+    nodes = NodeNames([Room(1), Room(2)])
+    entrance = Room(1)
+    entrance.base_name = "Entrance"
+    nodes.append(entrance)
+    room = Room(1)
+    assert new_node_name(room, nodes) == new_node_name(room, list(nodes)) == "Room_3"
+    nodes += [room]
+    assert nodes.base_name_counts == {"Room": 3, "Entrance": 1}
+    with pytest.raises(TypeError):
+        nodes.pop()
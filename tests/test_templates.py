@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from dungeon_net.generation.graph_arrays import DungeonArrays, NODE_TYPES
+from dungeon_net.generation.node import Room
+from dungeon_net.spatial.templates import (TemplateLibrary, assign_templates,
+                                           build_template_pack)
+
+
+def build_library(tmp_path, max_capacity):
+    path = str(tmp_path / "templates.pack")
+    build_template_pack(path, min_size=3, max_size=6, max_capacity=max_capacity)
+    return TemplateLibrary(path)
+
+
+def test_choose_holds_the_doors(tmp_path):
+    library = build_library(tmp_path, max_capacity=4)
+    rng = np.random.default_rng(0)
+    for k in range(5):
+        assert len(library.candidates(k))
+        ids = library.choose(np.full(20, k), rng=rng)
+        assert np.all(library.capacity[ids] >= k)
+
+
+def test_no_candidate_above_max_capacity(tmp_path):
+    library = build_library(tmp_path, max_capacity=4)
+    assert len(library.candidates(5)) == 0
+    assert len(library.candidates(5, "junction")) == 0
+    assert library.choose(5) == -1
+    ids = library.choose(np.array([4, 5, 9]), rng=np.random.default_rng(0))
+    assert ids[0] >= 0 and list(ids[1:]) == [-1, -1]
+
+
+def test_assign_templates_refuses_rooms_without_template(tmp_path, generate):
+    dungeon, _ = generate()
+    arrays = DungeonArrays.from_dungeon(dungeon)
+    rooms = arrays.node_type == NODE_TYPES.index(Room)
+    max_capacity = int(arrays.num_edges[rooms].max()) - 1
+    library = build_library(tmp_path, max_capacity=max_capacity)
+    with pytest.raises(ValueError):
+        assign_templates(arrays, library, seed=0)
+    templates = assign_templates(arrays, library, seed=0, strict=False)
+    too_many = rooms & (arrays.num_edges > max_capacity)
+    assert np.all(templates[too_many] == -1)
+    assert np.all(templates[rooms & ~too_many] >= 0)
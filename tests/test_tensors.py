@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from dungeon_net.generation.edges import ONE_WAY_BACK, ONE_WAY_FORWARD, TWO_WAY
+from dungeon_net.io.tensors import (BucketPacker, MAX_DENSE_BYTES, export_tensor_shards,
+                                    iter_tensor_shards, pad_batch)
+
+
+def make_columns(num_nodes=3):
+    # Room 0 - Corridor 1 two-way, 1 -> 2 one-way, then a chain of two-way
+    # edges up to "num_nodes"
+    u = np.arange(num_nodes - 1, dtype=np.int32)
+    direction = np.full(num_nodes - 1, TWO_WAY, dtype=np.int8)
+    direction[1] = ONE_WAY_FORWARD
+    return {"node_type": np.arange(num_nodes, dtype=np.int8) % 2,
+            "num_edges": np.full(num_nodes, 2, dtype=np.int16),
+            "filled_edges": np.full(num_nodes, 2, dtype=np.int16),
+            "chain_num": np.arange(num_nodes, dtype=np.int32),
+            "role": np.zeros(num_nodes, dtype=np.int8),
+            "u": u, "v": u + 1, "direction": direction}
+
+
+def test_pad_batch():
+    small, large = make_columns(3), make_columns(5)
+    large["direction"][3] = ONE_WAY_BACK
+    tensors = pad_batch([small, large], [7, 8], max_nodes=6, max_arcs=10,
+                        dense=True)
+    assert tensors["dungeon_id"].tolist() == [7, 8]
+    assert tensors["num_nodes"].tolist() == [3, 5]
+    assert tensors["num_arcs"].tolist() == [3, 6]
+    assert tensors["node_mask"].sum(axis=1).tolist() == [3, 5]
+    assert tensors["edge_mask"].sum(axis=1).tolist() == [3, 6]
+    edge_index = tensors["edge_index"]
+    assert edge_index.shape == (2, 2, 10)
+    assert edge_index[0, :, :3].T.tolist() == [[0, 1], [1, 2], [1, 0]]
+    assert np.all(edge_index[0, :, 3:] == -1)
+    arcs = {tuple(a) for a in edge_index[1, :, :6].T.tolist()}
+    assert arcs == {(0, 1), (1, 2), (2, 3), (4, 3), (1, 0), (3, 2)}
+    assert tensors["adjacency"][1].sum() == 6
+    assert all(tensors["adjacency"][1, s, t] for s, t in arcs)
+    one_hot = tensors["node_type_one_hot"]
+    assert one_hot[1, :5].argmax(axis=1).tolist() == [0, 1, 0, 1, 0]
+    assert not one_hot[1, 5:].any() and not tensors["node_features"][0, 3:].any()
+
+
+def test_bucket_assignment():
+    packer = BucketPacker(buckets=[4, 8, 16], batch_size=2)
+    assert packer.bucket_of(3, 6) == 4
+    assert packer.bucket_of(4, 13) == 8  # 13 arcs need 5 nodes' worth
+    assert packer.bucket_of(9, 0) == 16
+    assert packer.bucket_of(20, 0) == 32
+    assert packer.add(0, make_columns(3)) is None
+    assert packer.add(1, make_columns(6)) is None
+    bucket, tensors = packer.add(2, make_columns(4))
+    assert bucket == 4 and tensors["dungeon_id"].tolist() == [0, 2]
+    assert tensors["node_mask"].shape == (2, 4)
+    assert [(b, t["dungeon_id"].tolist()) for b, t in packer.flush()] == [(8, [1])]
+
+
+def test_dense_batches_are_capped(tmp_path):
+    bucket = 4096
+    packer = BucketPacker(buckets=[bucket], batch_size=256, dense=True)
+    assert packer.batch_size_of(bucket) * bucket * bucket <= MAX_DENSE_BYTES
+    assert BucketPacker(buckets=[bucket], batch_size=256).batch_size_of(bucket) == 256
+    huge = BucketPacker(buckets=[1 << 15], dense=True)
+    with pytest.raises(ValueError):
+        huge.add(0, make_columns(20000))
+    counts = export_tensor_shards(((i, make_columns(3)) for i in range(5)),
+                                  str(tmp_path), buckets=[4], batch_size=2)
+    assert counts == {4: 3}
+    assert [t["dungeon_id"].tolist() for _, t in iter_tensor_shards(str(tmp_path))] == \
+        [[0, 1], [2, 3], [4]]